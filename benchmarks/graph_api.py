@@ -0,0 +1,100 @@
+"""
+In-process stand-in for the Graph API `/messages` endpoint.
+
+Point the client at it with `WhatsAppConfig(use_emulator=True, emulator_url=server.url)`.
+"""
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+from benchmarks.payloads import PHONE_NUMBER_ID
+from pywce import client
+
+
+class GraphApiStub:
+    """
+        Accepts every POST and answers like the Cloud API send endpoint
+
+        :param latency_ms: delay added to every response, to simulate the network
+        :param keep: keep received payloads, for assertions & diffs
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0, keep: bool = False):
+        self.latency_ms = latency_ms
+        self.keep = keep
+        self.received: List[Dict[str, Any]] = []
+        self.requests = 0
+
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+                if stub.latency_ms:
+                    time.sleep(stub.latency_ms / 1000)
+
+                with stub._lock:
+                    stub.requests += 1
+                    msg_id = next(stub._ids)
+                    if stub.keep:
+                        stub.received.append(body)
+
+                to = body.get("to")
+                response = json.dumps({
+                    "messaging_product": "whatsapp",
+                    "contacts": [{"input": to, "wa_id": to}],
+                    "messages": [{"id": f"wamid.out.{msg_id}"}]
+                }).encode("utf-8")
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v22.0/{PHONE_NUMBER_ID}/messages"
+
+    def whatsapp_config(self) -> client.WhatsAppConfig:
+        return client.WhatsAppConfig(
+            token="bench-token",
+            phone_number_id=PHONE_NUMBER_ID,
+            hub_verification_token="bench-hub",
+            use_emulator=True,
+            emulator_url=self.url
+        )
+
+    def start(self) -> "GraphApiStub":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="graph-api-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "GraphApiStub":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
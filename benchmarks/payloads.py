@@ -0,0 +1,118 @@
+"""
+Synthetic WhatsApp Cloud API webhook payloads.
+
+Payloads follow the shape Meta posts to the webhook, with fresh timestamps
+and unique message ids so they pass the engine old-webhook & dedupe checks.
+"""
+import itertools
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+PHONE_NUMBER_ID = "100000000000001"
+DISPLAY_PHONE_NUMBER = "263780000000"
+
+
+class WebhookGenerator:
+    def __init__(self, prefix: str = "bench"):
+        self.prefix = prefix
+        self._ids = itertools.count(1)
+
+    def _msg_id(self) -> str:
+        return f"wamid.{self.prefix}.{next(self._ids)}"
+
+    @staticmethod
+    def _envelope(value: Dict[str, Any]) -> Dict[str, Any]:
+        value = {
+            "messaging_product": "whatsapp",
+            "metadata": {"display_phone_number": DISPLAY_PHONE_NUMBER, "phone_number_id": PHONE_NUMBER_ID},
+            **value
+        }
+
+        return {
+            "object": "whatsapp_business_account",
+            "entry": [{"id": "200000000000001", "changes": [{"field": "messages", "value": value}]}]
+        }
+
+    def message(self, wa_id: str, typ: str, body: Dict[str, Any], name: str = "Bench User") -> Dict[str, Any]:
+        """
+        a single inbound message webhook
+
+        :param typ: message type, the `body` is merged into the message object
+        """
+        return self._envelope({
+            "contacts": [{"profile": {"name": name}, "wa_id": wa_id}],
+            "messages": [{
+                "from": wa_id,
+                "id": self._msg_id(),
+                "timestamp": str(int(time.time())),
+                "type": typ,
+                **body
+            }]
+        })
+
+    def text(self, wa_id: str, text: str) -> Dict[str, Any]:
+        return self.message(wa_id, "text", {"text": {"body": text}})
+
+    def button_reply(self, wa_id: str, title: str, button_id: Optional[str] = None) -> Dict[str, Any]:
+        return self.message(wa_id, "interactive", {
+            "interactive": {"type": "button_reply", "button_reply": {"id": button_id or title.lower(), "title": title}}
+        })
+
+    def list_reply(self, wa_id: str, row_id: str, title: str = "", description: str = "") -> Dict[str, Any]:
+        return self.message(wa_id, "interactive", {
+            "interactive": {
+                "type": "list_reply",
+                "list_reply": {"id": row_id, "title": title, "description": description}
+            }
+        })
+
+    def nfm_reply(self, wa_id: str, response: Dict[str, Any]) -> Dict[str, Any]:
+        return self.message(wa_id, "interactive", {
+            "interactive": {
+                "type": "nfm_reply",
+                "nfm_reply": {"name": "flow", "body": "Sent", "response_json": json.dumps(response)}
+            }
+        })
+
+    def location(self, wa_id: str, latitude: float = -17.8292, longitude: float = 31.0522) -> Dict[str, Any]:
+        return self.message(wa_id, "location", {
+            "location": {"latitude": latitude, "longitude": longitude, "name": "Harare", "address": "CBD"}
+        })
+
+    def media(self, wa_id: str, typ: str = "image", mime_type: str = "image/jpeg") -> Dict[str, Any]:
+        return self.message(wa_id, typ, {
+            typ: {"id": f"media.{next(self._ids)}", "mime_type": mime_type, "sha256": "0" * 64}
+        })
+
+    def statuses(self, wa_id: str, count: int = 1, status: str = "delivered") -> Dict[str, Any]:
+        now = str(int(time.time()))
+
+        return self._envelope({
+            "statuses": [{
+                "id": self._msg_id(),
+                "status": status,
+                "timestamp": now,
+                "recipient_id": wa_id,
+                "conversation": {"id": "conversation.1", "origin": {"type": "service"}},
+                "pricing": {"billable": True, "pricing_model": "CBP", "category": "service"}
+            } for _ in range(count)]
+        })
+
+    def mixed(self, wa_id: str) -> List[Dict[str, Any]]:
+        """
+        one payload of every supported kind
+        """
+        return [
+            self.text(wa_id, "hi"),
+            self.button_reply(wa_id, "Confirm"),
+            self.list_reply(wa_id, "0", "Donald | $3.50"),
+            self.nfm_reply(wa_id, {"flow_token": "token", "name": "Bench"}),
+            self.media(wa_id),
+            self.location(wa_id),
+            self.statuses(wa_id, count=3)
+        ]
+
+    @staticmethod
+    def to_bytes(payload: Dict[str, Any]) -> bytes:
+        return json.dumps(payload).encode("utf-8")
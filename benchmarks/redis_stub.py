@@ -0,0 +1,242 @@
+"""
+In-process stand-in for a redis server, speaks RESP2 and implements the commands `RedisSessionManager` uses.
+
+    with RedisStub() as server:
+        manager = RedisSessionManager(client=server.client())
+"""
+import socketserver
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from pywce import RespClient
+
+
+class RedisStub:
+    """
+        Hash, string & key expiry subset of redis: PING, AUTH, SELECT, SET [NX] [EX], GET, HSET, HSETNX, HGET, HGETALL, HKEYS, HDEL,
+        DEL, EXISTS, EXPIRE, TTL & FLUSHDB. Expired keys are dropped lazily on access.
+
+        :param latency_ms: delay added to every batch of commands read from a connection, to simulate the network
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0):
+        self.latency_ms = latency_ms
+        self.commands = 0
+
+        self._data: Dict[bytes, Dict[bytes, bytes]] = {}
+        self._expires: Dict[bytes, float] = {}
+        self._lock = threading.Lock()
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._server = socketserver.ThreadingTCPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    def _handler(self):
+        stub = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                buffer = b""
+
+                while True:
+                    chunk = self.request.recv(65536)
+                    if not chunk:
+                        return
+
+                    buffer += chunk
+                    commands, buffer = stub._parse(buffer)
+
+                    if not commands:
+                        continue
+
+                    # every chunk of pipelined commands is one simulated round trip
+                    if stub.latency_ms:
+                        time.sleep(stub.latency_ms / 1000)
+
+                    self.request.sendall(b"".join(stub._encode(stub.execute(c)) for c in commands))
+
+        return Handler
+
+    @staticmethod
+    def _parse(buffer: bytes):
+        """
+        split complete commands off the buffer, returns (commands, rest)
+        """
+        commands = []
+        pos = 0
+
+        while True:
+            end = buffer.find(b"\r\n", pos)
+            if end < 0:
+                break
+
+            count = int(buffer[pos + 1:end])
+            cursor = end + 2
+            args = []
+
+            for _ in range(count):
+                end = buffer.find(b"\r\n", cursor)
+                if end < 0:
+                    break
+
+                size = int(buffer[cursor + 1:end])
+                if len(buffer) < end + 2 + size + 2:
+                    break
+
+                args.append(buffer[end + 2:end + 2 + size])
+                cursor = end + 2 + size + 2
+
+            if len(args) < count:
+                break
+
+            commands.append(args)
+            pos = cursor
+
+        return commands, buffer[pos:]
+
+    @staticmethod
+    def _encode(reply: Any) -> bytes:
+        if reply is None:
+            return b"$-1\r\n"
+        if isinstance(reply, Exception):
+            return b"-ERR %b\r\n" % str(reply).encode("utf-8")
+        if isinstance(reply, int):
+            return b":%d\r\n" % reply
+        if isinstance(reply, str):
+            return b"+%b\r\n" % reply.encode("utf-8")
+        if isinstance(reply, list):
+            return b"*%d\r\n" % len(reply) + b"".join(RedisStub._encode(r) for r in reply)
+
+        return b"$%d\r\n%b\r\n" % (len(reply), reply)
+
+    def _hash(self, key: bytes, create: bool = False) -> Optional[Dict[bytes, bytes]]:
+        expires = self._expires.get(key)
+
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+
+        if create and key not in self._data:
+            self._data[key] = {}
+
+        return self._data.get(key)
+
+    def _drop_if_empty(self, key: bytes) -> None:
+        if not self._data.get(key):
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+
+    def execute(self, command: List[bytes]) -> Any:
+        name, args = command[0].upper().decode("utf-8"), command[1:]
+
+        with self._lock:
+            self.commands += 1
+
+            if name in ("PING", "AUTH", "SELECT"):
+                return "PONG" if name == "PING" else "OK"
+
+            if name == "FLUSHDB":
+                self._data.clear()
+                self._expires.clear()
+                return "OK"
+
+            if name == "SET":
+                options = [a.upper() for a in args[2:]]
+                if b"NX" in options and self._hash(args[0]) is not None:
+                    return None
+                self._data[args[0]] = args[1]
+                self._expires.pop(args[0], None)
+                if b"EX" in options:
+                    self._expires[args[0]] = time.monotonic() + int(options[options.index(b"EX") + 1])
+                return "OK"
+
+            if name == "GET":
+                return self._hash(args[0])
+
+            if name == "HSET":
+                h = self._hash(args[0], create=True)
+                added = 0
+                for i in range(1, len(args), 2):
+                    added += args[i] not in h
+                    h[args[i]] = args[i + 1]
+                return added
+
+            if name == "HSETNX":
+                h = self._hash(args[0], create=True)
+                if args[1] in h:
+                    return 0
+                h[args[1]] = args[2]
+                return 1
+
+            if name == "HGET":
+                return (self._hash(args[0]) or {}).get(args[1])
+
+            if name == "HGETALL":
+                return [x for k, v in (self._hash(args[0]) or {}).items() for x in (k, v)]
+
+            if name == "HKEYS":
+                return list((self._hash(args[0]) or {}).keys())
+
+            if name == "HDEL":
+                h = self._hash(args[0]) or {}
+                removed = sum(1 for f in args[1:] if h.pop(f, None) is not None)
+                self._drop_if_empty(args[0])
+                return removed
+
+            if name == "DEL":
+                removed = 0
+                for key in args:
+                    removed += self._hash(key) is not None
+                    self._data.pop(key, None)
+                    self._expires.pop(key, None)
+                return removed
+
+            if name == "EXISTS":
+                return sum(1 for key in args if self._hash(key) is not None)
+
+            if name == "EXPIRE":
+                if self._hash(args[0]) is None:
+                    return 0
+                self._expires[args[0]] = time.monotonic() + int(args[1])
+                return 1
+
+            if name == "TTL":
+                if self._hash(args[0]) is None:
+                    return -2
+                expires = self._expires.get(args[0])
+                return -1 if expires is None else int(round(expires - time.monotonic()))
+
+            return ValueError(f"unknown command '{name}'")
+
+    def expire_now(self, key: str) -> None:
+        """
+        expire a key immediately, e.g. to test TTL behaviour without waiting
+        """
+        with self._lock:
+            if key.encode("utf-8") in self._expires:
+                self._expires[key.encode("utf-8")] = 0
+
+    @property
+    def address(self):
+        return self._server.server_address[:2]
+
+    def client(self, **kwargs) -> RespClient:
+        host, port = self.address
+        return RespClient(host=host, port=port, **kwargs)
+
+    def start(self) -> "RedisStub":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="redis-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "RedisStub":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
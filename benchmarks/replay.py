@@ -0,0 +1,58 @@
+"""
+Replay a traffic capture against an engine built from a template set.
+
+    python -m benchmarks.replay capture.jsonl --templates example/ehailing/templates \
+        --triggers example/common/triggers --start START-MENU --report REPORT --speed 10
+
+Outbound requests go to the in-process Graph API stand-in. Prints throughput and
+the outbound diff against the capture, `--diff-out` writes every mismatch as json.
+"""
+import argparse
+import json
+import logging
+from typing import List, Optional
+
+from benchmarks.graph_api import GraphApiStub
+from pywce import Engine, EngineConfig, DefaultSessionManager, TrafficReplayer, client, storage
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="replay a pywce traffic capture")
+    parser.add_argument("capture")
+    parser.add_argument("--templates", required=True)
+    parser.add_argument("--triggers", required=True)
+    parser.add_argument("--start", required=True, help="start template stage")
+    parser.add_argument("--report", required=True, help="report template stage")
+    parser.add_argument("--speed", default="1", help="1, 10, .. times real time or max")
+    parser.add_argument("--latency-ms", type=float, default=0, help="simulated Graph API latency")
+    parser.add_argument("--diff-out", help="file to write the outbound diff to")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.CRITICAL)
+    speed = None if args.speed == "max" else float(args.speed)
+
+    with GraphApiStub(latency_ms=args.latency_ms) as stub:
+        engine = Engine(EngineConfig(
+            whatsapp=client.WhatsApp(stub.whatsapp_config()),
+            storage_manager=storage.YamlJsonStorageManager(args.templates, args.triggers),
+            start_template_stage=args.start,
+            report_template_stage=args.report,
+            session_manager=DefaultSessionManager(),
+            # replayed gaps shrink with speed
+            debounce_timeout_ms=0 if speed != 1 else 3000
+        ))
+
+        result = TrafficReplayer(engine, args.capture, speed=speed).run()
+
+    print(f"replayed {result.messages} webhooks in {result.seconds:.2f}s ({result.msgs_per_s:.1f} msgs/s)")
+    print(f"outbound: {result.sent} sent, {result.matched} matched, {len(result.diff)} different")
+
+    if args.diff_out:
+        with open(args.diff_out, "w", encoding="utf-8") as f:
+            json.dump(result.diff, f, indent=2)
+
+    return result
+
+
+if __name__ == "__main__":
+    main()
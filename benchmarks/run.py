@@ -0,0 +1,191 @@
+"""
+Engine benchmark runner.
+
+    python -m benchmarks.run                      # all scenarios
+    python -m benchmarks.run booking -u 50 -r 10  # 50 users, 10 rounds of the booking flow
+    python -m benchmarks.run --latency-ms 20      # simulate Graph API round trip
+
+Reports msgs/s, p50 / p95 / p99 latency of `Engine.process_webhook`, the peak
+traced memory per message and the allocated blocks retained per message.
+"""
+import argparse
+import gc
+import json
+import logging
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict
+from typing import Callable, Iterable, List, Optional
+
+from benchmarks.graph_api import GraphApiStub
+from benchmarks.payloads import WebhookGenerator
+from benchmarks.scenarios import SCENARIOS, Scenario
+from pywce import Engine, EngineConfig, DefaultSessionManager, client, storage
+
+
+@dataclass
+class Result:
+    scenario: str
+    messages: int
+    seconds: float
+    msgs_per_s: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    peak_kib_per_msg: float
+    retained_blocks_per_msg: float
+    sent: int
+
+    def row(self) -> str:
+        return (f"{self.scenario:<10} {self.messages:>7} {self.msgs_per_s:>10.1f} {self.p50_ms:>8.3f} "
+                f"{self.p95_ms:>8.3f} {self.p99_ms:>8.3f} {self.peak_kib_per_msg:>10.1f} "
+                f"{self.retained_blocks_per_msg:>9.1f} {self.sent:>7}")
+
+    @staticmethod
+    def header() -> str:
+        return (f"{'scenario':<10} {'msgs':>7} {'msgs/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+                f"{'peak KiB':>10} {'blocks':>9} {'sent':>7}")
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))] if values else 0.0
+
+
+def measure(name: str, calls: Callable[[], Iterable[Callable]], sent: Callable[[], int] = lambda: 0) -> Result:
+    """
+    time every call of one pass, then replay a second pass under tracemalloc for the memory figures
+
+    :param calls: returns a fresh iterable of zero-arg calls, one per message
+    """
+    latencies = []
+    gc.collect()
+
+    start = time.perf_counter()
+    for call in calls():
+        t = time.perf_counter_ns()
+        call()
+        latencies.append((time.perf_counter_ns() - t) / 1_000_000)
+    seconds = time.perf_counter() - start
+    total_sent = sent()
+
+    peaks = []
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+
+    for call in calls():
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        call()
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+
+    tracemalloc.stop()
+    gc.collect()
+    retained = sys.getallocatedblocks() - blocks
+
+    count = len(latencies)
+
+    return Result(
+        scenario=name,
+        messages=count,
+        seconds=seconds,
+        msgs_per_s=count / seconds if seconds else 0.0,
+        p50_ms=percentile(latencies, 0.50),
+        p95_ms=percentile(latencies, 0.95),
+        p99_ms=percentile(latencies, 0.99),
+        peak_kib_per_msg=statistics.fmean(peaks) / 1024 if peaks else 0.0,
+        retained_blocks_per_msg=retained / len(peaks) if peaks else 0.0,
+        sent=total_sent
+    )
+
+
+def build_engine(scenario: Scenario, stub: GraphApiStub) -> Engine:
+    return Engine(EngineConfig(
+        whatsapp=client.WhatsApp(stub.whatsapp_config()),
+        storage_manager=storage.YamlJsonStorageManager(scenario.templates_dir, scenario.triggers_dir),
+        start_template_stage=scenario.start_template_stage,
+        report_template_stage=scenario.report_template_stage,
+        session_manager=DefaultSessionManager(),
+        # every step is sent back to back
+        debounce_timeout_ms=0
+    ))
+
+
+def run_scenario(scenario: Scenario, users: int = 20, rounds: int = 5, latency_ms: float = 0,
+                 engine_factory: Optional[Callable[[Scenario, GraphApiStub], Engine]] = None) -> Result:
+    """
+    drive `Engine.process_webhook` with `users` users walking the scenario `rounds` times, steps interleaved
+    """
+    generator = WebhookGenerator(prefix=scenario.name)
+    wa_ids = [f"2637{i:08d}" for i in range(users)]
+
+    with GraphApiStub(latency_ms=latency_ms) as stub:
+        engine = (engine_factory or build_engine)(scenario, stub)
+
+        def calls():
+            for _ in range(rounds):
+                for step in scenario.steps:
+                    for wa_id in wa_ids:
+                        payload = step(generator, wa_id)
+                        yield lambda p=payload: engine.process_webhook(p)
+
+        # warm up template & hook imports
+        for step in scenario.steps:
+            engine.process_webhook(step(generator, "263799999999"))
+
+        stub.requests = 0
+        return measure(scenario.name, calls, sent=lambda: stub.requests)
+
+
+def run_parse(messages: int = 10_000) -> Result:
+    """
+    webhook parse only, raw bytes of every generated payload kind into envelope, user & message
+    """
+    generator = WebhookGenerator(prefix="parse")
+    kinds = [generator.to_bytes(p) for p in generator.mixed("263700000001")]
+
+    def parse(raw: bytes):
+        envelope = client.WebhookEnvelope.of(raw)
+        if envelope.is_message:
+            _ = envelope.user, envelope.message
+
+    def calls():
+        for i in range(messages):
+            yield lambda raw=kinds[i % len(kinds)]: parse(raw)
+
+    return measure("parse", calls)
+
+
+def main(argv: Optional[List[str]] = None) -> List[Result]:
+    parser = argparse.ArgumentParser(description="pywce engine benchmarks")
+    parser.add_argument("scenarios", nargs="*", default=["parse", *SCENARIOS],
+                        help=f"scenarios to run: parse, {', '.join(SCENARIOS)}")
+    parser.add_argument("-u", "--users", type=int, default=20)
+    parser.add_argument("-r", "--rounds", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=0, help="simulated Graph API latency")
+    parser.add_argument("--json", action="store_true", help="print results as json lines")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.CRITICAL)
+
+    results = []
+    if not args.json:
+        print(Result.header())
+
+    for name in args.scenarios:
+        if name == "parse":
+            result = run_parse(messages=args.users * args.rounds * 10)
+        else:
+            result = run_scenario(SCENARIOS[name], users=args.users, rounds=args.rounds, latency_ms=args.latency_ms)
+
+        results.append(result)
+        print(json.dumps(asdict(result)) if args.json else result.row())
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Conversation scenarios over the example template sets.
+
+Each step builds the next inbound webhook of a user walking through the flow,
+the last step leaves the user on a stage the first step (a trigger) can restart from.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Any, List
+
+from benchmarks.payloads import WebhookGenerator
+
+EXAMPLES = Path(__file__).resolve().parent.parent / "example"
+
+Step = Callable[[WebhookGenerator, str], Dict[str, Any]]
+
+
+@dataclass
+class Scenario:
+    name: str
+    templates_dir: str
+    triggers_dir: str
+    start_template_stage: str
+    report_template_stage: str
+    steps: List[Step]
+
+
+BOOKING = Scenario(
+    name="booking",
+    templates_dir=str(EXAMPLES / "booking_stage_based" / "templates"),
+    triggers_dir=str(EXAMPLES / "booking_stage_based" / "triggers"),
+    start_template_stage="start",
+    report_template_stage="REPORT",
+    steps=[
+        lambda g, u: g.text(u, "hi"),
+        lambda g, u: g.button_reply(u, "Begin Booking"),
+        lambda g, u: g.text(u, "Bench User"),
+        lambda g, u: g.text(u, "1990"),
+        lambda g, u: g.text(u, "63-123456 A 00"),
+        lambda g, u: g.text(u, "2"),
+        lambda g, u: g.button_reply(u, "Confirm"),
+    ]
+)
+
+# stops at CONFIRM-OFFER, its on-receive hook simulates a 10s backend call
+EHAILING = Scenario(
+    name="ehailing",
+    templates_dir=str(EXAMPLES / "ehailing" / "templates"),
+    triggers_dir=str(EXAMPLES / "common" / "triggers"),
+    start_template_stage="START-MENU",
+    report_template_stage="REPORT",
+    steps=[
+        lambda g, u: g.text(u, "hi"),
+        lambda g, u: g.button_reply(u, "eHailing Bot"),
+        lambda g, u: g.button_reply(u, "Begin"),
+        lambda g, u: g.button_reply(u, "Standard"),
+        lambda g, u: g.location(u),
+        lambda g, u: g.location(u, -17.7840, 31.0530),
+        lambda g, u: g.button_reply(u, "Accept"),
+        lambda g, u: g.list_reply(u, "0", "Donald | $3.50"),
+    ]
+)
+
+SCENARIOS: Dict[str, Scenario] = {s.name: s for s in [BOOKING, EHAILING]}
@@ -0,0 +1,209 @@
+"""
+Session manager benchmarks.
+
+    python -m benchmarks.sessions                 # all benchmarks
+    python -m benchmarks.sessions contention -t 8 # 8 threads hammering distinct users
+    python -m benchmarks.sessions throughput --latency-ms 0.2
+    python -m benchmarks.sessions restore --sessions 1000000
+
+`contention` runs the per-message session access pattern of `Worker.work` from many threads,
+each thread serving its own users, against a single-lock (1 stripe) and a striped manager,
+unbounded and bounded by `max_sessions` to the number of users, timing the recency tracking of every access.
+
+`throughput` runs the same pattern against `DefaultSessionManager`, `JournaledSessionManager`
+and `RedisSessionManager` over the in-process redis stand-in, with & without the near-cache.
+
+`restore` fills a `DefaultSessionManager` with mid-conversation users, then times writing
+the snapshot and restoring it into a fresh manager, the warm restart of a deploy.
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.redis_stub import RedisStub
+from pywce import DefaultSessionManager, ISessionManager, SessionConstants, RedisSessionManager, EngineState, \
+    JournaledSessionManager
+
+
+@dataclass
+class SessionResult:
+    benchmark: str
+    manager: str
+    threads: int
+    ops: int
+    seconds: float
+    ops_per_s: float
+
+    def row(self) -> str:
+        return (f"{self.benchmark:<12} {self.manager:<24} {self.threads:>7} {self.ops:>9} "
+                f"{self.seconds:>8.3f} {self.ops_per_s:>12.1f}")
+
+    @staticmethod
+    def header() -> str:
+        return f"{'benchmark':<12} {'manager':<24} {'threads':>7} {'ops':>9} {'seconds':>8} {'ops/s':>12}"
+
+
+def message_ops(manager: ISessionManager, wa_id: str, i: int) -> int:
+    """
+    session calls of one message through the worker, returns the number of session operations
+    """
+    session = manager.session(wa_id)
+    session.get(wa_id, SessionConstants.EXTERNAL_CHAT_HANDLER)
+
+    # loaded once & saved once per message
+    state = EngineState.load(session, wa_id)
+    state.remember(f"wamid.{i}")
+    state.debounce_ms = i
+
+    session.get(wa_id, SessionConstants.DYNAMIC_RETRY)
+    session.save_prop(wa_id, "prop", i)
+
+    state.prev_stage, state.current_stage = state.current_stage, "B"
+    state.msg_id = f"wamid.{i}"
+
+    session.evict(wa_id, SessionConstants.DYNAMIC_RETRY)
+    session.get_global("global")
+    state.save(session, wa_id)
+
+    return 8
+
+
+def run_threads(name: str, label: str, manager: ISessionManager, threads: int, users_per_thread: int,
+                messages: int) -> SessionResult:
+    """
+    every thread replays `messages` messages round robin over its own users
+    """
+    barrier = threading.Barrier(threads + 1)
+    counts: Dict[int, int] = {}
+
+    def work(t: int):
+        wa_ids = [f"2637{t:03d}{u:05d}" for u in range(users_per_thread)]
+        ops = 0
+        barrier.wait()
+
+        for i in range(messages):
+            ops += message_ops(manager, wa_ids[i % users_per_thread], i)
+
+        counts[t] = ops
+
+    workers = [threading.Thread(target=work, args=(t,)) for t in range(threads)]
+    for w in workers:
+        w.start()
+
+    barrier.wait()
+    start = time.perf_counter()
+
+    for w in workers:
+        w.join()
+
+    seconds = time.perf_counter() - start
+    ops = sum(counts.values())
+
+    return SessionResult(benchmark=name, manager=label, threads=threads, ops=ops, seconds=seconds,
+                         ops_per_s=ops / seconds if seconds else 0.0)
+
+
+def run_contention(threads: int = 8, users_per_thread: int = 50, messages: int = 5_000) -> List[SessionResult]:
+    max_sessions = threads * users_per_thread
+
+    managers: Dict[str, Callable[[], ISessionManager]] = {
+        "single-lock": lambda: DefaultSessionManager(stripes=1),
+        "striped": lambda: DefaultSessionManager(),
+        "single-lock+bounded": lambda: DefaultSessionManager(stripes=1, max_sessions=max_sessions),
+        "striped+bounded": lambda: DefaultSessionManager(max_sessions=max_sessions),
+    }
+
+    return [run_threads("contention", label, factory(), threads, users_per_thread, messages)
+            for label, factory in managers.items()]
+
+
+def run_throughput(threads: int = 4, users_per_thread: int = 50, messages: int = 1_000,
+                   latency_ms: float = 0) -> List[SessionResult]:
+    results = [run_threads("throughput", "default", DefaultSessionManager(), threads, users_per_thread, messages)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        journaled = JournaledSessionManager(os.path.join(tmp, "sessions.snapshot"))
+        results.append(run_threads("throughput", "journaled", journaled, threads, users_per_thread, messages))
+        journaled.close()
+
+    with RedisStub(latency_ms=latency_ms) as server:
+        for label, near_cache_s in [("redis", None), ("redis+near-cache", 5)]:
+            client = server.client(pool_size=threads)
+            manager = RedisSessionManager(client=client, session_ttl_s=3600, near_cache_s=near_cache_s)
+
+            results.append(run_threads("throughput", label, manager, threads, users_per_thread, messages))
+            client.close()
+
+    return results
+
+
+def run_restore(sessions: int = 1_000_000) -> List[SessionResult]:
+    manager = DefaultSessionManager()
+
+    for i in range(sessions):
+        wa_id = f"2637{i:08d}"
+        manager.session(wa_id).save_prop(wa_id, "booking", {"date": "2024-01-01", "seats": 2})
+
+        state = EngineState(current_stage="BOOKING-CONFIRM", prev_stage="BOOKING-DATE", debounce_ms=i)
+        state.remember(f"wamid.{i}")
+        state.save(manager, wa_id)
+
+    def result(label: str, seconds: float) -> SessionResult:
+        return SessionResult(benchmark="restore", manager=label, threads=1, ops=sessions, seconds=seconds,
+                             ops_per_s=sessions / seconds if seconds else 0.0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sessions.snapshot")
+
+        start = time.perf_counter()
+        manager.snapshot(path)
+        snapshot_s = time.perf_counter() - start
+
+        del manager
+        restored = DefaultSessionManager()
+
+        start = time.perf_counter()
+        restored.restore(path)
+        restore_s = time.perf_counter() - start
+
+    return [result("snapshot", snapshot_s), result("restore", restore_s)]
+
+
+BENCHMARKS = {
+    "contention": lambda args: run_contention(threads=args.threads, messages=args.messages),
+    "throughput": lambda args: run_throughput(threads=args.threads, messages=args.messages // 5,
+                                              latency_ms=args.latency_ms),
+    "restore": lambda args: run_restore(sessions=args.sessions),
+}
+
+
+def main(argv: Optional[List[str]] = None) -> List[SessionResult]:
+    parser = argparse.ArgumentParser(description="pywce session manager benchmarks")
+    parser.add_argument("benchmarks", nargs="*", default=list(BENCHMARKS),
+                        help=f"benchmarks to run: {', '.join(BENCHMARKS)}")
+    parser.add_argument("-t", "--threads", type=int, default=8)
+    parser.add_argument("-m", "--messages", type=int, default=5_000, help="messages per thread")
+    parser.add_argument("--latency-ms", type=float, default=0, help="simulated redis round trip")
+    parser.add_argument("--sessions", type=int, default=1_000_000, help="sessions in the restore snapshot")
+    parser.add_argument("--json", action="store_true", help="print results as json lines")
+    args = parser.parse_args(argv)
+
+    results = []
+    if not args.json:
+        print(SessionResult.header())
+
+    for name in args.benchmarks:
+        for result in BENCHMARKS[name](args):
+            results.append(result)
+            print(json.dumps(asdict(result)) if args.json else result.row())
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
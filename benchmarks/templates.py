@@ -0,0 +1,241 @@
+"""
+Template storage benchmarks.
+
+    python -m benchmarks.templates                # all benchmarks
+    python -m benchmarks.templates lookup -m 20000
+    python -m benchmarks.templates load -r 20
+    python -m benchmarks.templates startup -t 20000
+    python -m benchmarks.templates parse -t 20000
+
+`lookup` replays the template lookups of one message, the current & next stage
+through `MessageProcessor` and `Worker`, against the validated model cache of
+`YamlJsonStorageManager.get`, against validating the raw template with the shared
+adapter of `Template.as_model` and through a new `TypeAdapter` on every lookup,
+the behaviour before the cache.
+
+`load` times a cold start of the template set: parsing & validating the YAML / JSON
+files with `YamlJsonStorageManager` against loading a bundle from `pywce compile`
+with `BundleStorageManager`, with & without the checksum check against the sources.
+
+`startup` generates a flow library of `-t` templates and compares loading it eagerly
+with `YamlJsonStorageManager` against the name -> byte range index of
+`LazyYamlJsonStorageManager`, then the lazy manager serving its first lookups.
+With `--memory` each step is repeated under tracemalloc, `kib` is the memory it leaves allocated,
+tracing slows the YAML parser down a lot so it is off by default.
+
+`parse` loads the same generated library eagerly with 1, 2, 4 .. cpu count parse processes.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, asdict
+from typing import Callable, List, Optional
+
+from pydantic import TypeAdapter
+
+from benchmarks.scenarios import SCENARIOS
+from pywce import storage
+from pywce.src.templates import EngineTemplate, Template
+
+# stage lookups per message: current stage, next stage & its pre-hook check
+LOOKUPS_PER_MESSAGE = 3
+
+
+@dataclass
+class TemplateResult:
+    benchmark: str
+    mode: str
+    ops: int
+    seconds: float
+    us_per_op: float
+    kib: float = 0.0
+
+    def row(self) -> str:
+        return f"{self.benchmark:<10} {self.mode:<16} {self.ops:>9} {self.seconds:>8.3f} {self.us_per_op:>12.2f} " \
+               f"{self.kib:>10.1f}"
+
+    @staticmethod
+    def header() -> str:
+        return f"{'benchmark':<10} {'mode':<16} {'ops':>9} {'seconds':>8} {'us/op':>12} {'kib':>10}"
+
+
+def load_manager(scenario: str = "booking") -> storage.YamlJsonStorageManager:
+    return storage.YamlJsonStorageManager(SCENARIOS[scenario].templates_dir, SCENARIOS[scenario].triggers_dir)
+
+
+def _time(label: str, messages: int, lookup: Callable[[str], EngineTemplate], names: List[str]) -> TemplateResult:
+    start = time.perf_counter()
+
+    for i in range(messages):
+        for j in range(LOOKUPS_PER_MESSAGE):
+            lookup(names[(i + j) % len(names)])
+
+    seconds = time.perf_counter() - start
+
+    return TemplateResult(benchmark="lookup", mode=label, ops=messages, seconds=seconds,
+                          us_per_op=seconds / messages * 1_000_000 if messages else 0.0)
+
+
+def run_lookup(messages: int = 20_000, scenario: str = "booking") -> List[TemplateResult]:
+    manager = load_manager(scenario)
+    names = list(manager._TEMPLATES)
+
+    def validate_per_lookup(name: str) -> EngineTemplate:
+        return TypeAdapter(EngineTemplate).validate_python(manager._TEMPLATES.get(name))
+
+    # the uncached path is orders of magnitude slower, a fraction of the messages is enough
+    return [
+        _time("adapter-per-get", max(1, messages // 20), validate_per_lookup, names),
+        _time("validate-per-get", messages, lambda name: Template.as_model(manager._TEMPLATES.get(name)), names),
+        _time("model-cache", messages, manager.get, names),
+    ]
+
+
+def run_load(rounds: int = 20, scenario: str = "booking") -> List[TemplateResult]:
+    templates_dir, triggers_dir = SCENARIOS[scenario].templates_dir, SCENARIOS[scenario].triggers_dir
+
+    def timed(label: str, load: Callable[[], storage.IStorageManager]) -> TemplateResult:
+        start = time.perf_counter()
+
+        for _ in range(rounds):
+            load()
+
+        seconds = time.perf_counter() - start
+        return TemplateResult(benchmark="load", mode=label, ops=rounds, seconds=seconds,
+                              us_per_op=seconds / rounds * 1_000_000 if rounds else 0.0)
+
+    def bundle(checked: bool) -> storage.IStorageManager:
+        manager = storage.BundleStorageManager(path, *((templates_dir, triggers_dir) if checked else ()))
+        manager.close()
+        return manager
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "templates.pywce")
+        storage.compile_bundle(templates_dir, triggers_dir, path)
+
+        return [
+            timed("yaml-json", lambda: storage.YamlJsonStorageManager(templates_dir, triggers_dir)),
+            timed("bundle+checksum", lambda: bundle(True)),
+            timed("bundle", lambda: bundle(False)),
+        ]
+
+
+# templates per generated library file
+LIBRARY_FILE_SIZE = 500
+
+
+def write_library(directory: str, templates: int) -> None:
+    """
+    a flow library of `templates` button stages chained in order, YAML files of `LIBRARY_FILE_SIZE` templates
+    """
+    for first in range(0, templates, LIBRARY_FILE_SIZE):
+        with open(os.path.join(directory, f"flow_{first // LIBRARY_FILE_SIZE:04d}.yaml"), "w") as f:
+            for i in range(first, min(first + LIBRARY_FILE_SIZE, templates)):
+                f.write(f'"STAGE_{i}":\n'
+                        f'  kind: button\n'
+                        f'  message:\n'
+                        f'    title: "Stage {i}"\n'
+                        f'    body: "Pick an option for step {i}"\n'
+                        f'    buttons: ["Next", "Back"]\n'
+                        f'  routes:\n'
+                        f'    "next": "STAGE_{(i + 1) % templates}"\n'
+                        f'    "back": "STAGE_{max(i - 1, 0)}"\n\n')
+
+
+def run_startup(templates: int = 5_000, lookups: int = 100, memory: bool = False) -> List[TemplateResult]:
+    results = []
+
+    def measured(label: str, ops: int, step: Callable[[], object], repeat: Callable[[], object] = None) -> object:
+        start = time.perf_counter()
+        kept = step()
+        seconds = time.perf_counter() - start
+
+        kib = 0.0
+        if memory:
+            tracemalloc.start()
+            traced = (repeat or step)()
+            kib = tracemalloc.get_traced_memory()[0] / 1024
+            tracemalloc.stop()
+            del traced
+
+        results.append(TemplateResult(benchmark="startup", mode=label, ops=ops, seconds=seconds,
+                                      us_per_op=seconds / ops * 1_000_000 if ops else 0.0, kib=kib))
+        return kept
+
+    def first_gets(manager: storage.LazyYamlJsonStorageManager) -> List[EngineTemplate]:
+        return [manager.get(name) for name in names]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        templates_dir, triggers_dir = os.path.join(tmp, "templates"), SCENARIOS["booking"].triggers_dir
+        os.mkdir(templates_dir)
+        write_library(templates_dir, templates)
+
+        names = [f"STAGE_{i * templates // lookups}" for i in range(lookups)]
+
+        measured("yaml-json", templates, lambda: storage.YamlJsonStorageManager(templates_dir, triggers_dir))
+        lazy = measured("lazy", templates, lambda: storage.LazyYamlJsonStorageManager(templates_dir, triggers_dir))
+        # traced on a fresh manager, the first one already holds the models
+        measured("lazy first-get", lookups, lambda: first_gets(lazy),
+                 lambda: first_gets(storage.LazyYamlJsonStorageManager(templates_dir, triggers_dir)))
+
+    return results
+
+
+def run_parse(templates: int = 5_000) -> List[TemplateResult]:
+    cpus = os.cpu_count() or 1
+    workers = sorted({1, cpus} | {2 ** i for i in range(1, cpus.bit_length()) if 2 ** i < cpus})
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        templates_dir, triggers_dir = os.path.join(tmp, "templates"), SCENARIOS["booking"].triggers_dir
+        os.mkdir(templates_dir)
+        write_library(templates_dir, templates)
+
+        for count in workers:
+            start = time.perf_counter()
+            storage.YamlJsonStorageManager(templates_dir, triggers_dir, parse_workers=count)
+            seconds = time.perf_counter() - start
+
+            results.append(TemplateResult(benchmark="parse", mode=f"workers={count}", ops=templates, seconds=seconds,
+                                          us_per_op=seconds / templates * 1_000_000 if templates else 0.0))
+
+    return results
+
+
+BENCHMARKS = {
+    "lookup": lambda args: run_lookup(messages=args.messages, scenario=args.scenario),
+    "load": lambda args: run_load(rounds=args.rounds, scenario=args.scenario),
+    "startup": lambda args: run_startup(templates=args.templates, memory=args.memory),
+    "parse": lambda args: run_parse(templates=args.templates),
+}
+
+
+def main(argv: Optional[List[str]] = None) -> List[TemplateResult]:
+    parser = argparse.ArgumentParser(description="pywce template storage benchmarks")
+    parser.add_argument("benchmarks", nargs="*", default=list(BENCHMARKS),
+                        help=f"benchmarks to run: {', '.join(BENCHMARKS)}")
+    parser.add_argument("-m", "--messages", type=int, default=20_000)
+    parser.add_argument("-r", "--rounds", type=int, default=20, help="cold loads of the template set")
+    parser.add_argument("-t", "--templates", type=int, default=5_000, help="templates in the generated library")
+    parser.add_argument("--memory", action="store_true", help="startup: also trace the memory of each step")
+    parser.add_argument("-s", "--scenario", default="booking", help="template set of a benchmarks.run scenario")
+    parser.add_argument("--json", action="store_true", help="print results as json lines")
+    args = parser.parse_args(argv)
+
+    results = []
+    if not args.json:
+        print(TemplateResult.header())
+
+    for name in args.benchmarks:
+        for result in BENCHMARKS[name](args):
+            results.append(result)
+            print(json.dumps(asdict(result)) if args.json else result.row())
+
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -15,13 +15,17 @@ Author: Donald Chinhuru
 """
 
 import pywce.src.templates as template
-from pywce.modules import client, DefaultSessionManager, storage
-from pywce.modules.session import ISessionManager
+from pywce.modules import client, DefaultSessionManager, SqliteSessionManager, RedisSessionManager, RespClient, \
+    PickleSerializer, RestrictedPickleSerializer, JournaledSessionManager, SessionUnitOfWork, IMessageDedupe, \
+    GlobalMessageDedupe, RedisMessageDedupe, storage, tracing
+from pywce.modules.session import ISessionManager, IAsyncSessionManager
+from pywce.modules.session.async_adapters import AsyncSessionAdapter, SyncSessionAdapter
 from pywce.src.constants import SessionConstants, EngineConstants, TemplateTypeConstants
 from pywce.src.engine import Engine
 from pywce.src.exceptions import HookException, FlowEndpointException, EngineResponseException
-from pywce.src.models import HookArg, TemplateDynamicBody, EngineConfig, ExternalHandlerResponse
-from pywce.src.services import HookService, hook, VisualTranslator
+from pywce.src.models import HookArg, TemplateDynamicBody, EngineConfig, ExternalHandlerResponse, EngineState
+from pywce.src.services import HookService, hook, VisualTranslator, EngineDispatcher, AsyncEngineDispatcher, \
+    EngineProcessRunner, AdmissionController, ShedPolicy, TrafficRecorder, TrafficReplayer
 from pywce.src.utils import HookUtil
 
 __author__ = "Donald Chinhuru"
@@ -32,13 +36,35 @@ __all__ = [
     # modules
     "client",
     "ISessionManager",
+    "IAsyncSessionManager",
+    "AsyncSessionAdapter",
+    "SyncSessionAdapter",
     "DefaultSessionManager",
+    "SqliteSessionManager",
+    "JournaledSessionManager",
+    "RedisSessionManager",
+    "RespClient",
+    "PickleSerializer",
+    "RestrictedPickleSerializer",
+    "IMessageDedupe",
+    "GlobalMessageDedupe",
+    "RedisMessageDedupe",
+    "SessionUnitOfWork",
     "storage",
+    "tracing",
 
     # engine
     "Engine",
     "EngineConfig",
     "ExternalHandlerResponse",
+    "EngineState",
+    "EngineDispatcher",
+    "AsyncEngineDispatcher",
+    "EngineProcessRunner",
+    "AdmissionController",
+    "ShedPolicy",
+    "TrafficRecorder",
+    "TrafficReplayer",
 
     # templates
     "template",
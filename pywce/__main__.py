@@ -0,0 +1,56 @@
+"""
+pywce command line
+
+    pywce compile templates/ triggers/ -o templates.pywce           # validate & write a template bundle
+    pywce compile templates/ triggers/ -o templates.pywce --check   # exit 1 if the bundle is stale
+
+also available as `python -m pywce`
+"""
+import argparse
+import sys
+from typing import List, Optional
+
+from pywce.modules.storage.bundle import BundleStorageManager, compile_bundle
+from pywce.src.exceptions import EngineException
+
+
+def _compile(args) -> int:
+    if args.check:
+        try:
+            BundleStorageManager(args.output, args.template_dir, args.trigger_dir).close()
+        except (EngineException, OSError) as e:
+            print(f"stale: {e}", file=sys.stderr)
+            return 1
+
+        print(f"up to date: {args.output}")
+        return 0
+
+    try:
+        header = compile_bundle(args.template_dir, args.trigger_dir, args.output)
+    except EngineException as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    print(f"compiled {len(header['templates'])} templates & {len(header['triggers'])} triggers "
+          f"to {args.output}, checksum {header['checksum'][:12]}")
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="pywce", description="pywce command line")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compile_parser = commands.add_parser("compile", help="compile templates & triggers into a binary bundle")
+    compile_parser.add_argument("template_dir")
+    compile_parser.add_argument("trigger_dir")
+    compile_parser.add_argument("-o", "--output", default="templates.pywce", help="bundle file")
+    compile_parser.add_argument("--check", action="store_true",
+                                help="only check the bundle against the source files, exit 1 if stale")
+    compile_parser.set_defaults(run=_compile)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,16 @@
 import pywce.modules.storage as storage
+import pywce.modules.tracing as tracing
 import pywce.modules.whatsapp as client
-from pywce.modules.session import ISessionManager
+from pywce.modules.session import ISessionManager, IAsyncSessionManager
+from pywce.modules.session.async_adapters import AsyncSessionAdapter, SyncSessionAdapter
 from pywce.modules.session.dict_session_manager import DefaultSessionManager
+from pywce.modules.session.redis_session_manager import RedisSessionManager, RespClient, PickleSerializer, \
+    RestrictedPickleSerializer
+from pywce.modules.session.sqlite_session_manager import SqliteSessionManager
+from pywce.modules.session.journal_session_manager import JournaledSessionManager
+from pywce.modules.session.dedupe import IMessageDedupe, GlobalMessageDedupe, \
+    RedisMessageDedupe
+from pywce.modules.session.unit_of_work import SessionUnitOfWork
 
 __version__ = "0.0.1"
 __author__ = "DonnC <github.com/DonnC>"
@@ -96,3 +96,84 @@ class ISessionManager(ABC):
     @abstractmethod
     def key_in_session(self, session_id: str, key: str, check_global: bool = True) -> bool:
         pass
+
+
+class IAsyncSessionManager(ABC):
+    """
+        asyncio counterpart of [ISessionManager], for network backed session stores
+
+        Same contract as [ISessionManager], every call is awaited
+    """
+
+    @property
+    @abstractmethod
+    def prop_key(self) -> str:
+        pass
+
+    @abstractmethod
+    async def session(self, session_id: str) -> "IAsyncSessionManager":
+        pass
+
+    @abstractmethod
+    async def save(self, session_id: str, key: str, data: Any) -> None:
+        pass
+
+    @abstractmethod
+    async def save_all(self, session_id: str, data: Dict[str, Any]) -> None:
+        pass
+
+    @abstractmethod
+    async def save_global(self, key: str, data: Any) -> None:
+        pass
+
+    @abstractmethod
+    async def save_prop(self, session_id: str, prop_key: str, data: Any) -> None:
+        pass
+
+    @abstractmethod
+    async def get(self, session_id: str, key: str, t: Type[T] = None) -> Union[Any, T]:
+        pass
+
+    @abstractmethod
+    async def get_global(self, key: str, t: Type[T] = None) -> Union[Any, T]:
+        pass
+
+    @abstractmethod
+    async def get_from_props(self, session_id: str, prop_key: str, t: Type[T] = None) -> Union[Any, T]:
+        pass
+
+    @abstractmethod
+    async def get_user_props(self, session_id: str) -> Union[Dict[str, Any], None]:
+        pass
+
+    @abstractmethod
+    async def fetch_all(self, session_id: str, is_global: bool) -> Union[Dict[str, Any], None]:
+        pass
+
+    @abstractmethod
+    async def evict(self, session_id: str, key: str) -> None:
+        pass
+
+    @abstractmethod
+    async def evict_all(self, session_id: str, keys: List[str]) -> None:
+        pass
+
+    @abstractmethod
+    async def evict_global(self, key: str) -> None:
+        pass
+
+    @abstractmethod
+    async def clear(self, session_id: str, retain_keys: List[str] = None) -> None:
+        pass
+
+    @abstractmethod
+    async def clear_global(self) -> None:
+        pass
+
+    @abstractmethod
+    async def evict_prop(self, session_id: str, prop_key: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def key_in_session(self, session_id: str, key: str, check_global: bool = True) -> bool:
+        pass
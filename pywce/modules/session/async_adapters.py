@@ -0,0 +1,182 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import Executor
+from typing import Any, Dict, Type, List, Union, Optional, Awaitable, Callable
+
+from pywce.modules.session import ISessionManager, IAsyncSessionManager
+from . import T
+
+
+class AsyncSessionAdapter(IAsyncSessionManager):
+    """
+        Exposes a sync [ISessionManager] as an [IAsyncSessionManager]
+
+        Every call runs on `executor`, the loop's default thread pool if not given,
+        so blocking session stores do not stall the event loop
+    """
+
+    def __init__(self, manager: ISessionManager, executor: Optional[Executor] = None):
+        self.manager = manager
+        self.executor = executor
+
+    async def _run(self, fn: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(fn, *args))
+
+    @property
+    def prop_key(self) -> str:
+        return self.manager.prop_key
+
+    async def session(self, session_id: str) -> IAsyncSessionManager:
+        await self._run(self.manager.session, session_id)
+        return self
+
+    async def save(self, session_id: str, key: str, data: Any) -> None:
+        await self._run(self.manager.save, session_id, key, data)
+
+    async def save_all(self, session_id: str, data: Dict[str, Any]) -> None:
+        await self._run(self.manager.save_all, session_id, data)
+
+    async def save_global(self, key: str, data: Any) -> None:
+        await self._run(self.manager.save_global, key, data)
+
+    async def save_prop(self, session_id: str, prop_key: str, data: Any) -> None:
+        await self._run(self.manager.save_prop, session_id, prop_key, data)
+
+    async def get(self, session_id: str, key: str, t: Type[T] = None) -> Union[Any, T]:
+        return await self._run(self.manager.get, session_id, key, t)
+
+    async def get_global(self, key: str, t: Type[T] = None) -> Union[Any, T]:
+        return await self._run(self.manager.get_global, key, t)
+
+    async def get_from_props(self, session_id: str, prop_key: str, t: Type[T] = None) -> Union[Any, T]:
+        return await self._run(self.manager.get_from_props, session_id, prop_key, t)
+
+    async def get_user_props(self, session_id: str) -> Union[Dict[str, Any], None]:
+        return await self._run(self.manager.get_user_props, session_id)
+
+    async def fetch_all(self, session_id: str, is_global: bool = False) -> Union[Dict[str, Any], None]:
+        return await self._run(self.manager.fetch_all, session_id, is_global)
+
+    async def evict(self, session_id: str, key: str) -> None:
+        await self._run(self.manager.evict, session_id, key)
+
+    async def evict_all(self, session_id: str, keys: List[str]) -> None:
+        await self._run(self.manager.evict_all, session_id, keys)
+
+    async def evict_global(self, key: str) -> None:
+        await self._run(self.manager.evict_global, key)
+
+    async def clear(self, session_id: str, retain_keys: List[str] = None) -> None:
+        await self._run(self.manager.clear, session_id, retain_keys)
+
+    async def clear_global(self) -> None:
+        await self._run(self.manager.clear_global)
+
+    async def evict_prop(self, session_id: str, prop_key: str) -> bool:
+        return await self._run(self.manager.evict_prop, session_id, prop_key)
+
+    async def key_in_session(self, session_id: str, key: str, check_global: bool = True) -> bool:
+        return await self._run(self.manager.key_in_session, session_id, key, check_global)
+
+
+class SyncSessionAdapter(ISessionManager):
+    """
+        Exposes an [IAsyncSessionManager] to sync code as an [ISessionManager]
+
+        Coroutines run on `loop`, which must be running on another thread. If not given,
+        the adapter starts its own event loop on a daemon thread.
+
+        Calls block the calling thread, do not call from the adapter's own loop.
+    """
+
+    def __init__(self, manager: IAsyncSessionManager, loop: Optional[asyncio.AbstractEventLoop] = None,
+                 timeout_s: Optional[float] = None):
+        self.manager = manager
+        self.timeout_s = timeout_s
+        self._thread: Optional[threading.Thread] = None
+
+        if loop is None:
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=loop.run_forever, name="pywce-session-loop", daemon=True)
+            self._thread.start()
+
+        self.loop = loop
+
+    def _run(self, coro: Awaitable) -> Any:
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is self.loop:
+            coro.close()
+            raise RuntimeError("SyncSessionAdapter called from its own event loop, await the async manager instead")
+
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(self.timeout_s)
+
+    def close(self) -> None:
+        """
+        stop the adapter's own event loop, if it started one
+        """
+        if self._thread is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+            self.loop.close()
+            self._thread = None
+
+    @property
+    def prop_key(self) -> str:
+        return self.manager.prop_key
+
+    def session(self, session_id: str) -> ISessionManager:
+        self._run(self.manager.session(session_id))
+        return self
+
+    def save(self, session_id: str, key: str, data: Any) -> None:
+        self._run(self.manager.save(session_id, key, data))
+
+    def save_all(self, session_id: str, data: Dict[str, Any]) -> None:
+        self._run(self.manager.save_all(session_id, data))
+
+    def save_global(self, key: str, data: Any) -> None:
+        self._run(self.manager.save_global(key, data))
+
+    def save_prop(self, session_id: str, prop_key: str, data: Any) -> None:
+        self._run(self.manager.save_prop(session_id, prop_key, data))
+
+    def get(self, session_id: str, key: str, t: Type[T] = None) -> Union[Any, T]:
+        return self._run(self.manager.get(session_id, key, t))
+
+    def get_global(self, key: str, t: Type[T] = None) -> Union[Any, T]:
+        return self._run(self.manager.get_global(key, t))
+
+    def get_from_props(self, session_id: str, prop_key: str, t: Type[T] = None) -> Union[Any, T]:
+        return self._run(self.manager.get_from_props(session_id, prop_key, t))
+
+    def get_user_props(self, session_id: str) -> Union[Dict[str, Any], None]:
+        return self._run(self.manager.get_user_props(session_id))
+
+    def fetch_all(self, session_id: str, is_global: bool = False) -> Union[Dict[str, Any], None]:
+        return self._run(self.manager.fetch_all(session_id, is_global))
+
+    def evict(self, session_id: str, key: str) -> None:
+        self._run(self.manager.evict(session_id, key))
+
+    def evict_all(self, session_id: str, keys: List[str]) -> None:
+        self._run(self.manager.evict_all(session_id, keys))
+
+    def evict_global(self, key: str) -> None:
+        self._run(self.manager.evict_global(key))
+
+    def clear(self, session_id: str, retain_keys: List[str] = None) -> None:
+        self._run(self.manager.clear(session_id, retain_keys))
+
+    def clear_global(self) -> None:
+        self._run(self.manager.clear_global())
+
+    def evict_prop(self, session_id: str, prop_key: str) -> bool:
+        return self._run(self.manager.evict_prop(session_id, prop_key))
+
+    def key_in_session(self, session_id: str, key: str, check_global: bool = True) -> bool:
+        return self._run(self.manager.key_in_session(session_id, key, check_global))
@@ -0,0 +1,115 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional, Set
+
+from pywce.modules.session import ISessionManager
+from pywce.modules.session.redis_session_manager import RespClient
+
+
+class IMessageDedupe(ABC):
+    """
+        Duplicate webhook message detection, keyed by message id
+    """
+
+    @abstractmethod
+    def seen(self, session: ISessionManager, session_id: str, msg_id: str) -> bool:
+        """
+        record `msg_id` as seen, as one atomic set-if-absent
+
+        :param session: the user session, for implementations keeping history per user
+        :return: True if `msg_id` was already recorded, i.e. a duplicate
+        """
+        pass
+
+
+class MessageHistory:
+    """
+        Bounded ring of the last `size` message ids with a set index, O(1) add & lookup
+    """
+    __slots__ = ("_ring", "_ids")
+
+    def __init__(self, size: int, ids: Iterable[str] = ()):
+        self._ring: Deque[str] = deque(maxlen=size)
+        self._ids: Set[str] = set()
+
+        for msg_id in ids:
+            self.add(msg_id)
+
+    def __contains__(self, msg_id: str) -> bool:
+        return msg_id in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ring)
+
+    def __getstate__(self):
+        # tuple() copies the ring in one step, safe to pickle while another thread adds
+        return self._ring.maxlen, tuple(self._ring)
+
+    def __setstate__(self, state):
+        size, ids = state
+        self._ring = deque(ids, maxlen=size)
+        self._ids = set(ids)
+
+    def add(self, msg_id: str) -> bool:
+        """
+        :return: True if added, False if already present
+        """
+        if msg_id in self._ids:
+            return False
+
+        if len(self._ring) == self._ring.maxlen:
+            self._ids.discard(self._ring[0])
+
+        self._ring.append(msg_id)
+        self._ids.add(msg_id)
+        return True
+
+
+class GlobalMessageDedupe(IMessageDedupe):
+    """
+        Process-global message id index, remembers every id for at least `window_s`
+
+        Ids are kept in `buckets` time buckets covering the window, the oldest bucket is dropped
+        as time moves on, so memory is bounded by the message rate instead of the number of users.
+        Webhooks older than `EngineConfig.webhook_timestamp_threshold_s` are dropped before dedupe,
+        a window a few times that is enough.
+    """
+
+    def __init__(self, window_s: float = 300, buckets: int = 10):
+        self.bucket_s = window_s / buckets
+        self.buckets = buckets
+
+        self._index: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def seen(self, session: Optional[ISessionManager], session_id: str, msg_id: str) -> bool:
+        current = int(time.monotonic() // self.bucket_s)
+
+        with self._lock:
+            for bucket in [b for b in self._index if b <= current - self.buckets]:
+                self._index.pop(bucket)
+
+            for ids in self._index.values():
+                if msg_id in ids:
+                    return True
+
+            self._index.setdefault(current, set()).add(msg_id)
+            return False
+
+
+class RedisMessageDedupe(IMessageDedupe):
+    """
+        Shared message id index on a redis protocol server, one `SET NX EX` per message
+
+        Use with `RedisSessionManager` so horizontally scaled engines agree on duplicates.
+    """
+
+    def __init__(self, client: RespClient, prefix: str = "pywce:msg", ttl_s: int = 300):
+        self.client = client
+        self.prefix = prefix
+        self.ttl_s = ttl_s
+
+    def seen(self, session: Optional[ISessionManager], session_id: str, msg_id: str) -> bool:
+        return self.client.execute("SET", f"{self.prefix}:{msg_id}", 1, "NX", "EX", self.ttl_s) is None
@@ -1,9 +1,18 @@
+import gc
+import itertools
+import logging
+import os
+import pickle
 import threading
-from typing import Any, Dict, Type, List, Union
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Type, List, Union, Optional, Callable
 
 from pywce.modules.session import ISessionManager
 from . import T
 
+_logger = logging.getLogger(__name__)
+
 
 class DefaultSessionManager(ISessionManager):
     """
@@ -11,100 +20,440 @@ class DefaultSessionManager(ISessionManager):
 
         Uses python dict datatype to implement simple data storage
 
-        Uses a thread-safe approach using threading.Lock() with context for safety
+        Thread-safe with striped locking: each session id maps to one of `stripes` locks
+        so different users rarely contend, the global session has its own lock.
+        Compound operations (`save_all`, `evict_all`, `save_prop`, `evict_prop`) are atomic per user.
+
+        Memory can be bounded: with `max_sessions` the least recently used session is evicted
+        once the limit is reached, with `idle_ttl_s` sessions not used for that long are evicted
+        by `sweep()`, run every `sweep_interval_s` on a background thread if set.
+        Every read & write of a user refreshes its recency, a session in use by a message is the most
+        recently used one. A write to an evicted session re-creates it, a read of one returns None.
+        Recency is kept per stripe under the stripe's lock, so bounding adds no lock shared by all users.
+        Evictions, and `on_evict`, run after the caller's stripe lock is released.
+
+        Idle time is tracked by the manager on every access rather than read from the engine's
+        last activity: the manager also serves hooks & non-engine callers, and keeping sessions ordered
+        by last use lets `sweep()` stop at the first session still in use instead of scanning all of them.
+        Keep `idle_ttl_s` above `EngineConfig.inactivity_timeout_min` * 60, an evicted user starts afresh
+        the same way an inactive one does.
+
+        Sessions survive restarts with `snapshot_path`: the snapshot is restored on start,
+        written by `close()` and every `snapshot_interval_s` if set. See `snapshot()`.
+
+        :param on_evict: called with (session_id, session data) for every evicted session, e.g. to persist it
     """
     DEFAULT_PROP_KEY: str = "pywce_prop_key"
+    DEFAULT_STRIPES: int = 64
+
+    SNAPSHOT_FORMAT: str = "pywce-sessions/1"
+    SNAPSHOT_CHUNK: int = 1000
 
-    def __init__(self):
+    def __init__(self, stripes: int = DEFAULT_STRIPES, max_sessions: Optional[int] = None,
+                 idle_ttl_s: Optional[float] = None, sweep_interval_s: Optional[float] = None,
+                 on_evict: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                 snapshot_path: Optional[str] = None, snapshot_interval_s: Optional[float] = None):
         self.global_session: Dict[str, Any] = {}
         self.sessions: Dict[str, Dict[str, Any]] = {}
+
+        # guards the global session
         self.lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(max(1, stripes))]
+
+        self.max_sessions = max_sessions
+        self.idle_ttl_s = idle_ttl_s
+        self.on_evict = on_evict
+        self._bounded = max_sessions is not None or idle_ttl_s is not None
+        # per stripe, session id -> (use sequence, monotonic time) ordered by last use, oldest first, when bounded
+        self._recency: List[Dict[str, tuple]] = [OrderedDict() for _ in self._stripes]
+        self._clock = itertools.count()
+        # serializes evictions over `max_sessions`, never taken with a stripe lock held
+        self._evict_lock = threading.Lock()
+
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        self.snapshot_path = snapshot_path
+        self._snapshotter: Optional[threading.Thread] = None
+        self._snapshot_lock = threading.Lock()
+
+        if snapshot_path is not None and os.path.exists(snapshot_path):
+            self.restore(snapshot_path)
+
+        if sweep_interval_s is not None and idle_ttl_s is not None:
+            self._sweeper = threading.Thread(target=self._sweep_loop, args=(sweep_interval_s,),
+                                             name="pywce-session-sweeper", daemon=True)
+            self._sweeper.start()
+
+        if snapshot_interval_s is not None and snapshot_path is not None:
+            self._snapshotter = threading.Thread(target=self._snapshot_loop, args=(snapshot_interval_s,),
+                                                 name="pywce-session-snapshot", daemon=True)
+            self._snapshotter.start()
 
     @property
     def prop_key(self) -> str:
         return self.DEFAULT_PROP_KEY
 
+    def _index(self, session_id: str) -> int:
+        return hash(session_id) % len(self._stripes)
+
+    def _lock(self, session_id: str) -> threading.Lock:
+        return self._stripes[self._index(session_id)]
+
     def session(self, session_id: str) -> ISessionManager:
-        with self.lock:
-            if session_id not in self.sessions:
+        with self._lock(session_id):
+            if self._bounded:
+                self._touch(session_id, create=True)
+            elif session_id not in self.sessions:
                 self.sessions[session_id] = {}
                 self.sessions[session_id][self.prop_key] = {}
 
+        self._trim()
         return self
 
+    def _touch(self, session_id: str, create: bool) -> Optional[Dict[str, Any]]:
+        """
+        mark a session as most recently used, re-creating it if evicted & `create` is set,
+        call with the user's stripe lock held
+
+        :return: the session data, None if the session does not exist
+        """
+        data = self.sessions.get(session_id)
+
+        if data is None:
+            if not create:
+                return None
+
+            data = self.sessions[session_id] = {self.prop_key: {}}
+
+        recency = self._recency[self._index(session_id)]
+        recency[session_id] = (next(self._clock), time.monotonic())
+        recency.move_to_end(session_id)
+
+        return data
+
+    def _trim(self) -> None:
+        """
+        evict the least recently used sessions over `max_sessions`, call without a stripe lock held
+
+        The oldest session is the oldest of the stripes' oldest ones, it is dropped only if not used since.
+        """
+        if self.max_sessions is None or len(self.sessions) <= self.max_sessions:
+            return
+
+        evicted = []
+
+        with self._evict_lock:
+            while len(self.sessions) > self.max_sessions:
+                oldest = None
+
+                for index, recency in enumerate(self._recency):
+                    head = self._head(index, recency)
+
+                    if head is not None and (oldest is None or head[1] < oldest[2]):
+                        oldest = (index, *head)
+
+                if oldest is None:
+                    break
+
+                index, session_id, used = oldest
+
+                with self._stripes[index]:
+                    if self._recency[index].get(session_id) == used:
+                        self._recency[index].pop(session_id)
+                        evicted.append((session_id, self.sessions.pop(session_id)))
+
+        self._evicted(evicted)
+
+    def _head(self, index: int, recency: Dict[str, tuple]) -> Optional[tuple]:
+        """
+        the least recently used (session_id, use) of a stripe, peeked without its lock,
+        the caller re-checks it under the lock before evicting
+        """
+        try:
+            return next(iter(recency.items()), None)
+        except RuntimeError:
+            # the stripe changed while peeking
+            with self._stripes[index]:
+                return next(iter(recency.items()), None)
+
+    def _user(self, session_id: str, create: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        the data of a user session, call with the user's stripe lock held
+        """
+        if self._bounded:
+            return self._touch(session_id, create)
+
+        return self.sessions.get(session_id)
+
+    def _evicted(self, evicted: List) -> None:
+        if self.on_evict is None:
+            return
+
+        for session_id, data in evicted:
+            try:
+                self.on_evict(session_id, data)
+            except Exception as e:
+                _logger.error("Session eviction callback failed for: %s, error: %s", session_id, e)
+
+    def sweep(self) -> int:
+        """
+        evict every session idle for longer than `idle_ttl_s`
+
+        :return: number of evicted sessions
+        """
+        if self.idle_ttl_s is None:
+            return 0
+
+        evicted = []
+        deadline = time.monotonic() - self.idle_ttl_s
+
+        for lock, recency in zip(self._stripes, self._recency):
+            with lock:
+                while recency:
+                    session_id, (_, used) = next(iter(recency.items()))
+
+                    if used > deadline:
+                        break
+
+                    recency.pop(session_id)
+                    evicted.append((session_id, self.sessions.pop(session_id)))
+
+        self._evicted(evicted)
+        return len(evicted)
+
+    def _sweep_loop(self, interval_s: float) -> None:
+        while not self._stop.wait(interval_s):
+            try:
+                self.sweep()
+            except Exception as e:
+                _logger.error("Session sweep failed: %s", e)
+
+    def _snapshot_loop(self, interval_s: float) -> None:
+        while not self._stop.wait(interval_s):
+            try:
+                self.snapshot()
+            except Exception as e:
+                _logger.error("Session snapshot failed: %s", e)
+
+    def _copy_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock(session_id):
+            data = self.sessions.get(session_id)
+
+            if data is None:
+                return None
+
+            data = dict(data)
+            if isinstance(data.get(self.prop_key), dict):
+                data[self.prop_key] = dict(data[self.prop_key])
+
+            return data
+
+    def snapshot(self, path: Optional[str] = None) -> int:
+        """
+        write all sessions & the global session to `path`, `snapshot_path` if not given
+
+        The file is a stream of pickles: a header, the global session, then chunks of
+        `SNAPSHOT_CHUNK` (session_id, data) pairs and an end marker. It is written next to
+        `path` and renamed over it, a crash mid-write leaves the previous snapshot intact.
+
+        Each session is copied under its own lock, the snapshot is consistent per user
+        while the manager keeps serving.
+
+        :return: number of sessions written
+        """
+        path = path or self.snapshot_path
+        tmp = f"{path}.tmp"
+        written = 0
+
+        with self._snapshot_lock, open(tmp, "wb") as f:
+            pickle.dump(self.SNAPSHOT_FORMAT, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            with self.lock:
+                global_session = dict(self.global_session)
+            pickle.dump(global_session, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            session_ids = list(self.sessions)
+
+            for start in range(0, len(session_ids), self.SNAPSHOT_CHUNK):
+                chunk = []
+
+                for session_id in session_ids[start:start + self.SNAPSHOT_CHUNK]:
+                    data = self._copy_session(session_id)
+                    if data is not None:
+                        chunk.append((session_id, data))
+
+                pickle.dump(chunk, f, protocol=pickle.HIGHEST_PROTOCOL)
+                written += len(chunk)
+
+            pickle.dump(None, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp, path)
+        _logger.debug("Session snapshot written: %s, sessions: %s", path, written)
+
+        return written
+
+    def restore(self, path: Optional[str] = None) -> int:
+        """
+        load a snapshot written by `snapshot()`, one chunk at a time so a large
+        snapshot is never held in memory twice
+
+        Restored sessions replace sessions with the same id, others are kept.
+        A bounded manager keeps only the most recent `max_sessions`.
+
+        :return: number of sessions restored
+        """
+        path = path or self.snapshot_path
+
+        # restoring only allocates, cyclic gc passes over the growing heap would dominate the load time
+        gc_enabled = gc.isenabled()
+        gc.disable()
+
+        try:
+            restored = self._restore(path)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        _logger.debug("Session snapshot restored: %s, sessions: %s", path, restored)
+
+        return restored
+
+    def _restore(self, path: str) -> int:
+        restored = 0
+
+        with open(path, "rb") as f:
+            if pickle.load(f) != self.SNAPSHOT_FORMAT:
+                raise ValueError(f"Not a session snapshot: {path}")
+
+            global_session = pickle.load(f)
+            with self.lock:
+                self.global_session.update(global_session)
+
+            while (chunk := pickle.load(f)) is not None:
+                for session_id, data in chunk:
+                    with self._lock(session_id):
+                        self.sessions[session_id] = data
+
+                        if self._bounded:
+                            self._touch(session_id, create=False)
+
+                self._trim()
+                restored += len(chunk)
+
+        return restored
+
+    def close(self) -> None:
+        """
+        stop the background threads, if any, and write a final snapshot if `snapshot_path` is set
+        """
+        self._stop.set()
+
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
+
+        if self._snapshotter is not None:
+            self._snapshotter.join()
+            self._snapshotter = None
+
+        if self.snapshot_path is not None:
+            self.snapshot()
+
     def save(self, session_id: str, key: str, data: Any) -> None:
-        with self.lock:
-            if session_id in self.sessions:
-                self.sessions[session_id][key] = data
+        with self._lock(session_id):
+            user_session = self._user(session_id, create=True)
+
+            if user_session is not None:
+                user_session[key] = data
+
+        self._trim()
 
     def get(self, session_id: str, key: str, t: Type[T] = None) -> Union[Any, T]:
-        with self.lock:
-            data = self.sessions.get(session_id).get(key)
+        with self._lock(session_id):
+            user_session = self._user(session_id)
+            data = None if user_session is None else user_session.get(key)
 
-            if data is not None and t is not None:
-                return t(data)
+        if data is not None and t is not None:
+            return t(data)
 
-            return data
+        return data
 
     def get_global(self, key: str, t: Type[T] = None) -> Union[Any, T]:
         with self.lock:
             data = self.global_session.get(key)
 
-            if data is not None and t is not None:
-                return t(data)
+        if data is not None and t is not None:
+            return t(data)
 
-            return data
+        return data
 
     def fetch_all(self, session_id: str, is_global: bool = False) -> Union[Dict[str, Any], None]:
-        with self.lock:
-            if is_global:
+        if is_global:
+            with self.lock:
                 return self.global_session
-            return self.sessions.get(session_id)
+
+        with self._lock(session_id):
+            return self._user(session_id)
 
     def evict(self, session_id: str, key: str) -> None:
-        with self.lock:
-            if key in self.sessions.get(session_id, {}):
-                self.sessions.get(session_id).pop(key)
+        with self._lock(session_id):
+            (self._user(session_id) or {}).pop(key, None)
 
     def save_all(self, session_id: str, data: Dict[str, Any]) -> None:
-        for k, v in data.items():
-            self.save(session_id, k, v)
+        with self._lock(session_id):
+            user_session = self._user(session_id, create=True)
+
+            if user_session is not None:
+                user_session.update(data)
+
+        self._trim()
 
     def evict_all(self, session_id: str, keys: List[str]) -> None:
-        for k in keys:
-            self.evict(session_id, k)
+        with self._lock(session_id):
+            user_session = self._user(session_id) or {}
+
+            for k in keys:
+                user_session.pop(k, None)
 
     def evict_global(self, key: str) -> None:
         with self.lock:
-            if key in self.global_session:
-                self.global_session.pop(key)
+            self.global_session.pop(key, None)
 
     def clear(self, session_id: str, retain_keys: List[str] = None) -> None:
-        with self.lock:
+        with self._lock(session_id):
             if retain_keys is None or retain_keys == []:
-                self.sessions[session_id] = {}
-                return
+                if self._bounded:
+                    self._touch(session_id, create=True).clear()
+                else:
+                    self.sessions[session_id] = {}
+            else:
+                data = self._user(session_id)
+                if data is None:
+                    return
 
-            data = self.sessions.get(session_id, {})
-            if data is None:
-                return
+                keys_to_remove = [k for k in data.keys()
+                                  if k not in (retain_keys or []) and k != self.prop_key]
 
-            keys_to_remove = [k for k in data.keys()
-                              if k not in (retain_keys or []) and k != self.prop_key]
+                for key in keys_to_remove:
+                    data.pop(key, None)
 
-            for key in keys_to_remove:
-                if key in self.sessions[session_id]:
-                    self.sessions[session_id].pop(key)
+        self._trim()
 
     def clear_global(self) -> None:
-        self.global_session = {}
+        with self.lock:
+            self.global_session = {}
 
     def key_in_session(self, session_id: str, key: str, check_global: bool = True) -> bool:
-        in_global = self.global_session.get(key) is not None
-        in_user = self.sessions.get(session_id).get(key) is not None
+        with self._lock(session_id):
+            user_session = self._user(session_id)
+            in_user = user_session is not None and user_session.get(key) is not None
 
-        if check_global:
-            return in_global or in_user
+        if check_global and not in_user:
+            with self.lock:
+                return self.global_session.get(key) is not None
 
         return in_user
 
@@ -112,21 +461,20 @@ class DefaultSessionManager(ISessionManager):
         return self.get(session_id, self.prop_key)
 
     def evict_prop(self, session_id: str, prop_key: str) -> bool:
-        current_props = self.get_user_props(session_id)
-
-        if prop_key not in current_props:
-            return False
+        with self._lock(session_id):
+            current_props = (self._user(session_id) or {}).get(self.prop_key)
 
-        current_props.pop(prop_key)
+            if current_props is None or prop_key not in current_props:
+                return False
 
-        self.save(session_id, self.prop_key, current_props)
+            current_props.pop(prop_key)
 
-        return True
+            return True
 
     def get_from_props(self, session_id: str, prop_key: str, t: Type[T] = None) -> Union[Any, T]:
         props = self.get_user_props(session_id)
 
-        if prop_key not in props or props.get(prop_key) is None:
+        if props is None or props.get(prop_key) is None:
             return None
 
         prop = props.get(prop_key)
@@ -141,6 +489,10 @@ class DefaultSessionManager(ISessionManager):
             self.global_session[key] = data
 
     def save_prop(self, session_id: str, prop_key: str, data: Any) -> None:
-        current_props = self.get_user_props(session_id)
-        current_props[prop_key] = data
-        self.save(session_id, self.prop_key, current_props)
+        with self._lock(session_id):
+            user_session = self._user(session_id, create=True)
+
+            if user_session is not None:
+                user_session.setdefault(self.prop_key, {})[prop_key] = data
+
+        self._trim()
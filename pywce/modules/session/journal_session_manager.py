@@ -0,0 +1,248 @@
+import logging
+import os
+import pickle
+import threading
+import time
+from typing import Any, Dict, Type, List, Union, Optional
+
+from pywce.modules.session import ISessionManager
+from pywce.modules.session.dict_session_manager import DefaultSessionManager
+from . import T
+
+_logger = logging.getLogger(__name__)
+
+
+class JournaledSessionManager(ISessionManager):
+    """
+        In-memory session manager made durable with a write-behind journal
+
+        Reads & writes are served by the wrapped `DefaultSessionManager`. Every mutation is also
+        serialized as a (method, args) record and appended to an in-memory buffer, a background
+        thread writes the buffer to the append-only journal and fsyncs it in one group every
+        `fsync_interval_s`. The caller never waits on the disk, a crash loses at most the last group.
+
+        Every `compact_interval_s`, or once the journal grows past `max_journal_bytes`, the journal
+        is rotated and the sessions are written to a snapshot with `DefaultSessionManager.snapshot`.
+        On start the snapshot is restored and the journal replayed on top of it.
+
+        Records are plain overwrites & removals, replaying a record the snapshot already holds is harmless,
+        so the snapshot does not need to stop writers. Call `close()` on shutdown to flush & compact.
+
+        Use an unbounded manager, LRU & idle evictions are not journaled and would come back on replay.
+
+        :param path: snapshot file, the journal is kept next to it as `<path>.journal`
+    """
+    DEFAULT_PROP_KEY: str = DefaultSessionManager.DEFAULT_PROP_KEY
+
+    def __init__(self, path: str = "pywce_sessions.snapshot", manager: Optional[DefaultSessionManager] = None,
+                 fsync_interval_s: float = 0.05, compact_interval_s: Optional[float] = 300,
+                 max_journal_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.manager = manager or DefaultSessionManager()
+        self.fsync_interval_s = fsync_interval_s
+        self.compact_interval_s = compact_interval_s
+        self.max_journal_bytes = max_journal_bytes
+
+        # orders mutations & their journal records
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._buffer: List[bytes] = []
+
+        rotated = self._recover()
+
+        self._journal = open(self.journal_path, "ab")
+        self._compacted_at = time.monotonic()
+
+        if rotated:
+            self.compact()
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._write_loop, name="pywce-session-journal", daemon=True)
+        self._thread.start()
+
+    @property
+    def _rotated_path(self) -> str:
+        return f"{self.journal_path}.old"
+
+    def _recover(self) -> bool:
+        """
+        restore the snapshot & replay the rotated and current journals
+
+        :return: True if a rotated journal was left by an unfinished compaction
+        """
+        if os.path.exists(self.path):
+            self.manager.restore(self.path)
+
+        rotated = os.path.exists(self._rotated_path)
+        replayed = 0
+
+        for journal in [self._rotated_path, self.journal_path]:
+            if os.path.exists(journal):
+                replayed += self._replay(journal)
+
+        if replayed:
+            _logger.info("Session journal replayed, records: %s", replayed)
+
+        return rotated
+
+    def _replay(self, journal: str) -> int:
+        replayed = 0
+
+        with open(journal, "r+b") as f:
+            while True:
+                position = f.tell()
+
+                try:
+                    method, args = pickle.load(f)
+                except EOFError:
+                    break
+                except Exception as e:
+                    # a record torn by a crash mid-write, drop it so new records are not appended after it
+                    _logger.warning("Session journal truncated at %s: %s, error: %s", position, journal, e)
+                    f.truncate(position)
+                    break
+
+                getattr(self.manager, method)(*args)
+                replayed += 1
+
+        return replayed
+
+    def _append(self, method: str, *args) -> None:
+        """
+        apply a mutation & journal it, the record is serialized on the caller thread
+        so later in-place changes to saved objects cannot tear it
+        """
+        record = pickle.dumps((method, args), pickle.HIGHEST_PROTOCOL)
+
+        with self._lock:
+            getattr(self.manager, method)(*args)
+            self._buffer.append(record)
+
+    def _write_loop(self) -> None:
+        while not self._stop.wait(self.fsync_interval_s):
+            try:
+                self.flush()
+
+                due = self.compact_interval_s is not None and \
+                      time.monotonic() - self._compacted_at >= self.compact_interval_s
+
+                if due or self._journal.tell() >= self.max_journal_bytes:
+                    self.compact()
+            except Exception as e:
+                _logger.error("Session journal write failed: %s", e)
+
+    def flush(self) -> None:
+        """
+        write buffered records to the journal & fsync, one group for everything buffered so far
+        """
+        with self._file_lock:
+            with self._lock:
+                records, self._buffer = self._buffer, []
+
+            if not records:
+                return
+
+            self._journal.write(b"".join(records))
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+
+    def compact(self) -> None:
+        """
+        snapshot the sessions & start an empty journal
+        """
+        with self._file_lock:
+            with self._lock:
+                records, self._buffer = self._buffer, []
+
+            # records up to here are covered by the rotated journal until the snapshot is in place
+            self._journal.write(b"".join(records))
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._journal.close()
+
+            os.replace(self.journal_path, self._rotated_path)
+            self._journal = open(self.journal_path, "ab")
+
+            self.manager.snapshot(self.path)
+            os.remove(self._rotated_path)
+
+            self._compacted_at = time.monotonic()
+
+        _logger.debug("Session journal compacted: %s", self.path)
+
+    def close(self) -> None:
+        """
+        stop the journal thread, flush buffered records & compact
+        """
+        self._stop.set()
+        self._thread.join()
+
+        self.compact()
+        self._journal.close()
+
+    # ========= ISessionManager ============
+
+    @property
+    def prop_key(self) -> str:
+        return self.manager.prop_key
+
+    def session(self, session_id: str) -> ISessionManager:
+        if self.manager.sessions.get(session_id) is None:
+            self._append("session", session_id)
+
+        return self
+
+    def save(self, session_id: str, key: str, data: Any) -> None:
+        self._append("save", session_id, key, data)
+
+    def save_all(self, session_id: str, data: Dict[str, Any]) -> None:
+        self._append("save_all", session_id, data)
+
+    def save_global(self, key: str, data: Any) -> None:
+        self._append("save_global", key, data)
+
+    def save_prop(self, session_id: str, prop_key: str, data: Any) -> None:
+        self._append("save_prop", session_id, prop_key, data)
+
+    def get(self, session_id: str, key: str, t: Type[T] = None) -> Union[Any, T]:
+        return self.manager.get(session_id, key, t)
+
+    def get_global(self, key: str, t: Type[T] = None) -> Union[Any, T]:
+        return self.manager.get_global(key, t)
+
+    def get_from_props(self, session_id: str, prop_key: str, t: Type[T] = None) -> Union[Any, T]:
+        return self.manager.get_from_props(session_id, prop_key, t)
+
+    def get_user_props(self, session_id: str) -> Union[Dict[str, Any], None]:
+        return self.manager.get_user_props(session_id)
+
+    def fetch_all(self, session_id: str, is_global: bool = False) -> Union[Dict[str, Any], None]:
+        return self.manager.fetch_all(session_id, is_global)
+
+    def evict(self, session_id: str, key: str) -> None:
+        self._append("evict", session_id, key)
+
+    def evict_all(self, session_id: str, keys: List[str]) -> None:
+        self._append("evict_all", session_id, keys)
+
+    def evict_global(self, key: str) -> None:
+        self._append("evict_global", key)
+
+    def clear(self, session_id: str, retain_keys: List[str] = None) -> None:
+        self._append("clear", session_id, retain_keys)
+
+    def clear_global(self) -> None:
+        self._append("clear_global")
+
+    def evict_prop(self, session_id: str, prop_key: str) -> bool:
+        with self._lock:
+            removed = self.manager.evict_prop(session_id, prop_key)
+
+            if removed:
+                self._buffer.append(pickle.dumps(("evict_prop", (session_id, prop_key)), pickle.HIGHEST_PROTOCOL))
+
+        return removed
+
+    def key_in_session(self, session_id: str, key: str, check_global: bool = True) -> bool:
+        return self.manager.key_in_session(session_id, key, check_global)
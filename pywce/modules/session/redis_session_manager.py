@@ -0,0 +1,473 @@
+import io
+import pickle
+import queue
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Type, List, Union, Optional, Tuple, Sequence, Iterable
+
+from pywce.modules.session import ISessionManager
+from . import T
+
+Command = Sequence[Union[str, bytes, int, float]]
+
+
+class PickleSerializer:
+    """
+        Unrestricted pickle session values
+
+        WARNING: unpickling runs code named by the payload, anyone able to write to the redis
+        server can execute code in every engine process. Only use with a trusted, private server.
+    """
+
+    def dumps(self, data: Any) -> bytes:
+        return pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data: bytes) -> Any:
+        return pickle.loads(data)
+
+
+class _RestrictedUnpickler(pickle.Unpickler):
+    def __init__(self, file, allowed: frozenset):
+        super().__init__(file)
+        self.allowed = allowed
+
+    def find_class(self, module: str, name: str) -> Any:
+        if (module, name) not in self.allowed:
+            raise pickle.UnpicklingError(f"Session value references a disallowed global: {module}.{name}")
+
+        return super().find_class(module, name)
+
+
+class RestrictedPickleSerializer(PickleSerializer):
+    """
+        Pickle session values, loading only an allow list of classes
+
+        Builtin scalars & containers, datetimes, decimals, `deque` / `OrderedDict` and the engine's
+        own `EngineState` are allowed. A payload naming any other global raises `pickle.UnpicklingError`
+        instead of importing & calling it.
+
+        :param allowed: extra classes session values may hold, e.g. hook data models
+    """
+    SAFE_GLOBALS = frozenset({
+        ("builtins", "set"), ("builtins", "frozenset"), ("builtins", "complex"), ("builtins", "bytearray"),
+        ("collections", "deque"), ("collections", "OrderedDict"),
+        ("datetime", "datetime"), ("datetime", "date"), ("datetime", "time"), ("datetime", "timedelta"),
+        ("datetime", "timezone"), ("decimal", "Decimal"),
+        ("pywce.src.models.engine_state", "EngineState"), ("pywce.modules.session.dedupe", "MessageHistory"),
+    })
+
+    def __init__(self, allowed: Iterable[type] = ()):
+        self.allowed = self.SAFE_GLOBALS | {(c.__module__, c.__qualname__) for c in allowed}
+
+    def loads(self, data: bytes) -> Any:
+        return _RestrictedUnpickler(io.BytesIO(data), self.allowed).load()
+
+
+class RespError(Exception):
+    """
+        error reply from a redis protocol server
+    """
+    pass
+
+
+class _RespConnection:
+    def __init__(self, host: str, port: int, timeout_s: float):
+        self.sock = socket.create_connection((host, port), timeout=timeout_s)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+
+    @staticmethod
+    def _encode(command: Command) -> bytes:
+        out = [b"*%d\r\n" % len(command)]
+
+        for arg in command:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            out.append(b"$%d\r\n%b\r\n" % (len(arg), arg))
+
+        return b"".join(out)
+
+    def _read(self) -> Any:
+        line = self.reader.readline()
+
+        if not line:
+            raise ConnectionError("Connection closed by redis server")
+
+        kind, rest = line[:1], line[1:-2]
+
+        if kind == b"+":
+            return rest
+        if kind == b"-":
+            return RespError(rest.decode("utf-8"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            size = int(rest)
+            if size < 0:
+                return None
+            data = self.reader.read(size + 2)
+            return data[:-2]
+        if kind == b"*":
+            size = int(rest)
+            if size < 0:
+                return None
+            return [self._read() for _ in range(size)]
+
+        raise ConnectionError(f"Unexpected redis reply: {line!r}")
+
+    def pipeline(self, commands: List[Command]) -> List[Any]:
+        self.sock.sendall(b"".join(self._encode(c) for c in commands))
+        return [self._read() for _ in commands]
+
+    def close(self) -> None:
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RespClient:
+    """
+        Minimal pooled redis protocol (RESP2) client
+
+        `pipeline` sends a batch of commands in one write & reads all replies, one network round trip.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6379, db: int = 0, password: Optional[str] = None,
+                 pool_size: int = 8, timeout_s: float = 5):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout_s = timeout_s
+        self.round_trips = 0
+
+        self._pool: "queue.LifoQueue[Optional[_RespConnection]]" = queue.LifoQueue(maxsize=pool_size)
+        for _ in range(pool_size):
+            self._pool.put(None)
+
+    def _connect(self) -> _RespConnection:
+        conn = _RespConnection(self.host, self.port, self.timeout_s)
+        setup = []
+
+        if self.password is not None:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+
+        for reply in conn.pipeline(setup) if setup else []:
+            if isinstance(reply, RespError):
+                conn.close()
+                raise reply
+
+        return conn
+
+    def pipeline(self, commands: List[Command]) -> List[Any]:
+        conn = self._pool.get()
+
+        try:
+            if conn is None:
+                conn = self._connect()
+
+            replies = conn.pipeline(commands)
+            self.round_trips += 1
+
+        except (OSError, ConnectionError):
+            if conn is not None:
+                conn.close()
+            conn = None
+            raise
+
+        finally:
+            self._pool.put(conn)
+
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+
+        return replies
+
+    def execute(self, *command) -> Any:
+        return self.pipeline([command])[0]
+
+    def close(self) -> None:
+        while not self._pool.empty():
+            conn = self._pool.get_nowait()
+            if conn is not None:
+                conn.close()
+
+
+class RedisSessionManager(ISessionManager):
+    """
+        Redis protocol session manager for horizontally scaled deployments
+
+        Each user is a single hash `{prefix}:{session_id}`, user props live in `{prefix}:{session_id}:props`
+        so `save_prop` is a single field write.
+        Keys share a `{session_id}` hash tag, so one user's keys stay on one cluster slot.
+
+        SECURITY: values are pickled and read back from the network. The default
+        `RestrictedPickleSerializer` only loads an allow list of classes, pass the classes your hooks
+        store in the session with `RestrictedPickleSerializer(allowed=[...])`. `PickleSerializer`
+        loads anything and lets whoever can write to the redis server run code in the engine,
+        only use it with a trusted, private server.
+
+        Multi-key operations (`save_all`, `evict_all`, props) & the key expiry refresh are pipelined,
+        one network round trip each. With `session_ttl_s`, user keys expire natively after that long
+        without writes.
+
+        With `near_cache_s`, whole user sessions are cached client-side for that long so the
+        many reads of one message cost one round trip. Own writes update the near cache, writes from
+        other processes become visible once the entry expires, keep it short.
+
+        :param client: redis protocol client, defaults to a `RespClient` on localhost
+        :param serializer: session value serializer, defaults to a `RestrictedPickleSerializer`
+    """
+    DEFAULT_PROP_KEY: str = "pywce_prop_key"
+
+    # marks a user session as existing, its props live in the props hash
+    _PROPS_MARKER = b""
+
+    def __init__(self, client: Optional[RespClient] = None, prefix: str = "pywce", session_ttl_s: Optional[int] = None,
+                 near_cache_s: Optional[float] = None, near_cache_size: int = 10_000,
+                 serializer: Optional[PickleSerializer] = None):
+        self.client = client or RespClient()
+        self.serializer = serializer or RestrictedPickleSerializer()
+        self.prefix = prefix
+        self.session_ttl_s = session_ttl_s
+        self.near_cache_s = near_cache_s
+        self.near_cache_size = near_cache_size
+
+        self._near: Dict[str, Tuple[float, Dict[str, Any]]] = OrderedDict()
+        self._near_lock = threading.Lock()
+
+    @property
+    def prop_key(self) -> str:
+        return self.DEFAULT_PROP_KEY
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}:{{{session_id}}}"
+
+    def _props_key(self, session_id: str) -> str:
+        return f"{self.prefix}:{{{session_id}}}:props"
+
+    @property
+    def _global_key(self) -> str:
+        return f"{self.prefix}:global"
+
+    def _dumps(self, data: Any) -> bytes:
+        return self.serializer.dumps(data)
+
+    def _loads(self, data: Optional[bytes]) -> Any:
+        return None if data is None else self.serializer.loads(data)
+
+    @staticmethod
+    def _pairs(reply: List[bytes]) -> Dict[str, bytes]:
+        return {reply[i].decode("utf-8"): reply[i + 1] for i in range(0, len(reply), 2)}
+
+    def _expire(self, session_id: str) -> List[Command]:
+        if self.session_ttl_s is None:
+            return []
+
+        return [("EXPIRE", self._key(session_id), self.session_ttl_s),
+                ("EXPIRE", self._props_key(session_id), self.session_ttl_s)]
+
+    def _write(self, session_id: str, commands: List[Command]) -> List[Any]:
+        return self.client.pipeline(commands + self._expire(session_id))
+
+    # ========= near cache ============
+
+    def _cached(self, session_id: str) -> Optional[Dict[str, Any]]:
+        if self.near_cache_s is None:
+            return None
+
+        with self._near_lock:
+            entry = self._near.get(session_id)
+
+            if entry is None:
+                return None
+
+            if entry[0] < time.monotonic():
+                self._near.pop(session_id)
+                return None
+
+            self._near.move_to_end(session_id)
+            return entry[1]
+
+    def _cache(self, session_id: str, data: Optional[Dict[str, Any]]) -> None:
+        if self.near_cache_s is None or data is None:
+            return
+
+        with self._near_lock:
+            self._near[session_id] = (time.monotonic() + self.near_cache_s, data)
+            self._near.move_to_end(session_id)
+
+            while len(self._near) > self.near_cache_size:
+                self._near.popitem(last=False)
+
+    def _invalidate(self, session_id: str) -> None:
+        if self.near_cache_s is not None:
+            with self._near_lock:
+                self._near.pop(session_id, None)
+
+    def _load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        data = self._cached(session_id)
+        if data is not None:
+            return data
+
+        main, props = self.client.pipeline([("HGETALL", self._key(session_id)),
+                                            ("HGETALL", self._props_key(session_id))])
+        if not main:
+            return None
+
+        data = {k: v for k, v in self._pairs(main).items() if k != self.prop_key}
+        data = {k: self._loads(v) for k, v in data.items()}
+
+        if self.prop_key.encode("utf-8") in main[::2]:
+            data[self.prop_key] = {k: self._loads(v) for k, v in self._pairs(props).items()}
+
+        self._cache(session_id, data)
+        return data
+
+    # ========= ISessionManager ============
+
+    def session(self, session_id: str) -> ISessionManager:
+        if self._cached(session_id) is None:
+            self._write(session_id, [("HSETNX", self._key(session_id), self.prop_key, self._PROPS_MARKER)])
+
+        return self
+
+    def save(self, session_id: str, key: str, data: Any) -> None:
+        self.save_all(session_id, {key: data})
+
+    def save_all(self, session_id: str, data: Dict[str, Any]) -> None:
+        if not data:
+            return
+
+        fields = []
+        commands = []
+
+        for k, v in data.items():
+            if k == self.prop_key:
+                # replace the props hash
+                commands.append(("DEL", self._props_key(session_id)))
+                if v:
+                    commands.append(("HSET", self._props_key(session_id),
+                                     *[x for pk, pv in v.items() for x in (pk, self._dumps(pv))]))
+                fields.extend([k, self._PROPS_MARKER])
+            else:
+                fields.extend([k, self._dumps(v)])
+
+        self._write(session_id, [("HSET", self._key(session_id), *fields), *commands])
+
+        cached = self._cached(session_id)
+        if cached is not None:
+            cached.update({k: dict(v) if k == self.prop_key else v for k, v in data.items()})
+
+    def save_global(self, key: str, data: Any) -> None:
+        self.client.execute("HSET", self._global_key, key, self._dumps(data))
+
+    def save_prop(self, session_id: str, prop_key: str, data: Any) -> None:
+        self._write(session_id, [("HSET", self._props_key(session_id), prop_key, self._dumps(data)),
+                                 ("HSETNX", self._key(session_id), self.prop_key, self._PROPS_MARKER)])
+
+        cached = self._cached(session_id)
+        if cached is not None:
+            cached.setdefault(self.prop_key, {})[prop_key] = data
+
+    def get(self, session_id: str, key: str, t: Type[T] = None) -> Union[Any, T]:
+        if key == self.prop_key or self.near_cache_s is not None:
+            data = (self._load(session_id) or {}).get(key)
+        else:
+            data = self._loads(self.client.execute("HGET", self._key(session_id), key))
+
+        if data is not None and t is not None:
+            return t(data)
+
+        return data
+
+    def get_global(self, key: str, t: Type[T] = None) -> Union[Any, T]:
+        data = self._loads(self.client.execute("HGET", self._global_key, key))
+
+        if data is not None and t is not None:
+            return t(data)
+
+        return data
+
+    def get_from_props(self, session_id: str, prop_key: str, t: Type[T] = None) -> Union[Any, T]:
+        cached = self._cached(session_id)
+
+        if cached is not None:
+            prop = cached.get(self.prop_key, {}).get(prop_key)
+        else:
+            prop = self._loads(self.client.execute("HGET", self._props_key(session_id), prop_key))
+
+        if prop is None or t is None:
+            return prop
+
+        return t(prop)
+
+    def get_user_props(self, session_id: str) -> Union[Dict[str, Any], None]:
+        return self.get(session_id, self.prop_key)
+
+    def fetch_all(self, session_id: str, is_global: bool = False) -> Union[Dict[str, Any], None]:
+        if is_global:
+            return {k: self._loads(v) for k, v in self._pairs(self.client.execute("HGETALL", self._global_key)).items()}
+
+        return self._load(session_id) or {}
+
+    def evict(self, session_id: str, key: str) -> None:
+        self.evict_all(session_id, [key])
+
+    def evict_all(self, session_id: str, keys: List[str]) -> None:
+        if not keys:
+            return
+
+        commands: List[Command] = [("HDEL", self._key(session_id), *keys)]
+        if self.prop_key in keys:
+            commands.append(("DEL", self._props_key(session_id)))
+
+        self._write(session_id, commands)
+
+        cached = self._cached(session_id)
+        if cached is not None:
+            for k in keys:
+                cached.pop(k, None)
+
+    def evict_global(self, key: str) -> None:
+        self.client.execute("HDEL", self._global_key, key)
+
+    def clear(self, session_id: str, retain_keys: List[str] = None) -> None:
+        self._invalidate(session_id)
+
+        if retain_keys is None or retain_keys == []:
+            self.client.pipeline([("DEL", self._key(session_id)), ("DEL", self._props_key(session_id))])
+            return
+
+        keys = [k.decode("utf-8") for k in self.client.execute("HKEYS", self._key(session_id))]
+        keys_to_remove = [k for k in keys if k not in retain_keys and k != self.prop_key]
+
+        if keys_to_remove:
+            self._write(session_id, [("HDEL", self._key(session_id), *keys_to_remove)])
+
+    def clear_global(self) -> None:
+        self.client.execute("DEL", self._global_key)
+
+    def evict_prop(self, session_id: str, prop_key: str) -> bool:
+        removed = self._write(session_id, [("HDEL", self._props_key(session_id), prop_key)])[0]
+
+        cached = self._cached(session_id)
+        if cached is not None:
+            cached.get(self.prop_key, {}).pop(prop_key, None)
+
+        return removed > 0
+
+    def key_in_session(self, session_id: str, key: str, check_global: bool = True) -> bool:
+        in_user = self.get(session_id, key) is not None
+
+        if check_global and not in_user:
+            return self.get_global(key) is not None
+
+        return in_user
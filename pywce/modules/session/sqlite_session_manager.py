@@ -0,0 +1,346 @@
+import logging
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Type, List, Union, Optional, Set
+
+from pywce.modules.session import ISessionManager
+from . import T
+
+_logger = logging.getLogger(__name__)
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS pywce_sessions (session_id TEXT PRIMARY KEY, data BLOB NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS pywce_global (key TEXT PRIMARY KEY, data BLOB NOT NULL)",
+)
+
+_SELECT_SESSION = "SELECT data FROM pywce_sessions WHERE session_id = ?"
+_UPSERT_SESSION = "INSERT OR REPLACE INTO pywce_sessions (session_id, data) VALUES (?, ?)"
+_SELECT_GLOBAL = "SELECT key, data FROM pywce_global"
+_UPSERT_GLOBAL = "INSERT OR REPLACE INTO pywce_global (key, data) VALUES (?, ?)"
+_DELETE_GLOBAL = "DELETE FROM pywce_global WHERE key = ?"
+_CLEAR_GLOBAL = "DELETE FROM pywce_global"
+
+
+class SqliteSessionManager(ISessionManager):
+    """
+        SQLite backed session manager, sessions survive restarts without an external service
+
+        Each user session is one row holding its pickled dict, the global session is a key / value table.
+        The database runs in WAL mode so reads never wait on the writer.
+
+        Reads & writes are served from a read-through LRU cache of `cache_size` hot sessions.
+        Written sessions are marked dirty and a background writer thread commits them in batches
+        every `flush_interval_s`, or sooner once `batch_size` sessions are dirty.
+        Dirty sessions stay cached until committed. Call `close()` on shutdown to flush the last batch.
+
+        :param path: database file
+    """
+    DEFAULT_PROP_KEY: str = "pywce_prop_key"
+
+    def __init__(self, path: str = "pywce_sessions.db", cache_size: int = 10_000, flush_interval_s: float = 0.05,
+                 batch_size: int = 500):
+        self.path = path
+        self.cache_size = cache_size
+        self.flush_interval_s = flush_interval_s
+        self.batch_size = batch_size
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        self._reader = self._connect()
+        self._writer = self._connect()
+
+        for statement in _SCHEMA:
+            self._writer.execute(statement)
+        self._writer.commit()
+
+        self._cache: Dict[str, Dict[str, Any]] = OrderedDict()
+        self._dirty: Set[str] = set()
+        # serialized sessions handed to the writer, served on cache miss until committed
+        self._pending: Dict[str, bytes] = {}
+
+        self.global_session: Dict[str, Any] = {k: pickle.loads(v) for k, v in self._reader.execute(_SELECT_GLOBAL)}
+        self._global_dirty: Set[str] = set()
+        self._global_cleared = False
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._write_loop, name="pywce-sqlite-session-writer", daemon=True)
+        self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        # statements are reused from the connection's prepared statement cache
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=32)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @property
+    def prop_key(self) -> str:
+        return self.DEFAULT_PROP_KEY
+
+    # ========= cache & writer ============
+
+    def _load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        cached session dict, must hold `_lock`
+        """
+        data = self._cache.get(session_id)
+
+        if data is not None:
+            self._cache.move_to_end(session_id)
+            return data
+
+        blob = self._pending.get(session_id)
+
+        if blob is None:
+            row = self._reader.execute(_SELECT_SESSION, (session_id,)).fetchone()
+            blob = row[0] if row is not None else None
+
+        if blob is None:
+            return None
+
+        data = pickle.loads(blob)
+        self._cache[session_id] = data
+        self._trim()
+
+        return data
+
+    def _trim(self) -> None:
+        """
+        evict the least recently used clean sessions over `cache_size`, must hold `_lock`
+
+        Usually a single session is over, the scan stops at the first clean ones instead of copying the cache
+        """
+        excess = len(self._cache) - self.cache_size
+
+        if excess <= 0:
+            return
+
+        evict = []
+
+        for session_id in self._cache:
+            if session_id not in self._dirty:
+                evict.append(session_id)
+
+                if len(evict) == excess:
+                    break
+
+        for session_id in evict:
+            self._cache.pop(session_id)
+
+    def _mark(self, session_id: str) -> None:
+        self._dirty.add(session_id)
+
+        if len(self._dirty) >= self.batch_size:
+            self._wake.set()
+
+    def _write_loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval_s)
+            self._wake.clear()
+
+            try:
+                self.flush()
+            except Exception as e:
+                _logger.error("Session flush failed: %s", e, exc_info=True)
+
+    def flush(self) -> None:
+        """
+        commit every dirty session & global key in one transaction
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._dirty and not self._global_dirty and not self._global_cleared:
+                    return
+
+                sessions = [(sid, pickle.dumps(self._cache[sid], pickle.HIGHEST_PROTOCOL)) for sid in self._dirty
+                            if sid in self._cache]
+                global_upserts = [(k, pickle.dumps(self.global_session[k], pickle.HIGHEST_PROTOCOL))
+                                  for k in self._global_dirty if k in self.global_session]
+                global_deletes = [(k,) for k in self._global_dirty if k not in self.global_session]
+                global_cleared = self._global_cleared
+
+                self._pending.update(sessions)
+                self._dirty = set()
+                self._global_dirty = set()
+                self._global_cleared = False
+
+            try:
+                with self._writer:
+                    if global_cleared:
+                        self._writer.execute(_CLEAR_GLOBAL)
+
+                    self._writer.executemany(_UPSERT_SESSION, sessions)
+                    self._writer.executemany(_UPSERT_GLOBAL, global_upserts)
+                    self._writer.executemany(_DELETE_GLOBAL, global_deletes)
+            except Exception:
+                # the transaction rolled back, mark everything dirty again so the next flush retries it
+                with self._lock:
+                    self._dirty.update(sid for sid, _ in sessions)
+                    self._global_dirty.update(k for k, _ in global_upserts)
+                    self._global_dirty.update(k for k, in global_deletes)
+                    self._global_cleared = self._global_cleared or global_cleared
+                raise
+
+            with self._lock:
+                for sid, blob in sessions:
+                    if self._pending.get(sid) is blob:
+                        self._pending.pop(sid)
+
+    def close(self) -> None:
+        """
+        stop the writer thread, flush pending writes & close the database
+        """
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+
+        self.flush()
+
+        self._reader.close()
+        self._writer.close()
+
+    # ========= ISessionManager ============
+
+    def session(self, session_id: str) -> ISessionManager:
+        with self._lock:
+            if self._load(session_id) is None:
+                self._cache[session_id] = {self.prop_key: {}}
+                self._mark(session_id)
+                self._trim()
+
+        return self
+
+    def save(self, session_id: str, key: str, data: Any) -> None:
+        with self._lock:
+            user_session = self._load(session_id)
+
+            if user_session is not None:
+                user_session[key] = data
+                self._mark(session_id)
+
+    def save_all(self, session_id: str, data: Dict[str, Any]) -> None:
+        with self._lock:
+            user_session = self._load(session_id)
+
+            if user_session is not None:
+                user_session.update(data)
+                self._mark(session_id)
+
+    def save_global(self, key: str, data: Any) -> None:
+        with self._lock:
+            self.global_session[key] = data
+            self._global_dirty.add(key)
+
+    def save_prop(self, session_id: str, prop_key: str, data: Any) -> None:
+        with self._lock:
+            user_session = self._load(session_id)
+
+            if user_session is not None:
+                user_session.setdefault(self.prop_key, {})[prop_key] = data
+                self._mark(session_id)
+
+    def get(self, session_id: str, key: str, t: Type[T] = None) -> Union[Any, T]:
+        with self._lock:
+            data = (self._load(session_id) or {}).get(key)
+
+        if data is not None and t is not None:
+            return t(data)
+
+        return data
+
+    def get_global(self, key: str, t: Type[T] = None) -> Union[Any, T]:
+        with self._lock:
+            data = self.global_session.get(key)
+
+        if data is not None and t is not None:
+            return t(data)
+
+        return data
+
+    def get_from_props(self, session_id: str, prop_key: str, t: Type[T] = None) -> Union[Any, T]:
+        props = self.get_user_props(session_id) or {}
+        prop = props.get(prop_key)
+
+        if prop is None or t is None:
+            return prop
+
+        return t(prop)
+
+    def get_user_props(self, session_id: str) -> Union[Dict[str, Any], None]:
+        return self.get(session_id, self.prop_key)
+
+    def fetch_all(self, session_id: str, is_global: bool = False) -> Union[Dict[str, Any], None]:
+        with self._lock:
+            if is_global:
+                return self.global_session
+
+            return self._load(session_id)
+
+    def evict(self, session_id: str, key: str) -> None:
+        self.evict_all(session_id, [key])
+
+    def evict_all(self, session_id: str, keys: List[str]) -> None:
+        with self._lock:
+            user_session = self._load(session_id)
+
+            if user_session is None:
+                return
+
+            for k in keys:
+                if k in user_session:
+                    user_session.pop(k)
+                    self._mark(session_id)
+
+    def evict_global(self, key: str) -> None:
+        with self._lock:
+            if key in self.global_session:
+                self.global_session.pop(key)
+                self._global_dirty.add(key)
+
+    def clear(self, session_id: str, retain_keys: List[str] = None) -> None:
+        with self._lock:
+            if retain_keys is None or retain_keys == []:
+                self._cache[session_id] = {}
+                self._mark(session_id)
+                self._trim()
+                return
+
+            user_session = self._load(session_id)
+            if user_session is None:
+                return
+
+            for key in [k for k in user_session.keys() if k not in retain_keys and k != self.prop_key]:
+                user_session.pop(key)
+
+            self._mark(session_id)
+
+    def clear_global(self) -> None:
+        with self._lock:
+            self.global_session = {}
+            self._global_dirty = set()
+            self._global_cleared = True
+
+    def evict_prop(self, session_id: str, prop_key: str) -> bool:
+        with self._lock:
+            props = (self._load(session_id) or {}).get(self.prop_key)
+
+            if props is None or prop_key not in props:
+                return False
+
+            props.pop(prop_key)
+            self._mark(session_id)
+
+            return True
+
+    def key_in_session(self, session_id: str, key: str, check_global: bool = True) -> bool:
+        with self._lock:
+            in_user = (self._load(session_id) or {}).get(key) is not None
+
+            if check_global and not in_user:
+                return self.global_session.get(key) is not None
+
+        return in_user
@@ -0,0 +1,98 @@
+from typing import Any, Dict, Type, List, Union
+
+from pywce.modules import tracing
+from pywce.modules.session import ISessionManager
+from . import T
+
+
+class TracedSessionManager(ISessionManager):
+    """
+        Wraps a session manager and records a `session.read` / `session.write` span for every call,
+        `session.open` when a user session is opened
+
+        Use `TracedSessionManager.wrap(manager)`, it only wraps when tracing is enabled
+    """
+
+    def __init__(self, manager: ISessionManager):
+        self.manager = manager
+
+    @staticmethod
+    def wrap(manager: ISessionManager) -> ISessionManager:
+        if not tracing.enabled() or isinstance(manager, TracedSessionManager):
+            return manager
+
+        return TracedSessionManager(manager)
+
+    @property
+    def prop_key(self) -> str:
+        return self.manager.prop_key
+
+    def session(self, session_id: str) -> ISessionManager:
+        with tracing.span("session.open", op="session"):
+            user_session = self.manager.session(session_id)
+
+        return self if user_session is self.manager else TracedSessionManager(user_session)
+
+    def save(self, session_id: str, key: str, data: Any) -> None:
+        with tracing.span("session.write", op="save", key=key):
+            self.manager.save(session_id, key, data)
+
+    def save_all(self, session_id: str, data: Dict[str, Any]) -> None:
+        with tracing.span("session.write", op="save_all"):
+            self.manager.save_all(session_id, data)
+
+    def save_global(self, key: str, data: Any) -> None:
+        with tracing.span("session.write", op="save_global", key=key):
+            self.manager.save_global(key, data)
+
+    def save_prop(self, session_id: str, prop_key: str, data: Any) -> None:
+        with tracing.span("session.write", op="save_prop", key=prop_key):
+            self.manager.save_prop(session_id, prop_key, data)
+
+    def get(self, session_id: str, key: str, t: Type[T] = None) -> Union[Any, T]:
+        with tracing.span("session.read", op="get", key=key):
+            return self.manager.get(session_id, key, t)
+
+    def get_global(self, key: str, t: Type[T] = None) -> Union[Any, T]:
+        with tracing.span("session.read", op="get_global", key=key):
+            return self.manager.get_global(key, t)
+
+    def get_from_props(self, session_id: str, prop_key: str, t: Type[T] = None) -> Union[Any, T]:
+        with tracing.span("session.read", op="get_from_props", key=prop_key):
+            return self.manager.get_from_props(session_id, prop_key, t)
+
+    def get_user_props(self, session_id: str) -> Union[Dict[str, Any], None]:
+        with tracing.span("session.read", op="get_user_props"):
+            return self.manager.get_user_props(session_id)
+
+    def fetch_all(self, session_id: str, is_global: bool = False) -> Union[Dict[str, Any], None]:
+        with tracing.span("session.read", op="fetch_all"):
+            return self.manager.fetch_all(session_id, is_global)
+
+    def evict(self, session_id: str, key: str) -> None:
+        with tracing.span("session.write", op="evict", key=key):
+            self.manager.evict(session_id, key)
+
+    def evict_all(self, session_id: str, keys: List[str]) -> None:
+        with tracing.span("session.write", op="evict_all"):
+            self.manager.evict_all(session_id, keys)
+
+    def evict_global(self, key: str) -> None:
+        with tracing.span("session.write", op="evict_global", key=key):
+            self.manager.evict_global(key)
+
+    def clear(self, session_id: str, retain_keys: List[str] = None) -> None:
+        with tracing.span("session.write", op="clear"):
+            self.manager.clear(session_id, retain_keys)
+
+    def clear_global(self) -> None:
+        with tracing.span("session.write", op="clear_global"):
+            self.manager.clear_global()
+
+    def evict_prop(self, session_id: str, prop_key: str) -> bool:
+        with tracing.span("session.write", op="evict_prop", key=prop_key):
+            return self.manager.evict_prop(session_id, prop_key)
+
+    def key_in_session(self, session_id: str, key: str, check_global: bool = True) -> bool:
+        with tracing.span("session.read", op="key_in_session", key=key):
+            return self.manager.key_in_session(session_id, key, check_global)
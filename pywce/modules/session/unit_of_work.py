@@ -0,0 +1,279 @@
+from typing import Any, Dict, Type, List, Union, Optional, Set
+
+from pywce.modules.session import ISessionManager, IAsyncSessionManager
+from . import T
+
+
+class SessionUnitOfWork(ISessionManager):
+    """
+        Request-scoped view of a single user session
+
+        The user's whole session is fetched once, on first access, and every read & write of that
+        session is served from the local copy. Written keys are tracked as dirty and flushed to the
+        wrapped manager in one `save_all` / `evict_all` on `commit()`. `rollback()` discards them.
+
+        Global session & other session ids pass straight through to the wrapped manager.
+
+        Use as a context manager, commits on exit and rolls back if the block raises::
+
+            with SessionUnitOfWork(manager.session(wa_id), wa_id) as session:
+                ...
+
+        With `async_manager` set, `async with` loads & commits through it instead, so session I/O
+        is awaited on the event loop. Reads & writes in between stay local.
+
+        Writes made on the wrapped manager while the unit of work is open are not seen, and the
+        keys this unit of work wrote overwrite them on `commit()`.
+    """
+
+    def __init__(self, manager: ISessionManager, session_id: str,
+                 async_manager: Optional[IAsyncSessionManager] = None):
+        self.manager = manager
+        self.session_id = session_id
+        self.async_manager = async_manager
+
+        self._data: Optional[Dict[str, Any]] = None
+        self._dirty: Set[str] = set()
+        self._evicted: Set[str] = set()
+        self._clear_retain_keys: Optional[List[str]] = None
+        self._cleared = False
+
+    def __enter__(self) -> "SessionUnitOfWork":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+    async def __aenter__(self) -> "SessionUnitOfWork":
+        if self.async_manager is not None and self._data is None:
+            await self.async_manager.session(self.session_id)
+            self._set(await self.async_manager.fetch_all(self.session_id, False))
+
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            await self.commit_async()
+        else:
+            self.rollback()
+
+    @property
+    def prop_key(self) -> str:
+        return self.manager.prop_key
+
+    @property
+    def dirty(self) -> bool:
+        return self._cleared or len(self._dirty) > 0 or len(self._evicted) > 0
+
+    def _owns(self, session_id: str) -> bool:
+        return session_id == self.session_id
+
+    def _set(self, data: Optional[Dict[str, Any]]) -> None:
+        # copy, pending writes must not leak into the backing store before commit
+        self._data = dict(data or {})
+
+        if isinstance(self._data.get(self.prop_key), dict):
+            self._data[self.prop_key] = dict(self._data[self.prop_key])
+
+    def _load(self) -> Dict[str, Any]:
+        if self._data is None:
+            self._set(self.manager.fetch_all(self.session_id, False))
+
+        return self._data
+
+    def _mark(self, key: str) -> None:
+        self._dirty.add(key)
+        self._evicted.discard(key)
+
+    def commit(self) -> None:
+        """
+        flush pending writes to the wrapped manager in a single batch
+        """
+        if not self.dirty:
+            return
+
+        data = self._load()
+
+        if self._cleared:
+            self.manager.clear(self.session_id, self._clear_retain_keys)
+
+        if self._evicted:
+            self.manager.evict_all(self.session_id, list(self._evicted))
+
+        if self._dirty:
+            self.manager.save_all(self.session_id, {k: data[k] for k in self._dirty if k in data})
+
+        self._reset()
+
+    async def commit_async(self) -> None:
+        """
+        `commit` through the async manager, if set
+        """
+        if self.async_manager is None:
+            return self.commit()
+
+        if not self.dirty:
+            return
+
+        data = self._load()
+
+        if self._cleared:
+            await self.async_manager.clear(self.session_id, self._clear_retain_keys)
+
+        if self._evicted:
+            await self.async_manager.evict_all(self.session_id, list(self._evicted))
+
+        if self._dirty:
+            await self.async_manager.save_all(self.session_id, {k: data[k] for k in self._dirty if k in data})
+
+        self._reset()
+
+    def rollback(self) -> None:
+        """
+        discard pending writes, the next read fetches the session again
+        """
+        self._reset()
+        self._data = None
+
+    def _reset(self) -> None:
+        self._dirty = set()
+        self._evicted = set()
+        self._clear_retain_keys = None
+        self._cleared = False
+
+    def session(self, session_id: str) -> ISessionManager:
+        if self._owns(session_id):
+            return self
+
+        return self.manager.session(session_id)
+
+    def save(self, session_id: str, key: str, data: Any) -> None:
+        if not self._owns(session_id):
+            return self.manager.save(session_id, key, data)
+
+        self._load()[key] = data
+        self._mark(key)
+
+    def save_all(self, session_id: str, data: Dict[str, Any]) -> None:
+        for k, v in data.items():
+            self.save(session_id, k, v)
+
+    def save_global(self, key: str, data: Any) -> None:
+        self.manager.save_global(key, data)
+
+    def save_prop(self, session_id: str, prop_key: str, data: Any) -> None:
+        if not self._owns(session_id):
+            return self.manager.save_prop(session_id, prop_key, data)
+
+        current_props = self._load().setdefault(self.prop_key, {})
+        current_props[prop_key] = data
+        self.save(session_id, self.prop_key, current_props)
+
+    def get(self, session_id: str, key: str, t: Type[T] = None) -> Union[Any, T]:
+        if not self._owns(session_id):
+            return self.manager.get(session_id, key, t)
+
+        data = self._load().get(key)
+
+        if data is not None and t is not None:
+            return t(data)
+
+        return data
+
+    def get_global(self, key: str, t: Type[T] = None) -> Union[Any, T]:
+        return self.manager.get_global(key, t)
+
+    def get_from_props(self, session_id: str, prop_key: str, t: Type[T] = None) -> Union[Any, T]:
+        if not self._owns(session_id):
+            return self.manager.get_from_props(session_id, prop_key, t)
+
+        props = self.get_user_props(session_id) or {}
+
+        if prop_key not in props or props.get(prop_key) is None:
+            return None
+
+        prop = props.get(prop_key)
+
+        if t is None:
+            return prop
+
+        return t(prop)
+
+    def get_user_props(self, session_id: str) -> Union[Dict[str, Any], None]:
+        if not self._owns(session_id):
+            return self.manager.get_user_props(session_id)
+
+        return self._load().get(self.prop_key)
+
+    def fetch_all(self, session_id: str, is_global: bool = False) -> Union[Dict[str, Any], None]:
+        if is_global or not self._owns(session_id):
+            return self.manager.fetch_all(session_id, is_global)
+
+        return self._load()
+
+    def evict(self, session_id: str, key: str) -> None:
+        if not self._owns(session_id):
+            return self.manager.evict(session_id, key)
+
+        data = self._load()
+        if key in data:
+            data.pop(key)
+            self._dirty.discard(key)
+            self._evicted.add(key)
+
+    def evict_all(self, session_id: str, keys: List[str]) -> None:
+        for k in keys:
+            self.evict(session_id, k)
+
+    def evict_global(self, key: str) -> None:
+        self.manager.evict_global(key)
+
+    def clear(self, session_id: str, retain_keys: List[str] = None) -> None:
+        if not self._owns(session_id):
+            return self.manager.clear(session_id, retain_keys)
+
+        data = self._load()
+
+        if retain_keys is None or retain_keys == []:
+            data.clear()
+        else:
+            for key in [k for k in data.keys() if k not in retain_keys and k != self.prop_key]:
+                data.pop(key)
+
+        # the backing clear drops everything not retained, so only surviving writes stay dirty
+        self._dirty = {k for k in self._dirty if k in data}
+        self._evicted = set()
+        self._cleared = True
+        self._clear_retain_keys = retain_keys
+
+    def clear_global(self) -> None:
+        self.manager.clear_global()
+
+    def evict_prop(self, session_id: str, prop_key: str) -> bool:
+        if not self._owns(session_id):
+            return self.manager.evict_prop(session_id, prop_key)
+
+        current_props = self.get_user_props(session_id) or {}
+
+        if prop_key not in current_props:
+            return False
+
+        current_props.pop(prop_key)
+
+        self.save(session_id, self.prop_key, current_props)
+
+        return True
+
+    def key_in_session(self, session_id: str, key: str, check_global: bool = True) -> bool:
+        if not self._owns(session_id):
+            return self.manager.key_in_session(session_id, key, check_global)
+
+        in_user = self._load().get(key) is not None
+
+        if check_global and not in_user:
+            return self.manager.get_global(key) is not None
+
+        return in_user
@@ -1,7 +1,13 @@
+import logging
+import multiprocessing
+import os
+import threading
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import json
-from typing import Dict, List, Optional
+from types import MappingProxyType
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
 
 import ruamel.yaml
 
@@ -10,6 +16,48 @@ from pywce.src.exceptions import EngineException
 from pywce.src.templates import EngineTemplate, Template
 from pywce.src.templates.base_model import EngineRoute
 
+_logger = logging.getLogger(__name__)
+
+# below this many source bytes starting a process pool costs more than parsing in process
+PARALLEL_PARSE_MIN_BYTES = 256 * 1024
+
+# the parse pool also starts from the reload watcher thread, forking a process that runs threads is unsafe
+PARSE_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def _read_file(file_path: Path, yaml: ruamel.yaml.YAML) -> Dict:
+    with file_path.open("r", encoding="utf-8") as file:
+        return (json.load(file) if file_path.suffix == ".json" else yaml.load(file)) or {}
+
+
+def _parse_file(file_path: Path) -> Dict:
+    """
+    process pool entry point, with its own YAML instance
+    """
+    return _read_file(file_path, ruamel.yaml.YAML())
+
+
+def _merge(parts: List[Tuple[Path, Dict]], label: str) -> Dict:
+    """
+    merge parsed files in the given order
+
+    :raises EngineException: if a key is defined in more than one file
+    """
+    merged: Dict = {}
+    origin: Dict[str, Path] = {}
+
+    for file_path, data in parts:
+        for key in data:
+            if key in origin:
+                raise EngineException(f"Duplicate {label.lower()} '{key}' in {origin[key].name} and {file_path.name}",
+                                      data=key)
+
+            origin[key] = file_path
+
+        merged.update(data)
+
+    return merged
+
 
 class IStorageManager(ABC):
     """Abstract base class for different templates storage backends."""
@@ -39,68 +87,263 @@ class IStorageManager(ABC):
         """Load a single templates by name."""
         pass
 
+    def snapshot(self) -> "IStorageManager":
+        """
+        A consistent view of the templates & triggers for processing one message.
+
+        Storage that can change at runtime returns a view that does not, the default is the storage itself.
+        """
+        return self
+
+
+class TemplateRegistry(IStorageManager):
+    """
+    Immutable set of validated templates & trigger routes.
+
+    The models are frozen pydantic models behind a read-only mapping, shared by every message.
+    `YamlJsonStorageManager` swaps in a new registry on reload and hands the current one to each message.
+    """
+
+    def __init__(self, templates: Dict, models: Mapping[str, EngineTemplate], routes: List[EngineRoute]):
+        self.templates = templates
+        self.models = models
+        self.routes = routes
+
+    def load_templates(self) -> None:
+        """Immutable, reload through the storage manager that created it."""
+        pass
+
+    def load_triggers(self) -> None:
+        """Immutable, reload through the storage manager that created it."""
+        pass
+
+    def exists(self, name: str) -> bool:
+        return name in self.templates
+
+    def get(self, name: str) -> Optional[EngineTemplate]:
+        return self.models.get(name)
+
+    def triggers(self) -> List[EngineRoute]:
+        return self.routes
+
 
 class YamlJsonStorageManager(IStorageManager):
     """
     YAML/JSON files storage manager.
 
     Supports reading both YAML (.yaml) and JSON (.json) files from the templates and triggers directories.
+
+    Templates are validated once on load into a read-only model cache, `get` returns the cached model.
+
+    The same rule applies on load & reload: a template failing validation is logged and skipped, it keeps
+    its previously loaded model if it had one, otherwise `exists` is True and `get` returns None for it.
+    The other templates load. An unreadable file or a duplicate name fails the whole load.
+
+    With `watch`, file modification times are polled every `poll_interval_s` and changed directories
+    are re-parsed & re-validated on the watcher thread, then swapped in as one new `TemplateRegistry`.
+    Messages already processing keep the registry they started with, see `snapshot()`.
+    A reload that fails keeps the loaded templates live, its error and any invalid templates are logged
+    and passed to `on_reload_error`.
+
+    Files are parsed on a pool of `parse_workers` processes once a directory holds more than
+    `PARALLEL_PARSE_MIN_BYTES`, split a large flow across several files for it to scale.
+    Files are merged in name order, a template or trigger defined in two files raises `EngineException`.
     """
-    _TEMPLATES: Dict = {}
-    _TRIGGERS: Dict = {}
+    SUFFIXES = (".yml", ".yaml", ".json")
 
-    def __init__(self, template_dir: str, trigger_dir: str):
+    def __init__(self, template_dir: str, trigger_dir: str, watch: bool = False, poll_interval_s: float = 1.0,
+                 on_reload_error: Optional[Callable[[Exception], None]] = None,
+                 parse_workers: Optional[int] = None, start_method: Optional[str] = None):
+        """
+        :param parse_workers: processes parsing files, cpu count if not set, 1 parses in process
+        :param start_method: multiprocessing start method of the parse pool, `PARSE_START_METHOD` if not set
+        """
         self.template_dir = Path(template_dir)
         self.trigger_dir = Path(trigger_dir)
         self.yaml = ruamel.yaml.YAML()
+        self.poll_interval_s = poll_interval_s
+        self.on_reload_error = on_reload_error
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.start_method = start_method
+
+        self._registry = TemplateRegistry({}, MappingProxyType({}), [])
+        self._TRIGGERS: Dict = {}
+        self._reload_lock = threading.RLock()
 
         self.load_triggers()
         self.load_templates()
 
-    def load_templates(self) -> None:
-        self._TEMPLATES.clear()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+        if watch:
+            self._signature = self._scan()
+            self._watcher = threading.Thread(target=self._watch_loop, name="pywce-template-watcher", daemon=True)
+            self._watcher.start()
+
+    @property
+    def _TEMPLATES(self) -> Dict:
+        return self._registry.templates
+
+    def _read_dir(self, directory: Path, label: str) -> Dict:
+        if not directory.is_dir():
+            raise EngineException(f"{label} dir provided is not a valid directory")
+
+        files = [file_path for file_path in sorted(directory.glob("*")) if file_path.suffix in self.SUFFIXES]
+
+        return _merge(list(zip(files, self._parse_files(files))), label)
+
+    def _parse_files(self, files: List[Path]) -> List[Dict]:
+        workers = min(self.parse_workers, len(files))
+
+        if workers < 2 or sum(file_path.stat().st_size for file_path in files) < PARALLEL_PARSE_MIN_BYTES:
+            return [_read_file(file_path, self.yaml) for file_path in files]
+
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(self.start_method or PARSE_START_METHOD)) as pool:
+            # map keeps the file order, merging stays deterministic
+            return list(pool.map(_parse_file, files))
+
+    @staticmethod
+    def _validate(templates: Dict) -> Tuple[Dict[str, EngineTemplate], Dict[str, str]]:
+        """
+        :return: (models, errors by template name)
+        """
+        models, errors = {}, {}
+
+        for name, template in templates.items():
+            try:
+                models[name] = Template.as_model(template)
+            except Exception as e:
+                errors[name] = str(e)
 
-        if not self.template_dir.is_dir():
-            raise EngineException("Template dir provided is not a valid directory")
+        return models, errors
+
+    def _checked(self, templates: Dict) -> Tuple[Dict[str, EngineTemplate], Dict[str, str]]:
+        """
+        validate templates, an invalid one is logged & keeps its loaded model if any, see the class docs
+
+        :return: (models, errors by template name)
+        """
+        models, errors = self._validate(templates)
+        loaded = self._registry
+
+        for name, error in errors.items():
+            _logger.error("Invalid template: %s, error: %s", name, error)
+
+            if loaded.models.get(name) is not None:
+                models[name] = loaded.models[name]
+                templates[name] = loaded.templates[name]
+
+        return models, errors
+
+    def _reload_error(self, error: Exception) -> None:
+        if self.on_reload_error is not None:
+            try:
+                self.on_reload_error(error)
+            except Exception as callback_error:
+                _logger.error("Template reload error callback failed: %s", callback_error)
+
+    @staticmethod
+    def _routes(triggers: Dict) -> List[EngineRoute]:
+        return [
+            EngineRoute(user_input=v, next_stage=k, is_regex=str(v).startswith(EngineConstants.REGEX_PLACEHOLDER))
+            for k, v in triggers.items()
+        ]
 
-        for template_file in self.template_dir.glob("*"):
-            if template_file.suffix not in [".yml", ".yaml", ".json"]:
-                continue
+    def load_templates(self) -> None:
+        with self._reload_lock:
+            templates = self._read_dir(self.template_dir, "Template")
 
-            with template_file.open("r", encoding="utf-8") as file:
-                data = json.load(file) if template_file.suffix == ".json" else self.yaml.load(file)
-                if data:
-                    self._TEMPLATES.update(data)
+            if not templates:
+                raise EngineException("No valid templates found")
 
-        if not self._TEMPLATES:
-            raise EngineException("No valid templates found")
+            models, errors = self._checked(templates)
+            self._registry = TemplateRegistry(templates, MappingProxyType(models), self._registry.routes)
 
     def load_triggers(self) -> None:
-        self._TRIGGERS.clear()
+        with self._reload_lock:
+            triggers = self._read_dir(self.trigger_dir, "Trigger")
+
+            self._TRIGGERS = triggers
+            self._registry = TemplateRegistry(self._registry.templates, self._registry.models, self._routes(triggers))
+
+    def reload(self) -> bool:
+        """
+        re-read templates & triggers and swap them in, invalid templates are skipped as on load
+
+        :return: True if swapped in, False if the loaded templates were kept
+        """
+        with self._reload_lock:
+            try:
+                templates = self._read_dir(self.template_dir, "Template")
+                triggers = self._read_dir(self.trigger_dir, "Trigger")
+
+                if not templates:
+                    raise EngineException("No valid templates found")
+
+                routes = self._routes(triggers)
+
+            except Exception as e:
+                _logger.error("Template reload failed, keeping loaded templates. Error: %s", e)
+                self._reload_error(e)
+                return False
+
+            models, errors = self._checked(templates)
+
+            self._TRIGGERS = triggers
+            self._registry = TemplateRegistry(templates, MappingProxyType(models), routes)
+
+        if errors:
+            self._reload_error(EngineException(f"Invalid templates: {', '.join(errors)}", data=errors))
+
+        _logger.info("Templates reloaded, templates: %s, triggers: %s", len(templates), len(triggers))
+        return True
 
-        if not self.trigger_dir.is_dir():
-            raise EngineException("Trigger dir provided is not a valid directory")
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        signature = {}
 
-        for trigger_file in self.trigger_dir.glob("*"):
-            if trigger_file.suffix not in [".yml", ".yaml", ".json"]:
-                continue
+        for directory in (self.template_dir, self.trigger_dir):
+            for file_path in directory.glob("*"):
+                if file_path.suffix in self.SUFFIXES:
+                    stat = file_path.stat()
+                    signature[str(file_path)] = (stat.st_mtime_ns, stat.st_size)
 
-            with trigger_file.open("r", encoding="utf-8") as file:
-                data = json.load(file) if trigger_file.suffix == ".json" else self.yaml.load(file)
-                if data:
-                    self._TRIGGERS.update(data)
+        return signature
+
+    def _watch_loop(self) -> None:
+        while not self._stop.wait(self.poll_interval_s):
+            try:
+                signature = self._scan()
+
+                if signature != self._signature:
+                    self._signature = signature
+                    self.reload()
+            except Exception as e:
+                _logger.error("Template watcher failed: %s", e)
+
+    def close(self) -> None:
+        """
+        stop the file watcher, if any
+        """
+        self._stop.set()
+
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def snapshot(self) -> IStorageManager:
+        return self._registry
 
     def exists(self, name: str) -> bool:
-        return name in self._TEMPLATES
+        return self._registry.exists(name)
 
     def get(self, name: str) -> Optional[EngineTemplate]:
-        try:
-            return Template.as_model(self._TEMPLATES.get(name))
-        except:
-            return None
+        return self._registry.get(name)
 
     def triggers(self) -> List[EngineRoute]:
-        return [
-            EngineRoute(user_input=v, next_stage=k, is_regex=str(v).startswith(EngineConstants.REGEX_PLACEHOLDER))
-            for k, v in self._TRIGGERS.items()
-        ]
+        return self._registry.triggers()
+
+
+# bundle & lazy storage build on the classes above
+from pywce.modules.storage.bundle import BundleStorageManager, compile_bundle, source_checksum
+from pywce.modules.storage.lazy import LazyYamlJsonStorageManager
@@ -0,0 +1,219 @@
+import functools
+import hashlib
+import json
+import mmap
+import pickle
+import struct
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import pydantic
+
+from pywce.modules.storage import IStorageManager, YamlJsonStorageManager
+from pywce.src.exceptions import EngineException
+from pywce.src.templates import EngineTemplate
+from pywce.src.templates.base_model import EngineRoute
+
+BUNDLE_MAGIC = b"PYWCEBN"
+BUNDLE_VERSION = 1
+
+# magic, format version, header length
+_PREAMBLE = struct.Struct(f"<{len(BUNDLE_MAGIC)}sII")
+
+
+def source_checksum(template_dir: Union[str, Path], trigger_dir: Union[str, Path]) -> str:
+    """
+    sha256 over the names & contents of the template and trigger files, in name order
+    """
+    digest = hashlib.sha256()
+
+    for label, directory in (("templates", Path(template_dir)), ("triggers", Path(trigger_dir))):
+        for file_path in sorted(directory.glob("*")):
+            if file_path.suffix not in YamlJsonStorageManager.SUFFIXES:
+                continue
+
+            data = file_path.read_bytes()
+            digest.update(f"{label}/{file_path.name}:{len(data)}\n".encode("utf-8"))
+            digest.update(data)
+
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=1)
+def schema_hash() -> str:
+    """
+    sha256 over the JSON schema of the template models, changes with any model field
+    """
+    schema = json.dumps(pydantic.TypeAdapter(EngineTemplate).json_schema(), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(schema.encode("utf-8")).hexdigest()
+
+
+def compile_bundle(template_dir: Union[str, Path], trigger_dir: Union[str, Path],
+                   output: Union[str, Path]) -> Dict[str, Any]:
+    """
+    parse & validate a template and trigger directory into one binary bundle
+
+    Layout: a fixed preamble, a JSON header with the source checksum, the pydantic version & template
+    model schema hash, triggers and the template index (name -> offset, length), then one pickled,
+    validated model per template. The bundle is written to a temp file and renamed over `output`.
+
+    :raises EngineException: if a template is invalid, nothing is written
+    :return: the bundle header
+    """
+    source = YamlJsonStorageManager(str(template_dir), str(trigger_dir))
+    models, errors = source._validate(source._TEMPLATES)
+
+    if errors:
+        raise EngineException(f"Invalid templates: {', '.join(errors)}", data=errors)
+
+    index: Dict[str, List[int]] = {}
+    blobs: List[bytes] = []
+    offset = 0
+
+    for name in sorted(models):
+        blob = pickle.dumps(models[name], pickle.HIGHEST_PROTOCOL)
+        index[name] = [offset, len(blob)]
+        blobs.append(blob)
+        offset += len(blob)
+
+    header = {
+        "checksum": source_checksum(template_dir, trigger_dir),
+        "pydantic": pydantic.VERSION,
+        "schema": schema_hash(),
+        "compiled_at": int(time.time()),
+        "triggers": source._TRIGGERS,
+        "templates": index,
+    }
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+
+    output = Path(output)
+    tmp = output.with_name(f"{output.name}.tmp")
+
+    try:
+        with tmp.open("wb") as f:
+            f.write(_PREAMBLE.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(header_bytes)))
+            f.write(header_bytes)
+
+            for blob in blobs:
+                f.write(blob)
+
+        tmp.replace(output)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+    return header
+
+
+class BundleStorageManager(IStorageManager):
+    """
+    Template storage over a bundle from `compile_bundle` / `pywce compile`
+
+    The bundle is memory mapped and only its header is parsed on load, each template model
+    is unpickled from the mapping on first `get` and kept. Templates are validated at compile time.
+    Call `close()` to release the mapping.
+
+    A bundle compiled with another pydantic version or other template models raises `EngineException`.
+
+    With `template_dir` & `trigger_dir` the bundle checksum is checked against the source files,
+    a stale bundle raises `EngineException`.
+    """
+
+    def __init__(self, bundle_path: str, template_dir: Optional[str] = None, trigger_dir: Optional[str] = None):
+        self.bundle_path = Path(bundle_path)
+        self.template_dir = template_dir
+        self.trigger_dir = trigger_dir
+
+        self._file = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._index: Dict[str, List[int]] = {}
+        self._models: Dict[str, EngineTemplate] = {}
+        self._routes: List[EngineRoute] = []
+        self.header: Dict[str, Any] = {}
+
+        self._open()
+        self.load_triggers()
+        self.load_templates()
+
+    def _open(self) -> None:
+        self.close()
+
+        self._file = self.bundle_path.open("rb")
+
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._read_header()
+        except Exception:
+            self.close()
+            raise
+
+    def _read_header(self) -> None:
+        magic, version, header_size = _PREAMBLE.unpack_from(self._mmap, 0)
+
+        if magic != BUNDLE_MAGIC:
+            raise EngineException(f"Not a template bundle: {self.bundle_path}")
+
+        if version != BUNDLE_VERSION:
+            raise EngineException(f"Template bundle version {version} is not supported, recompile it",
+                                  data=str(self.bundle_path))
+
+        self.header = json.loads(self._mmap[_PREAMBLE.size:_PREAMBLE.size + header_size])
+        self._data_offset = _PREAMBLE.size + header_size
+
+        data_size = max((offset + size for offset, size in self.header["templates"].values()), default=0)
+
+        if self._data_offset + data_size > len(self._mmap):
+            raise EngineException("Template bundle is truncated, recompile it", data=str(self.bundle_path))
+
+        if self.header["pydantic"] != pydantic.VERSION:
+            raise EngineException("Template bundle was compiled with another pydantic version, recompile it",
+                                  data=self.header["pydantic"])
+
+        if self.header.get("schema") != schema_hash():
+            raise EngineException("Template bundle was compiled for other template models, recompile it",
+                                  data=str(self.bundle_path))
+
+        if self.template_dir is not None and self.trigger_dir is not None:
+            if source_checksum(self.template_dir, self.trigger_dir) != self.header["checksum"]:
+                raise EngineException("Template bundle is stale, recompile it", data=str(self.bundle_path))
+
+    def load_templates(self) -> None:
+        self._index = self.header["templates"]
+        self._models = {}
+
+        if not self._index:
+            raise EngineException("No valid templates found")
+
+    def load_triggers(self) -> None:
+        self._routes = YamlJsonStorageManager._routes(self.header["triggers"])
+
+    def close(self) -> None:
+        """
+        release the memory mapping
+        """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def exists(self, name: str) -> bool:
+        return name in self._index
+
+    def get(self, name: str) -> Optional[EngineTemplate]:
+        model = self._models.get(name)
+
+        if model is None and name in self._index:
+            offset, size = self._index[name]
+            start = self._data_offset + offset
+
+            model = pickle.loads(self._mmap[start:start + size])
+            self._models[name] = model
+
+        return model
+
+    def triggers(self) -> List[EngineRoute]:
+        return self._routes
@@ -0,0 +1,214 @@
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import ruamel.yaml
+
+from pywce.modules.storage import IStorageManager, YamlJsonStorageManager, _merge, _read_file
+from pywce.src.exceptions import EngineException
+from pywce.src.templates import EngineTemplate, Template
+from pywce.src.templates.base_model import EngineRoute
+
+_logger = logging.getLogger(__name__)
+
+# a top level mapping key: "NAME":, 'NAME': or NAME: at column 0
+_YAML_KEY = re.compile(rb'^(?:"((?:[^"\\]|\\.)*)"|\'((?:[^\']|\'\')*)\'|([^\s#\'"{\[\-?:][^#]*?))\s*:(?:\s|$)')
+
+
+class TemplateLocation(NamedTuple):
+    """
+    where a template is stored, `size` -1 means the whole file has to be parsed
+    """
+    path: Path
+    offset: int
+    size: int
+
+
+def _yaml_key(match: re.Match) -> str:
+    double, single, plain = match.groups()
+
+    if double is not None:
+        return json.loads(b'"' + double + b'"')
+    if single is not None:
+        return single.decode("utf-8").replace("''", "'")
+
+    return plain.decode("utf-8").strip()
+
+
+def _index_yaml(file_path: Path) -> Dict[str, TemplateLocation]:
+    """
+    byte range of every top level key, the template set convention of one block mapping per file
+
+    Falls back to whole-file locations on anything else at column 0, e.g. documents or flow style.
+    """
+    data = file_path.read_bytes()
+    starts: List[Tuple[str, int]] = []
+    offset = 0
+
+    for line in data.splitlines(keepends=True):
+        if line[:1] not in (b" ", b"\t", b"#", b"\n", b"\r", b""):
+            match = _YAML_KEY.match(line)
+
+            if match is None:
+                return {name: TemplateLocation(file_path, 0, -1) for name in _read_file(file_path, ruamel.yaml.YAML())}
+
+            starts.append((_yaml_key(match), offset))
+
+        offset += len(line)
+
+    return {name: TemplateLocation(file_path, start, (starts[i + 1][1] if i + 1 < len(starts) else len(data)) - start)
+            for i, (name, start) in enumerate(starts)}
+
+
+def _index_json(file_path: Path) -> Dict[str, TemplateLocation]:
+    """
+    byte range of every top level value, found by decoding each value & discarding it
+    """
+    text = file_path.read_text(encoding="utf-8")
+    decoder = json.JSONDecoder()
+    index = {}
+
+    whitespace = re.compile(r"\s*")
+    pos = whitespace.match(text, 0).end()
+
+    if text[pos:pos + 1] != "{":
+        raise EngineException(f"Template file is not a JSON object: {file_path}")
+
+    # char -> byte offsets, counted incrementally
+    char_pos, byte_pos = 0, 0
+
+    def to_bytes(i: int) -> int:
+        nonlocal char_pos, byte_pos
+        byte_pos += len(text[char_pos:i].encode("utf-8"))
+        char_pos = i
+        return byte_pos
+
+    pos = whitespace.match(text, pos + 1).end()
+
+    while text[pos:pos + 1] != "}":
+        name, pos = json.decoder.scanstring(text, pos + 1)
+        pos = whitespace.match(text, pos).end() + 1
+        start = whitespace.match(text, pos).end()
+
+        _, end = decoder.raw_decode(text, start)
+        byte_start = to_bytes(start)
+        index[name] = TemplateLocation(file_path, byte_start, to_bytes(end) - byte_start)
+
+        pos = whitespace.match(text, end).end()
+        if text[pos:pos + 1] == ",":
+            pos = whitespace.match(text, pos + 1).end()
+
+    return index
+
+
+class LazyYamlJsonStorageManager(IStorageManager):
+    """
+    YAML/JSON files storage manager for very large template sets
+
+    On load only an index of template name -> (file, byte offset, size) is built.
+    A template is parsed & validated on its first `get` and kept in an LRU of `cache_size`
+    validated models, so startup is fast and memory bounded while hot stages stay resident.
+
+    YAML files are indexed by their top level keys, a template must not use anchors defined
+    in another template. Files that are not a plain block mapping are parsed whole on first `get`.
+    Triggers are loaded eagerly. Templates failing validation are logged and `get` returns None.
+    A template or trigger defined in two files raises `EngineException`.
+    """
+
+    def __init__(self, template_dir: str, trigger_dir: str, cache_size: int = 256):
+        self.template_dir = Path(template_dir)
+        self.trigger_dir = Path(trigger_dir)
+        self.cache_size = cache_size
+        self.yaml = ruamel.yaml.YAML()
+
+        self._index: Dict[str, TemplateLocation] = {}
+        self._routes: List[EngineRoute] = []
+        self._cache: Dict[str, Optional[EngineTemplate]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._parse_lock = threading.Lock()
+
+        self.load_triggers()
+        self.load_templates()
+
+    def load_templates(self) -> None:
+        if not self.template_dir.is_dir():
+            raise EngineException("Template dir provided is not a valid directory")
+
+        index = _merge([
+            (file_path, _index_json(file_path) if file_path.suffix == ".json" else _index_yaml(file_path))
+            for file_path in sorted(self.template_dir.glob("*"))
+            if file_path.suffix in YamlJsonStorageManager.SUFFIXES
+        ], "Template")
+
+        if not index:
+            raise EngineException("No valid templates found")
+
+        with self._lock:
+            self._index = index
+            self._cache.clear()
+
+    def load_triggers(self) -> None:
+        if not self.trigger_dir.is_dir():
+            raise EngineException("Trigger dir provided is not a valid directory")
+
+        triggers = _merge([
+            (file_path, _read_file(file_path, self.yaml))
+            for file_path in sorted(self.trigger_dir.glob("*"))
+            if file_path.suffix in YamlJsonStorageManager.SUFFIXES
+        ], "Trigger")
+
+        self._routes = YamlJsonStorageManager._routes(triggers)
+
+    def _parse(self, name: str, location: TemplateLocation) -> Optional[EngineTemplate]:
+        try:
+            if location.size < 0:
+                with self._parse_lock:
+                    raw = _read_file(location.path, self.yaml).get(name)
+            else:
+                with location.path.open("rb") as f:
+                    f.seek(location.offset)
+                    chunk = f.read(location.size)
+
+                if location.path.suffix == ".json":
+                    raw = json.loads(chunk)
+                else:
+                    # the YAML instance keeps parser state, one parse at a time
+                    with self._parse_lock:
+                        raw = self.yaml.load(chunk).get(name)
+
+            return Template.as_model(raw)
+
+        except Exception as e:
+            _logger.error("Invalid template: %s, error: %s", name, e)
+            return None
+
+    def exists(self, name: str) -> bool:
+        return name in self._index
+
+    def get(self, name: str) -> Optional[EngineTemplate]:
+        with self._lock:
+            if name in self._cache:
+                self._cache.move_to_end(name)
+                return self._cache[name]
+
+            location = self._index.get(name)
+
+        if location is None:
+            return None
+
+        model = self._parse(name, location)
+
+        with self._lock:
+            self._cache[name] = model
+
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+        return model
+
+    def triggers(self) -> List[EngineRoute]:
+        return self._routes
@@ -0,0 +1,199 @@
+"""
+Per-stage latency tracing.
+
+Library stages (webhook parse, session reads & writes, message processor setup, hooks,
+template rendering & WhatsApp http calls) are wrapped in spans. Finished spans are handed to
+the configured exporter, by default a no-op exporter so tracing costs nothing unless enabled.
+
+Example:
+    from pywce.modules import tracing
+
+    exporter = tracing.RingBufferSpanExporter(capacity=50_000)
+    tracing.set_exporter(exporter)
+
+    ...
+
+    print(exporter.summary())
+"""
+import itertools
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Dict, List, NamedTuple, Optional
+
+_logger = logging.getLogger(__name__)
+
+_trace_ids = itertools.count(1)
+_current_trace: ContextVar[Optional[int]] = ContextVar("pywce_trace_id", default=None)
+
+
+class Span(NamedTuple):
+    """
+        a finished span
+
+        :var name: stage name e.g. `hook`, `whatsapp.send`
+        :var trace_id: id shared by all spans of one webhook
+        :var start_ns: epoch start time in nanoseconds
+        :var duration_ns: elapsed time in nanoseconds
+        :var attributes: stage details e.g. the hook path
+    """
+    name: str
+    trace_id: int
+    start_ns: int
+    duration_ns: int
+    attributes: Dict[str, Any]
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration_ns / 1_000_000
+
+
+class ISpanExporter(ABC):
+    @abstractmethod
+    def export(self, span: Span) -> None:
+        """
+        called for every finished span, on the thread that ran the stage. Keep it fast.
+        """
+        pass
+
+
+class NoopSpanExporter(ISpanExporter):
+    def export(self, span: Span) -> None:
+        pass
+
+
+class RingBufferSpanExporter(ISpanExporter):
+    """
+        Keeps the last `capacity` spans in memory
+    """
+
+    def __init__(self, capacity: int = 10_000):
+        self._spans: deque = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self, name: Optional[str] = None) -> List[Span]:
+        with self._lock:
+            spans = list(self._spans)
+
+        return spans if name is None else [s for s in spans if s.name == name]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        latency summary per span name, in milliseconds
+
+        :return: {name: {count, p50, p95, p99, max}}
+        """
+        durations: Dict[str, List[float]] = {}
+
+        for s in self.spans():
+            durations.setdefault(s.name, []).append(s.duration_ms)
+
+        result = {}
+
+        for name, values in durations.items():
+            values.sort()
+            last = len(values) - 1
+            result[name] = {
+                "count": len(values),
+                "p50": values[int(last * 0.50)],
+                "p95": values[int(last * 0.95)],
+                "p99": values[int(last * 0.99)],
+                "max": values[last]
+            }
+
+        return result
+
+
+class _ActiveSpan:
+    __slots__ = ("name", "attributes", "_start", "_start_ns", "_token")
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.attributes = attributes
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self._token = _current_trace.set(next(_trace_ids)) if _current_trace.get() is None else None
+        self._start_ns = time.time_ns()
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter_ns() - self._start
+
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+
+        try:
+            _exporter.export(Span(self.name, _current_trace.get(), self._start_ns, duration, self.attributes))
+        except Exception as e:
+            _logger.error("Span exporter failed: %s", e)
+
+        if self._token is not None:
+            _current_trace.reset(self._token)
+
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+_exporter: ISpanExporter = NoopSpanExporter()
+_enabled = False
+
+
+def set_exporter(exporter: Optional[ISpanExporter]) -> None:
+    """
+    set the process-wide span exporter, None restores the no-op exporter
+    """
+    global _exporter, _enabled
+
+    _exporter = exporter or NoopSpanExporter()
+    _enabled = not isinstance(_exporter, NoopSpanExporter)
+
+
+def get_exporter() -> ISpanExporter:
+    return _exporter
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def span(name: str, **attributes):
+    """
+    time a stage, use as a context manager
+
+    The outermost span on a thread / task starts a new trace, nested spans share its trace id.
+
+        with tracing.span("hook", hook=path):
+            ...
+    """
+    if not _enabled:
+        return _NOOP_SPAN
+
+    return _ActiveSpan(name, attributes)
@@ -5,23 +5,31 @@ https://github.com/oca159/heyoo/tree/main
 Unofficial python wrapper for the WhatsApp Cloud API.
 """
 
+import asyncio
+import inspect
 import json
 import logging
 import mimetypes
 import os
+import threading
+import weakref
 from base64 import b64decode, b64encode
 from collections.abc import Callable
 from dataclasses import dataclass
-from typing import Dict, Any, List, Union, Optional
+from typing import Dict, Any, List, Union, Optional, Iterator, Tuple, NamedTuple
 
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import padding
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from httpx import Client
+from httpx import Client, AsyncClient
 
+from pywce.modules import tracing
 from pywce.modules.whatsapp.config import WhatsAppConfig
 from pywce.modules.whatsapp.message_utils import MessageUtils
-from pywce.modules.whatsapp.model import MessageTypeEnum, WaUser, ResponseStructure
+from pywce.modules.whatsapp.model import MessageTypeEnum, WaUser, ResponseStructure, WebhookEnvelope
+from pywce.modules.whatsapp.model.webhook_envelope import ordered_raw_messages, split_payloads
+from pywce.modules.whatsapp.status import StatusEvent, StatusPipeline, IStatusSink, CallbackStatusSink, \
+    QueueStatusSink
 from pywce.src.exceptions import EngineClientException, FlowEndpointException
 
 _logger = logging.getLogger(__name__)
@@ -43,6 +51,16 @@ class FlowEndpointResponse:
     iv: bytes
 
 
+class SentMessage(NamedTuple):
+    """
+        an outbound message request, passed to `on_send_listener` if it accepts an argument
+    """
+    message_type: str
+    recipient_id: str
+    payload: Dict[str, Any]
+    response: Optional[Dict[str, Any]] = None
+
+
 class WhatsApp:
     INVALID_SIGNATURE_HTTP_CODE: int = 432
     INVALID_FLOW_TOKEN_HTTP_CODE: int = 427
@@ -65,7 +83,10 @@ class WhatsApp:
 
         Args:
             config[WhatsAppConfig]: config object
+            on_send_listener[Callable]: called after every api request. If it accepts an argument,
+                                        message sends pass a [SentMessage], media requests pass None
         """
+        self._aio: Optional["AsyncWhatsApp"] = None
         self.config = whatsapp_config
         self.listener = on_send_listener
         self.base_url = f"https://graph.facebook.com/{self.config.version}"
@@ -80,6 +101,45 @@ class WhatsApp:
         }
         self.util = self._Utils(self)
 
+    @property
+    def listener(self) -> Optional[Callable]:
+        return self._listener
+
+    @listener.setter
+    def listener(self, listener: Optional[Callable]) -> None:
+        self._listener = listener
+        self._listener_takes_arg = False
+
+        if listener is not None:
+            try:
+                self._listener_takes_arg = len(inspect.signature(listener).parameters) > 0
+            except (TypeError, ValueError):
+                pass
+
+        if self._aio is not None and self._aio is not self:
+            self._aio.listener = listener
+
+    def _notify_listener(self, sent: Optional[SentMessage] = None) -> None:
+        if self._listener is None:
+            return
+
+        if self._listener_takes_arg:
+            self._listener(sent)
+        else:
+            self._listener()
+
+    @property
+    def aio(self) -> "AsyncWhatsApp":
+        """
+        asyncio view of this client, sharing the same config & send listener.
+
+        All its send_* methods return awaitables. The view is cached, it keeps one pooled
+        http client per event loop so it can be used from `asyncio.run` calls & loop threads
+        """
+        if self._aio is None:
+            self._aio = AsyncWhatsApp(self.config, on_send_listener=self.listener)
+        return self._aio
+
     def _send_request(self, message_type: str, recipient_id: str, data: Dict[str, Any]):
         """
         Send a request to the official WhatsApp API
@@ -91,24 +151,23 @@ class WhatsApp:
         """
 
         _logger.debug(f"Sending {message_type} to {recipient_id}")
+        result = None
 
         try:
-            with Client() as client:
+            with tracing.span("whatsapp.send", type=message_type), Client() as client:
                 response = client.post(self.url, headers=self.headers, json=data)
 
-            if response.status_code == 200:
-                return response.json()
-
-            else:
+            if response.status_code != 200:
                 _logger.critical(f"Code: {response.status_code} | Response: {response.text}")
-                return response.json()
+
+            result = response.json()
+            return result
 
         except Exception as e:
             _logger.error(f"Error sending {message_type} to {recipient_id}: {str(e)}")
 
         finally:
-            if self.listener:
-                self.listener()
+            self._notify_listener(SentMessage(message_type, recipient_id, data, result))
 
     def send_message(self, recipient_id: str, message: str, recipient_type: str = "individual",
                      message_id: str = None, preview_url: bool = True):
@@ -614,6 +673,12 @@ class WhatsApp:
             if "statuses" in data:
                 return data["statuses"][0]["status"]
 
+        def get_statuses(self, webhook_data: Union[Dict[Any, Any], bytes]) -> List[StatusEvent]:
+            """
+            Extracts every status event across all entries & changes of the webhook.
+            """
+            return StatusPipeline.parse_statuses(webhook_data)
+
         def get_response_structure(self, webhook_data: Dict[Any, Any]) -> Union[ResponseStructure, None]:
             """
             Compute the response body of the message from the data received from the webhook.
@@ -624,6 +689,48 @@ class WhatsApp:
                 data = self._pre_process(webhook_data)
                 return MessageUtils(message_data=data.get("messages")[0]).get_structure()
 
+        def get_messages(self, webhook_data: Dict[Any, Any]) -> List[Tuple[WaUser, ResponseStructure]]:
+            """
+            Extract every message in a webhook payload, including batched deliveries
+            with several messages, changes or entries.
+
+            Messages are grouped per user and ordered by timestamp within each user.
+
+            :param webhook_data: WhatsApp webhook data
+            :return: list of (user, response) pairs
+            """
+            messages = []
+
+            for _, _, message, contact in ordered_raw_messages(webhook_data):
+                user = WaUser(
+                    wa_id=contact.get("wa_id"),
+                    name=(contact.get("profile") or {}).get("name"),
+                    msg_id=message.get("id"),
+                    timestamp=message.get("timestamp")
+                )
+
+                try:
+                    user.wa_validator()
+                except AssertionError as e:
+                    _logger.critical("Skipping invalid webhook message: %s", e)
+                    continue
+
+                messages.append((user, MessageUtils(message_data=message).get_structure()))
+
+            return messages
+
+        def split_webhook(self, webhook_data: Dict[Any, Any]) -> List[Dict[Any, Any]]:
+            """
+            Split a batched webhook into single message webhook payloads.
+
+            Payloads are grouped per user and ordered by timestamp within each user,
+            each one can be passed on as is to `Engine.process_webhook` or a dispatcher.
+
+            :param webhook_data: WhatsApp webhook data
+            :return: list of single message webhook payloads
+            """
+            return split_payloads(webhook_data)
+
         def upload_media(self, media_path: str) -> Union[str, None]:
             """
              uploads a media file to the cloud API and returns the ID of the media.
@@ -665,8 +772,7 @@ class WhatsApp:
                 return None
 
             finally:
-                if self.parent.listener:
-                    self.parent.listener()
+                self.parent._notify_listener()
 
         def delete_media(self, media_id: str) -> bool:
             """
@@ -755,8 +861,7 @@ class WhatsApp:
                 return None
 
             finally:
-                if self.parent.listener:
-                    self.parent.listener()
+                self.parent._notify_listener()
 
         def download_flow_media(self, flow_media_payload: Dict, download_dir: str = None):
             """
@@ -785,3 +890,98 @@ class WhatsApp:
                 raise EngineClientException(f"Failed to download file for media id: {flow_media_payload.get('id')}")
 
             return downloaded_path
+
+
+class AsyncWhatsApp(WhatsApp):
+    """
+    asyncio variant of the WhatsApp client.
+
+    Exposes the same send_* api as [WhatsApp] but every send method returns an awaitable.
+    Requests are sent over a pooled httpx.AsyncClient so many in-flight
+    conversations can share connections on one event loop.
+
+    An httpx.AsyncClient is bound to the event loop it first ran on. Without `http_client`,
+    one is created per running loop and dropped once that loop is closed.
+    Close it with `await aclose()` or by using the client as an async context manager::
+
+        async with AsyncWhatsApp(config) as whatsapp:
+            await whatsapp.send_message(...)
+
+    A given `http_client` is used on every loop, its lifecycle belongs to the caller
+    unless `aclose()` is called.
+
+    Utility methods under `util` remain synchronous.
+    """
+
+    def __init__(self,
+                 whatsapp_config: WhatsAppConfig,
+                 on_send_listener: Optional[Callable] = None,
+                 http_client: Optional[AsyncClient] = None
+                 ):
+        super().__init__(whatsapp_config, on_send_listener=on_send_listener)
+        self._http_client = http_client
+        self._loop_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncClient]" = \
+            weakref.WeakKeyDictionary()
+        self._loop_clients_lock = threading.Lock()
+
+    @property
+    def aio(self) -> "AsyncWhatsApp":
+        return self
+
+    async def __aenter__(self) -> "AsyncWhatsApp":
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.aclose()
+
+    def _client(self) -> AsyncClient:
+        if self._http_client is not None and not self._http_client.is_closed:
+            return self._http_client
+
+        loop = asyncio.get_running_loop()
+
+        with self._loop_clients_lock:
+            http_client = self._loop_clients.get(loop)
+
+            if http_client is None or http_client.is_closed:
+                # clients of closed loops can no longer be awaited, drop them
+                for closed in [_loop for _loop in self._loop_clients if _loop.is_closed()]:
+                    del self._loop_clients[closed]
+
+                http_client = self._loop_clients[loop] = AsyncClient()
+
+        return http_client
+
+    async def _send_request(self, message_type: str, recipient_id: str, data: Dict[str, Any]):
+        _logger.debug(f"Sending {message_type} to {recipient_id}")
+        result = None
+
+        try:
+            with tracing.span("whatsapp.send", type=message_type):
+                response = await self._client().post(self.url, headers=self.headers, json=data)
+
+            if response.status_code != 200:
+                _logger.critical(f"Code: {response.status_code} | Response: {response.text}")
+
+            result = response.json()
+            return result
+
+        except Exception as e:
+            _logger.error(f"Error sending {message_type} to {recipient_id}: {str(e)}")
+
+        finally:
+            self._notify_listener(SentMessage(message_type, recipient_id, data, result))
+
+    async def aclose(self) -> None:
+        """
+        close the given http client and the pooled http client of the running loop
+        """
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+        with self._loop_clients_lock:
+            http_client = self._loop_clients.pop(asyncio.get_running_loop(), None)
+
+        if http_client is not None:
+            await http_client.aclose()
@@ -1,3 +1,4 @@
 from .message_type_enum import MessageTypeEnum
 from .response_structure import ResponseStructure
-from .wa_user import WaUser
\ No newline at end of file
+from .wa_user import WaUser
+from .webhook_envelope import WebhookEnvelope
@@ -0,0 +1,201 @@
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from pywce.modules.whatsapp.model.response_structure import ResponseStructure
+from pywce.modules.whatsapp.model.wa_user import WaUser
+
+
+def iter_raw_messages(webhook_data: Dict[str, Any]) -> Iterator[Tuple[Dict, Dict, Dict, Dict]]:
+    """
+    Walk every entry & change of a (possibly batched) webhook.
+
+    :return: iterator of (entry, change, message, contact)
+    """
+    for entry in webhook_data.get("entry") or []:
+        for change in entry.get("changes") or []:
+            value = change.get("value") or {}
+
+            if value.get("messaging_product") != "whatsapp":
+                continue
+
+            contacts = {c.get("wa_id"): c for c in value.get("contacts") or []}
+
+            for message in value.get("messages") or []:
+                contact = contacts.get(message.get("from"))
+
+                if contact is None and len(contacts) == 1:
+                    contact = next(iter(contacts.values()))
+
+                yield entry, change, message, contact or {"wa_id": message.get("from")}
+
+
+def ordered_raw_messages(webhook_data: Dict[str, Any]) -> List[Tuple[Dict, Dict, Dict, Dict]]:
+    """
+    all raw messages grouped per user, in order of first appearance,
+    and in timestamp order within each user
+    """
+    raw = list(iter_raw_messages(webhook_data))
+    first_seen: Dict[str, int] = {}
+
+    for _, _, _, contact in raw:
+        first_seen.setdefault(contact.get("wa_id"), len(first_seen))
+
+    return sorted(raw, key=lambda r: (first_seen[r[3].get("wa_id")], int(r[2].get("timestamp") or 0)))
+
+
+def split_payloads(webhook_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    single message webhook payloads of a batched webhook, grouped per user in timestamp order
+    """
+    payloads = []
+
+    for entry, change, message, contact in ordered_raw_messages(webhook_data):
+        value = {k: v for k, v in change.get("value").items() if k not in ("contacts", "messages", "statuses")}
+        value["contacts"] = [contact]
+        value["messages"] = [message]
+
+        payloads.append({
+            "object": webhook_data.get("object"),
+            "entry": [{
+                "id": entry.get("id"),
+                "changes": [{"field": change.get("field"), "value": value}]
+            }]
+        })
+
+    return payloads
+
+
+class WebhookEnvelope:
+    """
+        Single-pass parsed webhook payload.
+
+        Parses the raw webhook once and keeps a reference to its `entry[0].changes[0].value`.
+        The user, message, statuses & errors are computed lazily on first access and cached,
+        so the engine, worker & message processor can share one object per webhook.
+    """
+    __slots__ = ("data", "value", "_user", "_message")
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        self.value: Dict[str, Any] = self._first_value(data)
+        self._user: Optional[WaUser] = None
+        self._message: Optional[ResponseStructure] = None
+
+    @staticmethod
+    def _first_value(data: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            value = data["entry"][0]["changes"][0]["value"]
+        except (KeyError, IndexError, TypeError):
+            return {}
+
+        return value if value.get("messaging_product") == "whatsapp" else {}
+
+    @classmethod
+    def from_bytes(cls, payload: Union[bytes, str]) -> "WebhookEnvelope":
+        return cls(json.loads(payload))
+
+    @classmethod
+    def of(cls, webhook: Union["WebhookEnvelope", Dict[str, Any], bytes, str]) -> "WebhookEnvelope":
+        """
+        get an envelope from a raw webhook body, a parsed webhook dict or an existing envelope
+        """
+        if isinstance(webhook, WebhookEnvelope):
+            return webhook
+
+        if isinstance(webhook, (bytes, bytearray, str)):
+            return cls.from_bytes(webhook)
+
+        return cls(webhook)
+
+    @property
+    def is_message(self) -> bool:
+        return bool(self.value.get("messages"))
+
+    @property
+    def is_batch(self) -> bool:
+        """
+        True if the webhook carries more than one entry, change or message
+        """
+        if not isinstance(self.data, dict):
+            return False
+
+        entries = self.data.get("entry") or []
+
+        if len(entries) > 1:
+            return True
+
+        return (bool(entries) and len(entries[0].get("changes") or []) > 1) or len(self.value.get("messages") or []) > 1
+
+    def split(self) -> List["WebhookEnvelope"]:
+        """
+        one envelope per message of a batched webhook, grouped per user in timestamp order,
+        so every message can be routed & processed by its own sender
+
+        A webhook that is not a batch, or a batch without messages (e.g. statuses), is returned whole
+        """
+        if not self.is_batch:
+            return [self]
+
+        return [WebhookEnvelope(payload) for payload in split_payloads(self.data)] or [self]
+
+    @property
+    def is_status(self) -> bool:
+        return bool(self.value.get("statuses"))
+
+    @property
+    def raw_message(self) -> Optional[Dict[str, Any]]:
+        messages = self.value.get("messages")
+        return messages[0] if messages else None
+
+    @property
+    def wa_id(self) -> Optional[str]:
+        """
+        sender wa_id, None if this is not a message webhook
+        """
+        if not self.is_message:
+            return None
+
+        contacts = self.value.get("contacts")
+        if contacts:
+            return contacts[0].get("wa_id")
+
+        return self.raw_message.get("from")
+
+    @property
+    def user(self) -> Optional[WaUser]:
+        if self._user is None and self.is_message:
+            contact = (self.value.get("contacts") or [{}])[0]
+            message = self.raw_message
+
+            user = WaUser(
+                wa_id=contact.get("wa_id"),
+                name=(contact.get("profile") or {}).get("name"),
+                msg_id=message.get("id"),
+                timestamp=message.get("timestamp")
+            )
+            user.wa_validator()
+
+            self._user = user
+
+        return self._user
+
+    @property
+    def message(self) -> Optional[ResponseStructure]:
+        if self._message is None and self.is_message:
+            # avoid circular import, message utils depend on the models package
+            from pywce.modules.whatsapp.message_utils import MessageUtils
+            self._message = MessageUtils(message_data=self.raw_message).get_structure()
+
+        return self._message
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self.value.get("metadata") or {}
+
+    @property
+    def statuses(self) -> List[Dict[str, Any]]:
+        return self.value.get("statuses") or []
+
+    @property
+    def errors(self) -> List[Dict[str, Any]]:
+        return self.value.get("errors") or []
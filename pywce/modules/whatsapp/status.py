@@ -0,0 +1,204 @@
+import json
+import logging
+import queue
+import re
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Union
+
+from pywce.modules.whatsapp.model import WebhookEnvelope
+
+_logger = logging.getLogger(__name__)
+
+# match keys only, every webhook also carries "field": "messages" as a value
+_STATUSES_KEY = re.compile(rb'"statuses"\s*:')
+_MESSAGES_KEY = re.compile(rb'"messages"\s*:')
+
+
+class StatusEvent(NamedTuple):
+    """
+        A single message status callback (sent, delivered, read, failed)
+    """
+    id: str
+    status: str
+    recipient_id: Optional[str] = None
+    timestamp: Optional[str] = None
+    errors: Optional[List[Dict[str, Any]]] = None
+
+
+class IStatusSink(ABC):
+    """Destination for batches of status events"""
+
+    @abstractmethod
+    def emit(self, events: List[StatusEvent]) -> None:
+        pass
+
+
+class CallbackStatusSink(IStatusSink):
+    """Calls `callback(events)` with every batch"""
+
+    def __init__(self, callback: Callable[[List[StatusEvent]], Any]):
+        self.callback = callback
+
+    def emit(self, events: List[StatusEvent]) -> None:
+        self.callback(events)
+
+
+class QueueStatusSink(IStatusSink):
+    """Puts every batch on a queue, e.g. queue.Queue or multiprocessing.Queue, without blocking"""
+
+    def __init__(self, q):
+        self.queue = q
+
+    def emit(self, events: List[StatusEvent]) -> None:
+        try:
+            self.queue.put_nowait(events)
+        except queue.Full:
+            _logger.warning("Status queue is full, dropping %s status events", len(events))
+
+
+class StatusPipeline:
+    """
+        Fast path for status (sent / delivered / read / failed) webhooks.
+
+        Status-only webhooks are detected from the raw body, turned into light weight
+        [StatusEvent] tuples, buffered and handed over to the sink in batches.
+        They never reach the engine worker, session or templates.
+
+        A batch is emitted when `batch_size` events are buffered, on every `flush_interval_s`
+        if started, and on `flush()` / `stop()`.
+
+        Example:
+            pipeline = StatusPipeline(CallbackStatusSink(save_receipts))
+            pipeline.start()
+
+            # in webhook route, before handing to the engine
+            if not pipeline.offer(raw_body):
+                engine.process_webhook(raw_body)
+    """
+
+    def __init__(self, sink: IStatusSink, batch_size: int = 100, flush_interval_s: float = 1.0):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+
+        self._buffer: List[StatusEvent] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def is_status_only(webhook: Union[bytes, str, Dict[str, Any], WebhookEnvelope]) -> bool:
+        """
+        check if a webhook only carries status callbacks, in every entry & change.
+
+        Raw bodies are classified by a byte scan, without json parsing
+        """
+        if isinstance(webhook, str):
+            webhook = webhook.encode("utf-8")
+
+        if isinstance(webhook, (bytes, bytearray)):
+            return _STATUSES_KEY.search(webhook) is not None and _MESSAGES_KEY.search(webhook) is None
+
+        envelope = WebhookEnvelope.of(webhook)
+
+        if not envelope.is_batch:
+            return envelope.is_status and not envelope.is_message
+
+        # a batch may mix statuses & messages across its changes
+        has_status = False
+
+        for entry in envelope.data.get("entry") or []:
+            for change in entry.get("changes") or []:
+                value = change.get("value") or {}
+
+                if value.get("messages"):
+                    return False
+
+                has_status = has_status or bool(value.get("statuses"))
+
+        return has_status
+
+    @staticmethod
+    def parse_statuses(webhook: Union[bytes, str, Dict[str, Any], WebhookEnvelope]) -> List[StatusEvent]:
+        """
+        extract every status event across all entries & changes of a webhook
+        """
+        data = webhook.data if isinstance(webhook, WebhookEnvelope) else webhook
+
+        if isinstance(data, (bytes, bytearray, str)):
+            data = json.loads(data)
+
+        events = []
+
+        for entry in data.get("entry") or []:
+            for change in entry.get("changes") or []:
+                for status in (change.get("value") or {}).get("statuses") or []:
+                    events.append(StatusEvent(
+                        id=status.get("id"),
+                        status=status.get("status"),
+                        recipient_id=status.get("recipient_id"),
+                        timestamp=status.get("timestamp"),
+                        errors=status.get("errors")
+                    ))
+
+        return events
+
+    def offer(self, webhook: Union[bytes, str, Dict[str, Any], WebhookEnvelope]) -> bool:
+        """
+        consume the webhook if it is status-only
+
+        :return: True if consumed, False if it should be processed by the engine
+        """
+        if not self.is_status_only(webhook):
+            return False
+
+        events = self.parse_statuses(webhook)
+        batch: Optional[List[StatusEvent]] = None
+
+        with self._lock:
+            self._buffer.extend(events)
+
+            if len(self._buffer) >= self.batch_size:
+                batch, self._buffer = self._buffer, []
+
+        if batch:
+            self._emit(batch)
+
+        return True
+
+    def _emit(self, batch: List[StatusEvent]) -> None:
+        try:
+            self.sink.emit(batch)
+        except Exception as e:
+            _logger.error("Status sink failed to process %s events: %s", len(batch), e)
+
+    def flush(self) -> None:
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+
+        if batch:
+            self._emit(batch)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval_s):
+            self.flush()
+
+    def start(self) -> None:
+        """
+        start the periodic flusher thread
+        """
+        if self._thread is not None:
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="pywce-status-pipeline", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+        self.flush()
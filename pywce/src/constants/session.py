@@ -29,5 +29,9 @@ class SessionConstants:
     # set this to enable user external handlers e.g live support / ai agent etc
     EXTERNAL_CHAT_HANDLER = "pywce_ext_handler"
 
+    # the engine keeps current & prev stage, checkpoint, debounce, history, last activity & msg id
+    # in one `EngineState` record under this key, the separate keys above are only read from older sessions
+    ENGINE_STATE = "pywce_state"
+
     DEFAULT_NAME = "wa_name"
     DEFAULT_MOBILE = "wa_mobile"
@@ -1,15 +1,23 @@
+import asyncio
+import contextlib
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional, List, Union
 
-from pywce.modules import client, ISessionManager
+from pywce.modules import client, ISessionManager, tracing
+from pywce.modules.session.traced_session_manager import TracedSessionManager
+from pywce.modules.session.async_adapters import SyncSessionAdapter
+from pywce.modules.session.unit_of_work import SessionUnitOfWork
 from pywce.src.constants import SessionConstants
 from pywce.src.exceptions import ExtHandlerHookError, InternalHookError
 from pywce.src.models import EngineConfig, WorkerJob, WhatsAppServiceModel, HookArg, ExternalHandlerResponse
-from pywce.src.services import Worker, WhatsAppService, HookService
+from pywce.src.services import Worker, AsyncWorker, WhatsAppService, AsyncWhatsAppService, HookService
 from pywce.src.utils.hook_util import HookUtil
 
 logger = logging.getLogger(__name__)
 
+WebhookPayload = Union[Dict[str, Any], bytes, client.WebhookEnvelope]
+
+
 class Engine:
     def __init__(self, config: EngineConfig):
         self.config: EngineConfig = config
@@ -18,7 +26,33 @@ class Engine:
         HookService.register_callable_global_hooks(self.config.global_pre_hooks, self.config.global_post_hooks)
 
     def _user_session(self, session_id) -> ISessionManager:
-        return self.config.session_manager.session(session_id=session_id)
+        return TracedSessionManager.wrap(self.config.session_manager.session(session_id=session_id))
+
+    def _request_session(self, session_id):
+        """
+        user session for processing a single message
+
+        with `session_unit_of_work` enabled, writes are flushed once when the request completes
+        and discarded if it raises
+        """
+        if self.config.session_unit_of_work:
+            return SessionUnitOfWork(self._user_session(session_id), session_id)
+
+        return contextlib.nullcontext(self._user_session(session_id))
+
+    def _request_session_async(self, session_id):
+        """
+        async variant of `_request_session`, use with `async with`
+
+        if the session manager is a `SyncSessionAdapter`, the user session is loaded & committed
+        by awaiting the async manager it wraps
+        """
+        _manager = self.config.session_manager
+
+        if self.config.session_unit_of_work and isinstance(_manager, SyncSessionAdapter):
+            return SessionUnitOfWork(TracedSessionManager.wrap(_manager), session_id, async_manager=_manager.manager)
+
+        return self._request_session(session_id)
 
     def verify_webhook(self, mode, challenge, token):
         return self.whatsapp.util.webhook_challenge(mode, challenge, token)
@@ -36,23 +70,29 @@ class Engine:
             self._user_session(recipient_id).evict(session_id=recipient_id, key=SessionConstants.EXTERNAL_CHAT_HANDLER)
             logger.warning("External handler session terminated for: %s", recipient_id)
 
+    def _ext_handler_service(self, response: ExternalHandlerResponse) -> Optional[WhatsAppServiceModel]:
+        has_ext_handler_session = self._user_session(response.recipient_id).get(session_id=response.recipient_id,
+                                                                                key=SessionConstants.EXTERNAL_CHAT_HANDLER)
+        if has_ext_handler_session is None:
+            return None
+
+        return WhatsAppServiceModel(
+            template=response.template,
+            config=self.config,
+            hook_arg=HookArg(
+                user=client.WaUser(wa_id=response.recipient_id),
+                session_id=response.recipient_id,
+                session_manager=self._user_session(response.recipient_id)
+            ),
+        )
+
     def ext_handler_respond(self, response: ExternalHandlerResponse):
         """
             helper method for external handler to send back response to user
         """
-        has_ext_handler_session = self._user_session(response.recipient_id).get(session_id=response.recipient_id,
-                                                                                key=SessionConstants.EXTERNAL_CHAT_HANDLER)
-        if has_ext_handler_session is not None:
-            service_model = WhatsAppServiceModel(
-                template=response.template,
-                config=self.config,
-                hook_arg=HookArg(
-                    user=client.WaUser(wa_id=response.recipient_id),
-                    session_id=response.recipient_id,
-                    session_manager=self._user_session(response.recipient_id)
-                ),
-            )
+        service_model = self._ext_handler_service(response)
 
+        if service_model is not None:
             whatsapp_service = WhatsAppService(model=service_model)
             response = whatsapp_service.send_message(handle_session=False, template=False)
 
@@ -64,16 +104,25 @@ class Engine:
 
         raise ExtHandlerHookError(message="No active ExternalHandler session for user!")
 
-    def process_webhook(self, webhook_data: Dict[str, Any]):
-        if not self.whatsapp.util.is_valid_webhook_message(webhook_data):
-            _msg = webhook_data if self.config.log_invalid_webhooks is True else "skipping.."
-            logger.warning("Invalid webhook message: %s", _msg)
-            return
+    async def ext_handler_respond_async(self, response: ExternalHandlerResponse):
+        """
+            async variant of `ext_handler_respond`
+        """
+        service_model = self._ext_handler_service(response)
+
+        if service_model is not None:
+            whatsapp_service = AsyncWhatsAppService(model=service_model)
+            response = await whatsapp_service.send_message(handle_session=False, template=False)
+
+            response_msg_id = self.whatsapp.util.get_response_message_id(response)
+
+            logger.debug("ExtHandler message responded with id: %s", response_msg_id)
+
+            return response_msg_id
 
-        wa_user = self.whatsapp.util.get_wa_user(webhook_data)
-        user_session: ISessionManager = self._user_session(wa_user.wa_id)
-        response_model = self.whatsapp.util.get_response_structure(webhook_data)
+        raise ExtHandlerHookError(message="No active ExternalHandler session for user!")
 
+    def _prepare_user_session(self, wa_user: client.WaUser, user_session: ISessionManager) -> None:
         #  ========= put session defaults ============
         if user_session.get(wa_user.wa_id, SessionConstants.DEFAULT_NAME) is None:
             user_session.save(wa_user.wa_id, SessionConstants.DEFAULT_NAME, wa_user.name)
@@ -82,6 +131,32 @@ class Engine:
             user_session.save(wa_user.wa_id, SessionConstants.DEFAULT_MOBILE, wa_user.wa_id)
         # ============= end ====================
 
+    def _ext_handler_hook_arg(self, wa_user: client.WaUser, user_session: ISessionManager,
+                              response_model: client.ResponseStructure) -> HookArg:
+        _arg = HookArg(
+            session_id=wa_user.wa_id,
+            session_manager=user_session,
+            user=wa_user,
+            user_input=response_model,
+            additional_data={}
+        )
+
+        HookUtil.run_listener(
+            listener=self.config.on_hook_arg,
+            arg=_arg
+        )
+
+        return _arg
+
+    def _process_message(self, wa_user: client.WaUser, response_model: client.ResponseStructure,
+                         envelope: Optional[client.WebhookEnvelope] = None) -> bool:
+        with self._request_session(wa_user.wa_id) as user_session:
+            return self._handle_message(wa_user, response_model, user_session, envelope)
+
+    def _handle_message(self, wa_user: client.WaUser, response_model: client.ResponseStructure,
+                        user_session: ISessionManager, envelope: Optional[client.WebhookEnvelope] = None) -> bool:
+        self._prepare_user_session(wa_user, user_session)
+
         # check if user has running external handler
         has_ext_session = user_session.get(session_id=wa_user.wa_id, key=SessionConstants.EXTERNAL_CHAT_HANDLER)
 
@@ -90,35 +165,220 @@ class Engine:
                 WorkerJob(
                     engine_config=self.config,
                     payload=response_model,
-                    user=wa_user
+                    user=wa_user,
+                    envelope=envelope,
+                    session=user_session,
+                    storage=self.config.storage_manager.snapshot()
                 )
             )
-            worker.work()
+            return worker.work()
 
         else:
             if self.config.ext_handler_hook is not None:
                 try:
-                    _arg = HookArg(
-                        session_id=wa_user.wa_id,
-                        session_manager=user_session,
-                        user=wa_user,
-                        user_input=response_model,
-                        additional_data={}
+                    HookUtil.process_hook(
+                        hook=self.config.ext_handler_hook,
+                        arg=self._ext_handler_hook_arg(wa_user, user_session, response_model)
                     )
+                    return True
+                except InternalHookError as e:
+                    logger.error("Error processing external handler hook")
+                    raise ExtHandlerHookError(message=e.message)
 
-                    HookUtil.run_listener(
-                        listener=self.config.on_hook_arg,
-                        arg=_arg
-                    )
+            else:
+                logger.warning("No external handler hook provided, skipping..")
+                return False
 
-                    HookUtil.process_hook(
+    async def _process_message_async(self, wa_user: client.WaUser, response_model: client.ResponseStructure,
+                                     envelope: Optional[client.WebhookEnvelope] = None) -> bool:
+        async with self._request_session_async(wa_user.wa_id) as user_session:
+            return await self._handle_message_async(wa_user, response_model, user_session, envelope)
+
+    async def _handle_message_async(self, wa_user: client.WaUser, response_model: client.ResponseStructure,
+                                    user_session: ISessionManager, envelope: Optional[client.WebhookEnvelope] = None) -> bool:
+        self._prepare_user_session(wa_user, user_session)
+
+        has_ext_session = user_session.get(session_id=wa_user.wa_id, key=SessionConstants.EXTERNAL_CHAT_HANDLER)
+
+        if has_ext_session is None:
+            worker = AsyncWorker(
+                WorkerJob(
+                    engine_config=self.config,
+                    payload=response_model,
+                    user=wa_user,
+                    envelope=envelope,
+                    session=user_session,
+                    storage=self.config.storage_manager.snapshot()
+                )
+            )
+            return await worker.work()
+
+        else:
+            if self.config.ext_handler_hook is not None:
+                try:
+                    await HookUtil.process_hook_async(
                         hook=self.config.ext_handler_hook,
-                        arg=_arg
+                        arg=self._ext_handler_hook_arg(wa_user, user_session, response_model)
                     )
-                    return
+                    return True
                 except InternalHookError as e:
                     logger.error("Error processing external handler hook")
                     raise ExtHandlerHookError(message=e.message)
 
             else:
                 logger.warning("No external handler hook provided, skipping..")
+                return False
+
+    def _log_invalid_webhook(self, webhook_data: Dict[str, Any]) -> None:
+        _msg = webhook_data if self.config.log_invalid_webhooks is True else "skipping.."
+        logger.warning("Invalid webhook message: %s", _msg)
+
+    def _is_processable(self, envelope: client.WebhookEnvelope) -> bool:
+        if not envelope.is_message:
+            self._log_invalid_webhook(envelope.data)
+            return False
+
+        return True
+
+    def _tap(self, envelope: client.WebhookEnvelope) -> None:
+        if self.config.webhook_tap is None:
+            return
+
+        try:
+            self.config.webhook_tap(envelope)
+        except Exception as e:
+            logger.error("Webhook tap failed: %s", e)
+
+    def _offer_status(self, envelope: client.WebhookEnvelope) -> bool:
+        """
+        hand status-only webhooks to the configured status pipeline
+
+        :return: True if consumed by the pipeline
+        """
+        if self.config.status_pipeline is None:
+            return False
+
+        return self.config.status_pipeline.offer(envelope)
+
+    def _receive(self, webhook_data: WebhookPayload) -> Optional[client.WebhookEnvelope]:
+        """
+        parse a webhook once and share the envelope with the tap & the status pipeline
+
+        :return: the envelope, None if consumed by the status pipeline
+        """
+        with tracing.span("webhook.parse"):
+            envelope = client.WebhookEnvelope.of(webhook_data)
+
+        self._tap(envelope)
+
+        return None if self._offer_status(envelope) else envelope
+
+    def process_webhook(self, webhook_data: WebhookPayload):
+        """
+        Process a webhook request
+
+        :param webhook_data: raw webhook body, parsed webhook dict or a client.WebhookEnvelope
+        """
+        with tracing.span("engine.webhook"):
+            envelope = self._receive(webhook_data)
+
+            if envelope is None or not self._is_processable(envelope):
+                return
+
+            self._process_message(envelope.user, envelope.message, envelope)
+
+    async def process_webhook_async(self, webhook_data: WebhookPayload):
+        """
+        asyncio variant of `process_webhook`
+
+        Hooks are awaited (sync hooks are offloaded to a thread) and replies are sent over
+        the async WhatsApp client, so a single event loop can drive many conversations concurrently.
+        """
+        with tracing.span("engine.webhook"):
+            envelope = self._receive(webhook_data)
+
+            if envelope is None or not self._is_processable(envelope):
+                return
+
+            await self._process_message_async(envelope.user, envelope.message, envelope)
+
+    def _split(self, envelope: client.WebhookEnvelope) -> List[client.WebhookEnvelope]:
+        """
+        one envelope per message of a batched webhook, grouped per user in timestamp order
+        """
+        messages = [message for message in envelope.split() if message.is_message]
+
+        if not messages:
+            self._log_invalid_webhook(envelope.data)
+
+        return messages
+
+    def process_webhook_batch(self, webhook_data: WebhookPayload) -> int:
+        """
+        Process every message in a webhook payload.
+
+        Batched deliveries can carry several messages, changes or entries. Messages are
+        processed grouped per user, in timestamp order.
+
+        A failing message is logged and does not stop the rest of the batch.
+
+        :return: number of messages processed, messages skipped as duplicate, stale or debounced,
+                    failing ones & invalid ones are not counted
+        """
+        envelope = self._receive(webhook_data)
+
+        if envelope is None:
+            return 0
+
+        messages = self._split(envelope)
+
+        if not messages:
+            return 0
+
+        processed = 0
+
+        for message in messages:
+            try:
+                processed += self._process_message(message.user, message.message, message)
+            except Exception as e:
+                logger.error("Failed to process batched message: %s, error: %s", message.raw_message.get("id"), e,
+                             exc_info=True)
+
+        return processed
+
+    async def process_webhook_batch_async(self, webhook_data: WebhookPayload) -> int:
+        """
+        asyncio variant of `process_webhook_batch`
+
+        Messages of one user are processed in order, different users are processed concurrently.
+
+        :return: number of messages processed
+        """
+        envelope = self._receive(webhook_data)
+
+        if envelope is None:
+            return 0
+
+        messages = self._split(envelope)
+
+        if not messages:
+            return 0
+
+        per_user: Dict[str, List[client.WebhookEnvelope]] = {}
+        for message in messages:
+            per_user.setdefault(message.wa_id, []).append(message)
+
+        async def _run_user(user_messages: List[client.WebhookEnvelope]) -> int:
+            processed = 0
+
+            for message in user_messages:
+                try:
+                    processed += await self._process_message_async(message.user, message.message, message)
+                except Exception as e:
+                    logger.error("Failed to process batched message: %s, error: %s", message.raw_message.get("id"), e,
+                                 exc_info=True)
+
+            return processed
+
+        results = await asyncio.gather(*[_run_user(m) for m in per_user.values()])
+        return sum(results)
@@ -3,7 +3,9 @@ from typing import Dict, Any, List, Optional, Callable
 
 from pydantic import BaseModel
 
-from pywce.modules import client, storage, ISessionManager, DefaultSessionManager
+from pywce.modules import client, storage, ISessionManager, DefaultSessionManager, IMessageDedupe
+from pywce.modules.storage import IStorageManager
+from pywce.src.models.engine_state import EngineState
 from pywce.src.templates import EngineTemplate
 
 
@@ -16,6 +18,8 @@ class EngineConfig:
         :var session_manager: Implementation of ISessionManager
         :var handle_session_queue: if enabled, engine will internally track history of
                                      received messages to avoid duplicate message processing
+        :var message_dedupe: duplicate detection used with `handle_session_queue`, defaults to the last
+                               `EngineConstants.MESSAGE_QUEUE_COUNT` message ids kept in the user session
         :var handle_session_inactivity: if enabled, engine will track user inactivity and
                                           reroutes user back to `start_template_stage` if inactive
         :var debounce_timeout_ms: reasonable time difference to process new message
@@ -24,6 +28,15 @@ class EngineConfig:
         :var read_receipts: If enabled, engine will mark every message received as read.
         :var ext_handler_hook: path to external chat handler hook. If message is received and ext_handler is active,
                                 call this hook to handle requests
+        :var status_pipeline: if set, status-only webhooks (sent, delivered, read..) are handed to it
+                                and skip engine processing
+        :var webhook_tap: called with the parsed `client.WebhookEnvelope` of every webhook received by
+                            `Engine.process_webhook*`, before status handling & processing,
+                            e.g. to record traffic for replay
+        :var session_unit_of_work: if enabled, the user session is loaded once per message and all writes
+                                     are flushed in one batch after processing, discarded if processing raises.
+                                     Opt-in: a hook writing through `config.session_manager` directly instead of
+                                     `arg.session_manager` is overwritten by the batch flush
     """
     whatsapp: client.WhatsApp
     start_template_stage: str
@@ -32,6 +45,7 @@ class EngineConfig:
     ext_handler_hook: Optional[str] = None
     ext_hook_processor: Optional[Callable] = None
     handle_session_queue: bool = True
+    message_dedupe: Optional[IMessageDedupe] = None
     handle_session_inactivity: bool = True
     tag_on_reply: bool = False
     read_receipts: bool = False
@@ -44,13 +58,38 @@ class EngineConfig:
     external_renderer: Optional[Callable] = None
     global_pre_hooks: list[Callable] = field(default_factory=list)
     global_post_hooks: list[Callable] = field(default_factory=list)
+    status_pipeline: Optional[client.StatusPipeline] = None
+    webhook_tap: Optional[Callable] = None
+    session_unit_of_work: bool = False
 
 
 @dataclass
 class WorkerJob:
+    """
+        a single message job processed by the engine worker
+
+        if created from a webhook envelope, the payload & user are taken from it
+
+        if session is set, the worker & message processor use it as the user session
+        instead of opening their own from the configured session manager
+
+        if storage is set, templates are read from it instead of the configured storage manager,
+        e.g. a `snapshot()` so a reload mid-message is not seen
+    """
     engine_config: EngineConfig
-    payload: client.ResponseStructure
-    user: client.WaUser
+    payload: Optional[client.ResponseStructure] = None
+    user: Optional[client.WaUser] = None
+    envelope: Optional[client.WebhookEnvelope] = None
+    session: Optional[ISessionManager] = None
+    storage: Optional[IStorageManager] = None
+
+    def __post_init__(self):
+        if self.envelope is not None:
+            if self.payload is None:
+                self.payload = self.envelope.message
+
+            if self.user is None:
+                self.user = self.envelope.user
 
 
 class TemplateDynamicBody(BaseModel):
@@ -117,10 +156,15 @@ class HookArg(BaseModel):
 
 @dataclass
 class WhatsAppServiceModel:
+    """
+        if state is set, the stage change of a sent message is recorded on it for the caller to save,
+        else the engine state is loaded & saved through the hook arg session manager
+    """
     config: EngineConfig
     template: EngineTemplate
     hook_arg: HookArg
     next_stage: Optional[str] = None
+    state: Optional[EngineState] = None
 
 
 @dataclass
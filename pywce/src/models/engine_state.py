@@ -0,0 +1,96 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from pywce.modules import ISessionManager
+from pywce.modules.session.dedupe import MessageHistory
+from pywce.src.constants import SessionConstants, EngineConstants
+
+
+class EngineState:
+    """
+        the engine's own per-user bookkeeping, stored as one record under `SessionConstants.ENGINE_STATE`
+
+        Timestamps are epoch numbers. Keys set by hooks (auth, dynamic retry, external handler)
+        and user data stay regular session entries.
+
+        Sessions written before the record existed are read from the separate keys
+        until the first save.
+    """
+    __slots__ = ("current_stage", "prev_stage", "checkpoint", "debounce_ms", "last_activity_s", "msg_id", "history")
+
+    def __init__(self, current_stage: Optional[str] = None, prev_stage: Optional[str] = None,
+                 checkpoint: Optional[str] = None, debounce_ms: Optional[int] = None,
+                 last_activity_s: Optional[float] = None, msg_id: Optional[str] = None,
+                 history: Optional[MessageHistory] = None):
+        self.current_stage = current_stage
+        self.prev_stage = prev_stage
+        self.checkpoint = checkpoint
+        self.debounce_ms = debounce_ms
+        self.last_activity_s = last_activity_s
+        self.msg_id = msg_id
+        self.history = history
+
+    def __reduce__(self):
+        # positional args pickle smaller & load faster than the default slot state dict
+        return EngineState, (self.current_stage, self.prev_stage, self.checkpoint, self.debounce_ms,
+                             self.last_activity_s, self.msg_id, self.history)
+
+    def __repr__(self):
+        return f"EngineState(stage={self.current_stage}, prev={self.prev_stage}, checkpoint={self.checkpoint})"
+
+    @staticmethod
+    def load(session: ISessionManager, session_id: str) -> "EngineState":
+        state = session.get(session_id=session_id, key=SessionConstants.ENGINE_STATE)
+
+        if isinstance(state, EngineState):
+            return state.copy()
+
+        # every session written before the record has a current stage, a new user is not read in full
+        if session.get(session_id=session_id, key=SessionConstants.CURRENT_STAGE) is None:
+            return EngineState()
+
+        return EngineState.from_legacy(session.fetch_all(session_id, False) or {})
+
+    @staticmethod
+    def from_legacy(data: Dict[str, Any]) -> "EngineState":
+        last_activity = data.get(SessionConstants.LAST_ACTIVITY_AT)
+        history = data.get(SessionConstants.MESSAGE_HISTORY)
+
+        if isinstance(last_activity, str):
+            last_activity = datetime.fromisoformat(last_activity).timestamp()
+
+        if history is not None and not isinstance(history, MessageHistory):
+            history = MessageHistory(EngineConstants.MESSAGE_QUEUE_COUNT, history)
+
+        return EngineState(
+            current_stage=data.get(SessionConstants.CURRENT_STAGE),
+            prev_stage=data.get(SessionConstants.PREV_STAGE),
+            checkpoint=data.get(SessionConstants.LATEST_CHECKPOINT),
+            debounce_ms=data.get(SessionConstants.CURRENT_DEBOUNCE),
+            last_activity_s=last_activity,
+            msg_id=data.get(SessionConstants.CURRENT_MSG_ID),
+            history=history
+        )
+
+    def copy(self) -> "EngineState":
+        """
+        a copy to mutate, so a rolled back unit of work leaves the stored record untouched
+
+        The message history is shared, it only records seen ids.
+        """
+        return EngineState(self.current_stage, self.prev_stage, self.checkpoint, self.debounce_ms,
+                           self.last_activity_s, self.msg_id, self.history)
+
+    def save(self, session: ISessionManager, session_id: str) -> None:
+        session.save(session_id=session_id, key=SessionConstants.ENGINE_STATE, data=self)
+
+    def remember(self, msg_id: str) -> bool:
+        """
+        add `msg_id` to the message history
+
+        :return: False if already in history, i.e. a duplicate
+        """
+        if self.history is None:
+            self.history = MessageHistory(EngineConstants.MESSAGE_QUEUE_COUNT)
+
+        return self.history.add(msg_id)
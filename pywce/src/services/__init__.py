@@ -1,6 +1,10 @@
 from pywce.src.services.hook_service import HookService, hook
-from pywce.src.services.message_processor import MessageProcessor
-from pywce.src.services.whatsapp_service import WhatsAppService
-from pywce.src.services.worker import Worker
+from pywce.src.services.message_processor import MessageProcessor, AsyncMessageProcessor
+from pywce.src.services.whatsapp_service import WhatsAppService, AsyncWhatsAppService
+from pywce.src.services.worker import Worker, AsyncWorker
 from pywce.src.services.visual_builder_translator import VisualTranslator
-from pywce.src.services.template_message_processor import TemplateMessageProcessor
+from pywce.src.services.template_message_processor import TemplateMessageProcessor, AsyncTemplateMessageProcessor
+from pywce.src.services.dispatcher import EngineDispatcher, AsyncEngineDispatcher, DispatcherStats
+from pywce.src.services.process_runner import EngineProcessRunner, ConsistentHashRing
+from pywce.src.services.admission import AdmissionController, AdmissionStats, ShedPolicy
+from pywce.src.services.traffic import TrafficRecorder, TrafficReplayer, ReplayResult
@@ -0,0 +1,388 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, Any, Deque, List, Optional, Set, Union
+
+from pywce.modules import client
+from pywce.src.models import HookArg, WhatsAppServiceModel
+from pywce.src.services.whatsapp_service import WhatsAppService
+
+_logger = logging.getLogger(__name__)
+
+
+class ShedPolicy(str, Enum):
+    """
+        what to do when a webhook arrives and the queue or the user cap is full
+
+        REJECT: shed the new webhook
+        DROP_STALE: first purge pending webhooks older than the stale threshold, shed the new one if still full
+        DROP_OLDEST: drop the oldest pending webhook of the same user to make room for the new one
+    """
+    REJECT = "reject"
+    DROP_STALE = "drop_stale"
+    DROP_OLDEST = "drop_oldest"
+
+
+@dataclass
+class AdmissionStats:
+    """
+        snapshot of admission controller counters
+
+        :var pending: webhooks waiting in the queue
+        :var admitted: webhooks accepted into the queue
+        :var shed: webhooks refused or dropped by the shedding policy
+        :var expired: queued webhooks discarded because they became stale before processing
+        :var processed: webhooks the engine finished processing
+        :var failed: webhooks that raised while being processed
+    """
+    pending: int = 0
+    admitted: int = 0
+    shed: int = 0
+    expired: int = 0
+    processed: int = 0
+    failed: int = 0
+
+
+class AdmissionController:
+    """
+        Bounded ingestion queue with load shedding in front of the engine.
+
+        Webhooks are queued per user and processed by a fixed pool of worker threads,
+        one message per user at a time, in arrival order. The queue is bounded globally
+        (`max_queue_size`) and per user (`max_per_user`), when full the `policy` decides
+        what is shed. Queued webhooks that become older than the stale threshold are
+        discarded instead of processed.
+
+        Shed users can get a busy reply, sent from a separate thread without changing the
+        user's stage: either a `busy_template` rendered & sent through the engine's template
+        path as a static message (template hooks are not run), or a plain text `busy_message`.
+
+        Example:
+            controller = AdmissionController(engine, workers=8, busy_message="We are busy, please try again shortly")
+            controller.start()
+
+            # in webhook route
+            controller.submit(payload)
+    """
+
+    def __init__(self,
+                 engine,
+                 workers: int = 4,
+                 max_queue_size: int = 1000,
+                 max_per_user: int = 10,
+                 policy: ShedPolicy = ShedPolicy.DROP_STALE,
+                 stale_after_s: Optional[float] = None,
+                 busy_message: Optional[str] = None,
+                 busy_template: Optional[str] = None,
+                 busy_reply_interval_s: float = 30.0
+                 ):
+        """
+        :param engine: the Engine to admit webhooks to
+        :param workers: number of worker threads
+        :param max_queue_size: max pending webhooks across all users
+        :param max_per_user: max pending webhooks per user
+        :param policy: shedding policy applied when a limit is reached
+        :param stale_after_s: age in seconds after which a webhook is stale,
+                                defaults to engine `webhook_timestamp_threshold_s`
+        :param busy_message: text reply sent to users whose message was shed
+        :param busy_template: name of the template sent to users whose message was shed, takes
+                                precedence over `busy_message`, no reply if neither is set
+        :param busy_reply_interval_s: min seconds between busy replies to the same user
+        """
+        assert workers > 0, "Admission controller needs at least 1 worker"
+        assert max_per_user > 0, "max_per_user must be at least 1"
+        assert busy_template is None or engine.config.storage_manager.exists(busy_template), \
+            f"Busy template not found: {busy_template}"
+
+        self.engine = engine
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self.max_per_user = max_per_user
+        self.policy = ShedPolicy(policy)
+        self.stale_after_s = engine.config.webhook_timestamp_threshold_s if stale_after_s is None else stale_after_s
+        self.busy_message = busy_message
+        self.busy_template = busy_template
+        self.busy_reply_interval_s = busy_reply_interval_s
+
+        self._cond = threading.Condition()
+        self._pending: Dict[str, Deque[client.WebhookEnvelope]] = {}
+        # users waiting for a worker, a user is either here or running, never both
+        self._ready: Deque[str] = deque()
+        self._scheduled: Set[str] = set()
+        self._size = 0
+        self._running = 0
+        self._closed = False
+        self._threads: List[threading.Thread] = []
+
+        self._admitted = 0
+        self._shed = 0
+        self._expired = 0
+        self._processed = 0
+        self._failed = 0
+
+        self._replies: queue.Queue = queue.Queue(maxsize=100)
+        self._last_reply: Dict[str, float] = {}
+
+    def _is_stale(self, envelope: client.WebhookEnvelope, now: float) -> bool:
+        message = envelope.raw_message
+
+        if not message or message.get("timestamp") is None:
+            return False
+
+        return abs(now - float(message["timestamp"])) > self.stale_after_s
+
+    def _purge_stale(self) -> int:
+        now = time.time()
+        purged = 0
+
+        for user_queue in self._pending.values():
+            fresh = [e for e in user_queue if not self._is_stale(e, now)]
+            purged += len(user_queue) - len(fresh)
+
+            if len(fresh) != len(user_queue):
+                user_queue.clear()
+                user_queue.extend(fresh)
+
+        self._size -= purged
+        self._expired += purged
+        return purged
+
+    def _has_room(self, key: str) -> bool:
+        user_queue = self._pending.get(key)
+        return self._size < self.max_queue_size and (user_queue is None or len(user_queue) < self.max_per_user)
+
+    def _make_room(self, key: str) -> bool:
+        if self.policy == ShedPolicy.DROP_STALE:
+            self._purge_stale()
+            return self._has_room(key)
+
+        if self.policy == ShedPolicy.DROP_OLDEST:
+            user_queue = self._pending.get(key)
+
+            if user_queue:
+                dropped = user_queue.popleft()
+                self._size -= 1
+                self._shed += 1
+                self._cond.notify_all()
+                _logger.warning("Admission queue full, dropped oldest message: %s", dropped.wa_id)
+                return True
+
+        return False
+
+    def _busy(self, envelope: client.WebhookEnvelope) -> None:
+        if (self.busy_message is None and self.busy_template is None) or envelope.wa_id is None:
+            return
+
+        now = time.monotonic()
+        last = self._last_reply.get(envelope.wa_id)
+
+        if last is not None and now - last < self.busy_reply_interval_s:
+            return
+
+        if len(self._last_reply) > 10_000:
+            self._last_reply.clear()
+
+        self._last_reply[envelope.wa_id] = now
+
+        try:
+            self._replies.put_nowait(envelope.wa_id)
+        except queue.Full:
+            pass
+
+    def submit(self, webhook_data: Union[Dict[str, Any], bytes, client.WebhookEnvelope]) -> bool:
+        """
+        admit a webhook for processing, never blocks
+
+        A batched webhook is split into one message per sender, each admitted against its own user's cap.
+
+        :param webhook_data: raw webhook body, parsed dict or envelope
+        :return: True if admitted, False if any message was shed
+        """
+        admitted = True
+
+        for envelope in client.WebhookEnvelope.of(webhook_data).split():
+            admitted = self._admit(envelope) and admitted
+
+        return admitted
+
+    def _admit(self, envelope: client.WebhookEnvelope) -> bool:
+        key = envelope.wa_id or ""
+
+        with self._cond:
+            if self._closed:
+                return False
+
+            if not self._has_room(key) and not self._make_room(key):
+                self._shed += 1
+                self._busy(envelope)
+                _logger.warning("Admission queue full, message shed: %s", envelope.wa_id)
+                return False
+
+            self._pending.setdefault(key, deque()).append(envelope)
+            self._size += 1
+            self._admitted += 1
+
+            if key not in self._scheduled:
+                self._scheduled.add(key)
+                self._ready.append(key)
+                self._cond.notify()
+
+            return True
+
+    def _next(self) -> Optional[tuple]:
+        with self._cond:
+            while True:
+                while not self._ready and not self._closed:
+                    self._cond.wait()
+
+                if not self._ready:
+                    return None
+
+                key = self._ready.popleft()
+                user_queue = self._pending.get(key)
+
+                if not user_queue:
+                    # emptied by the shedding policy while waiting
+                    self._pending.pop(key, None)
+                    self._scheduled.discard(key)
+                    self._cond.notify_all()
+                    continue
+
+                self._size -= 1
+                self._running += 1
+                return key, user_queue.popleft()
+
+    def _done(self, key: str) -> None:
+        with self._cond:
+            self._running -= 1
+
+            if self._pending.get(key):
+                self._ready.append(key)
+                self._cond.notify()
+            else:
+                self._pending.pop(key, None)
+                self._scheduled.discard(key)
+                self._cond.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            job = self._next()
+
+            if job is None:
+                return
+
+            key, envelope = job
+
+            try:
+                if self._is_stale(envelope, time.time()):
+                    with self._cond:
+                        self._expired += 1
+                    _logger.warning("Discarding stale queued message: %s", envelope.wa_id)
+                    continue
+
+                self.engine.process_webhook(envelope)
+
+                with self._cond:
+                    self._processed += 1
+
+            except Exception as e:
+                with self._cond:
+                    self._failed += 1
+                _logger.error("Admission worker failed to process webhook: %s", e, exc_info=True)
+
+            finally:
+                self._done(key)
+
+    def _send_busy(self, recipient_id: str) -> None:
+        if self.busy_template is None:
+            self.engine.whatsapp.send_message(recipient_id=recipient_id, message=self.busy_message)
+            return
+
+        config = self.engine.config
+
+        WhatsAppService(model=WhatsAppServiceModel(
+            template=config.storage_manager.get(self.busy_template),
+            config=config,
+            hook_arg=HookArg(
+                user=client.WaUser(wa_id=recipient_id),
+                session_id=recipient_id,
+                session_manager=config.session_manager.session(session_id=recipient_id)
+            )
+        )).send_message(handle_session=False, template=False)
+
+    def _run_replies(self) -> None:
+        while True:
+            recipient_id = self._replies.get()
+
+            if recipient_id is None:
+                return
+
+            try:
+                self._send_busy(recipient_id)
+            except Exception as e:
+                _logger.error("Failed to send busy reply to %s: %s", recipient_id, e)
+
+    def start(self) -> None:
+        if self._threads:
+            return
+
+        with self._cond:
+            self._closed = False
+
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"pywce-admission-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+        t = threading.Thread(target=self._run_replies, name="pywce-admission-busy", daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def join(self) -> None:
+        """
+        block until all admitted webhooks are processed, expired or shed
+        """
+        with self._cond:
+            while self._size or self._running:
+                self._cond.wait()
+
+    def stop(self, drain: bool = True) -> None:
+        """
+        stop all worker threads, pending webhooks are dropped if not drained
+
+        :param drain: process already admitted webhooks before stopping
+        """
+        if drain:
+            self.join()
+
+        with self._cond:
+            self._closed = True
+            self._ready.clear()
+            self._cond.notify_all()
+
+        self._replies.put(None)
+
+        for t in self._threads:
+            t.join()
+
+        with self._cond:
+            self._pending.clear()
+            self._scheduled.clear()
+            self._size = 0
+
+        self._threads = []
+
+    def stats(self) -> AdmissionStats:
+        with self._cond:
+            return AdmissionStats(
+                pending=self._size,
+                admitted=self._admitted,
+                shed=self._shed,
+                expired=self._expired,
+                processed=self._processed,
+                failed=self._failed
+            )
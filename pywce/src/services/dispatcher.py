@@ -0,0 +1,341 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+import queue
+import threading
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Union
+
+from pywce.modules import client
+
+_logger = logging.getLogger(__name__)
+
+# signals a shard worker to exit
+_STOP = object()
+
+
+def webhook_shard_key(webhook_data: Union[Dict[str, Any], bytes, client.WebhookEnvelope]) -> str:
+    """
+    key used to route a webhook to a shard / process, the wa_id of the message sender.
+
+    Non-message webhooks (e.g. statuses) share a single empty key
+    """
+    return client.WebhookEnvelope.of(webhook_data).wa_id or ""
+
+
+@dataclass
+class DispatcherStats:
+    """
+        snapshot of dispatcher counters
+
+        :var queue_depths: pending jobs per shard
+        :var submitted: jobs accepted into a shard queue
+        :var processed: jobs the engine finished processing
+        :var rejected: jobs refused because the shard queue was full
+        :var failed: jobs that raised while being processed
+    """
+    queue_depths: List[int] = field(default_factory=list)
+    submitted: int = 0
+    processed: int = 0
+    rejected: int = 0
+    failed: int = 0
+
+    @property
+    def pending(self) -> int:
+        return sum(self.queue_depths)
+
+
+class _BaseDispatcher(ABC):
+    def __init__(self, engine, workers: int = 4, max_queue_size: int = 1000):
+        """
+        :param engine: the Engine to dispatch webhooks to
+        :param workers: number of shards, each shard is processed by a single worker
+        :param max_queue_size: max pending jobs per shard
+        """
+        assert workers > 0, "Dispatcher needs at least 1 worker"
+
+        self.engine = engine
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._processed = 0
+        self._rejected = 0
+        self._failed = 0
+
+    def shard_key(self, webhook_data: Union[Dict[str, Any], bytes, client.WebhookEnvelope]) -> str:
+        return webhook_shard_key(webhook_data)
+
+    def shard_for(self, key: str) -> int:
+        # stable across processes unlike the builtin hash()
+        return zlib.crc32(key.encode("utf-8")) % self.workers
+
+    def _on_done(self, failed: bool) -> None:
+        with self._lock:
+            if failed:
+                self._failed += 1
+            else:
+                self._processed += 1
+
+    def _on_submit(self, accepted: bool) -> None:
+        with self._lock:
+            if accepted:
+                self._submitted += 1
+            else:
+                self._rejected += 1
+
+    def _discard(self) -> None:
+        """
+        drop queued jobs, used on stop without drain so the stop marker is not queued behind them
+        """
+        discarded = 0
+
+        for q in self._queues:
+            while True:
+                try:
+                    q.get_nowait()
+                except (queue.Empty, asyncio.QueueEmpty):
+                    break
+
+                q.task_done()
+                discarded += 1
+
+        if discarded:
+            _logger.warning("Dispatcher stopped, %s queued webhooks discarded", discarded)
+
+    @abstractmethod
+    def _queue_depths(self) -> List[int]:
+        pass
+
+    def stats(self) -> DispatcherStats:
+        with self._lock:
+            return DispatcherStats(
+                queue_depths=self._queue_depths(),
+                submitted=self._submitted,
+                processed=self._processed,
+                rejected=self._rejected,
+                failed=self._failed
+            )
+
+
+class EngineDispatcher(_BaseDispatcher):
+    """
+        Thread based webhook dispatcher.
+
+        Shards incoming webhooks by sender wa_id onto a pool of worker threads.
+
+        Messages from the same user are always processed by the same thread, in
+        arrival order, while different users are processed in parallel.
+
+        Example:
+            dispatcher = EngineDispatcher(engine, workers=8)
+            dispatcher.start()
+
+            # in webhook route
+            dispatcher.submit(payload)
+    """
+
+    def __init__(self, engine, workers: int = 4, max_queue_size: int = 1000):
+        super().__init__(engine, workers, max_queue_size)
+        self._queues: List[queue.Queue] = [queue.Queue(maxsize=max_queue_size) for _ in range(workers)]
+        self._threads: List[threading.Thread] = []
+
+    def _queue_depths(self) -> List[int]:
+        return [q.qsize() for q in self._queues]
+
+    def _run(self, shard: int) -> None:
+        q = self._queues[shard]
+
+        while True:
+            job = q.get()
+
+            try:
+                if job is _STOP:
+                    return
+
+                self.engine.process_webhook(job)
+                self._on_done(failed=False)
+
+            except Exception as e:
+                self._on_done(failed=True)
+                _logger.error("Dispatcher shard %s failed to process webhook: %s", shard, e, exc_info=True)
+
+            finally:
+                q.task_done()
+
+    def start(self) -> None:
+        if self._threads:
+            return
+
+        for shard in range(self.workers):
+            t = threading.Thread(target=self._run, args=(shard,), name=f"pywce-dispatcher-{shard}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, webhook_data: Dict[str, Any], block: bool = False, timeout: Optional[float] = None) -> bool:
+        """
+        queue a webhook for processing
+
+        A batched webhook is split into one job per message, each routed by its own sender.
+
+        :param webhook_data: raw webhook body, parsed dict or envelope, it is parsed once before queueing
+        :param block: wait for space if the shard queue is full
+        :param timeout: max seconds to wait when blocking
+        :return: True if accepted, False if a shard queue is full
+        """
+        accepted = True
+
+        for envelope in client.WebhookEnvelope.of(webhook_data).split():
+            shard = self.shard_for(self.shard_key(envelope))
+
+            try:
+                self._queues[shard].put(envelope, block=block, timeout=timeout)
+                self._on_submit(accepted=True)
+            except queue.Full:
+                self._on_submit(accepted=False)
+                _logger.warning("Dispatcher shard %s is full, webhook rejected", shard)
+                accepted = False
+
+        return accepted
+
+    def join(self) -> None:
+        """
+        block until all queued webhooks are processed, returns at once if not started
+        """
+        if not self._threads:
+            return
+
+        for q in self._queues:
+            q.join()
+
+    def stop(self, drain: bool = True) -> None:
+        """
+        stop all worker threads, does nothing if not started
+
+        :param drain: process already queued webhooks before stopping, else they are discarded
+        """
+        if not self._threads:
+            return
+
+        if drain:
+            self.join()
+        else:
+            self._discard()
+
+        for q in self._queues:
+            q.put(_STOP)
+
+        for t in self._threads:
+            t.join()
+
+        self._threads = []
+
+
+class AsyncEngineDispatcher(_BaseDispatcher):
+    """
+        asyncio webhook dispatcher.
+
+        Same sharding guarantees as [EngineDispatcher] using one task per shard
+        driving `Engine.process_webhook_async`.
+    """
+
+    def __init__(self, engine, workers: int = 64, max_queue_size: int = 1000):
+        super().__init__(engine, workers, max_queue_size)
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def _queue_depths(self) -> List[int]:
+        return [q.qsize() for q in self._queues]
+
+    async def _run(self, shard: int) -> None:
+        q = self._queues[shard]
+
+        while True:
+            job = await q.get()
+
+            try:
+                if job is _STOP:
+                    return
+
+                await self.engine.process_webhook_async(job)
+                self._on_done(failed=False)
+
+            except Exception as e:
+                self._on_done(failed=True)
+                _logger.error("Dispatcher shard %s failed to process webhook: %s", shard, e, exc_info=True)
+
+            finally:
+                q.task_done()
+
+    def start(self) -> None:
+        """
+        start shard tasks on the running event loop
+        """
+        if self._tasks:
+            return
+
+        self._queues = [asyncio.Queue(maxsize=self.max_queue_size) for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._run(shard), name=f"pywce-dispatcher-{shard}")
+                       for shard in range(self.workers)]
+
+    async def submit(self, webhook_data: Dict[str, Any], block: bool = False) -> bool:
+        """
+        queue a webhook for processing
+
+        A batched webhook is split into one job per message, each routed by its own sender.
+
+        :param webhook_data: raw webhook body, parsed dict or envelope, it is parsed once before queueing
+        :param block: wait for space if the shard queue is full
+        :return: True if accepted, False if a shard queue is full
+        """
+        assert self._queues, "Dispatcher not started"
+
+        accepted = True
+
+        for envelope in client.WebhookEnvelope.of(webhook_data).split():
+            shard = self.shard_for(self.shard_key(envelope))
+
+            try:
+                if block:
+                    await self._queues[shard].put(envelope)
+                else:
+                    self._queues[shard].put_nowait(envelope)
+                self._on_submit(accepted=True)
+            except asyncio.QueueFull:
+                self._on_submit(accepted=False)
+                _logger.warning("Dispatcher shard %s is full, webhook rejected", shard)
+                accepted = False
+
+        return accepted
+
+    async def join(self) -> None:
+        """
+        wait until all queued webhooks are processed, returns at once if not started
+        """
+        if not self._tasks:
+            return
+
+        for q in self._queues:
+            await q.join()
+
+    async def stop(self, drain: bool = True) -> None:
+        """
+        stop all shard tasks, does nothing if not started
+
+        :param drain: process already queued webhooks before stopping, else they are discarded
+        """
+        if not self._tasks:
+            return
+
+        if drain:
+            await self.join()
+        else:
+            self._discard()
+
+        for q in self._queues:
+            await q.put(_STOP)
+
+        await asyncio.gather(*self._tasks)
+        self._tasks = []
@@ -1,8 +1,11 @@
+import asyncio
 import importlib
+import inspect
 import logging
 from functools import wraps
 from typing import Callable, Literal, Optional
 
+from pywce.modules import tracing
 from pywce.src.exceptions import InternalHookError, HookException, EngineResponseException
 from pywce.src.models import HookArg
 
@@ -113,31 +116,92 @@ class HookService:
         except (ImportError, AttributeError, ValueError) as e:
             raise ImportError(f"Could not load function from dotted path '{dotted_path}': {e}")
 
+    @staticmethod
+    def _resolve_hook(hook_dotted_path: str) -> Callable:
+        """
+        Get a hook function from registry or lazy load it.
+
+        :param hook_dotted_path: The dotted path to the hook function.
+        :return: The hook function.
+        """
+        if hook_dotted_path in _hook_registry:
+            # Retrieve the eagerly registered hook
+            return _hook_registry[hook_dotted_path]
+
+        if hook_dotted_path in _dotted_path_registry:
+            # Lazily resolve the hook
+            dotted_path = _dotted_path_registry[hook_dotted_path]
+            hook_func = HookService.load_function_from_dotted_path(dotted_path)
+            _hook_registry[hook_dotted_path] = hook_func
+            return hook_func
+
+        hook_func = HookService.load_function_from_dotted_path(hook_dotted_path)
+        HookService.register_hook(name=hook_dotted_path, dotted_path=hook_dotted_path)
+        return hook_func
+
+    @staticmethod
+    def _in_event_loop() -> bool:
+        try:
+            asyncio.get_running_loop()
+            return True
+        except RuntimeError:
+            return False
+
     @staticmethod
     def _execute_hook(hook_dotted_path: str, hook_arg: HookArg) -> HookArg:
         """
         Execute a function from registry or lazy loading it.
 
+        Async hooks are run to completion on a fresh event loop. If called from a thread with a
+        running event loop they cannot be run here, use `process_webhook_async` instead.
+
         :param hook_dotted_path: The dotted path to the hook function.
         :param hook_arg: The argument to pass to the hook function.
         :return: The result of the hook function.
         """
         try:
-            if hook_dotted_path in _hook_registry:
-                # Retrieve the eagerly registered hook
-                hook_func = _hook_registry[hook_dotted_path]
+            with tracing.span("hook", hook=hook_dotted_path):
+                hook_func = HookService._resolve_hook(hook_dotted_path)
+
+                if inspect.iscoroutinefunction(hook_func):
+                    if HookService._in_event_loop():
+                        raise HookException(f"Async hook '{hook_dotted_path}' called on the sync path inside a running "
+                                            f"event loop, use the engine's async api to run async hooks")
+
+                    return asyncio.run(hook_func(hook_arg))
+
+                return hook_func(hook_arg)
+
+        except HookException as e:
+            raise HookException(e.message, e.data)
+
+        except EngineResponseException as e:
+            raise e
+
+        except Exception as e:
+            _logger.error("Hook processing failure. Hook: '%s', error: %s", hook_dotted_path, str(e))
+            raise HookException(f"Something went wrong. Could not process request", str(e))
+
+    @staticmethod
+    async def _execute_hook_async(hook_dotted_path: str, hook_arg: HookArg) -> HookArg:
+        """
+        Async counterpart of `_execute_hook`.
 
-            elif hook_dotted_path in _dotted_path_registry:
-                # Lazily resolve the hook
-                dotted_path = _dotted_path_registry[hook_dotted_path]
-                hook_func = HookService.load_function_from_dotted_path(dotted_path)
-                _hook_registry[hook_dotted_path] = hook_func
+        Async hooks are awaited directly, sync hooks are offloaded to a worker thread
+        so they do not block the event loop.
 
-            else:
-                hook_func = HookService.load_function_from_dotted_path(hook_dotted_path)
-                HookService.register_hook(name=hook_dotted_path, dotted_path=hook_dotted_path)
+        :param hook_dotted_path: The dotted path to the hook function.
+        :param hook_arg: The argument to pass to the hook function.
+        :return: The result of the hook function.
+        """
+        try:
+            with tracing.span("hook", hook=hook_dotted_path):
+                hook_func = HookService._resolve_hook(hook_dotted_path)
 
-            return hook_func(hook_arg)
+                if inspect.iscoroutinefunction(hook_func):
+                    return await hook_func(hook_arg)
+
+                return await asyncio.to_thread(hook_func, hook_arg)
 
         except HookException as e:
             raise HookException(e.message, e.data)
@@ -160,6 +224,17 @@ class HookService:
         """
         return HookService._execute_hook(hook_dotted_path, hook_arg)
 
+    @staticmethod
+    async def process_hook_async(hook_dotted_path: str, hook_arg: HookArg) -> HookArg:
+        """
+        Async counterpart of `process_hook`.
+
+        :param hook_dotted_path: The dotted path to the hook function.
+        :param hook_arg: The argument to pass to the hook function.
+        :return: The result of the hook function.
+        """
+        return await HookService._execute_hook_async(hook_dotted_path, hook_arg)
+
     @staticmethod
     def process_global_hooks(hook_type: Literal["pre", "post"], hook_arg: HookArg) -> Optional[HookArg]:
         try:
@@ -170,6 +245,16 @@ class HookService:
         except Exception as e:
             _logger.critical("Global `%s` hook processing failure, error: %s", hook_type, e)
 
+    @staticmethod
+    async def process_global_hooks_async(hook_type: Literal["pre", "post"], hook_arg: HookArg) -> Optional[HookArg]:
+        try:
+            hooks = _global_pre_hooks if hook_type == "pre" else _global_post_hooks
+            for pre_hook in hooks:
+                await HookService._execute_hook_async(pre_hook, hook_arg)
+
+        except Exception as e:
+            _logger.critical("Global `%s` hook processing failure, error: %s", hook_type, e)
+
 
 # decorator
 def hook(func: Callable, global_type: Optional[Literal["pre", "post"]] = None) -> Callable:
@@ -182,11 +267,19 @@ def hook(func: Callable, global_type: Optional[Literal["pre", "post"]] = None) -
     """
 
     def decorator(inner_func: Callable) -> Callable:
-        @wraps(inner_func)
-        def wrapper(arg: HookArg) -> HookArg:
-            if not isinstance(arg, HookArg):
-                raise InternalHookError(f"Expected HookArg instance, got {type(arg).__name__}")
-            return inner_func(arg)
+        if inspect.iscoroutinefunction(inner_func):
+            @wraps(inner_func)
+            async def wrapper(arg: HookArg) -> HookArg:
+                if not isinstance(arg, HookArg):
+                    raise InternalHookError(f"Expected HookArg instance, got {type(arg).__name__}")
+                return await inner_func(arg)
+
+        else:
+            @wraps(inner_func)
+            def wrapper(arg: HookArg) -> HookArg:
+                if not isinstance(arg, HookArg):
+                    raise InternalHookError(f"Expected HookArg instance, got {type(arg).__name__}")
+                return inner_func(arg)
 
         # Compute the full dotted path for the function
         full_dotted_path = f"{inner_func.__module__}.{inner_func.__name__}"
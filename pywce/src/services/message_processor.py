@@ -1,10 +1,11 @@
 import logging
 from typing import Dict, Tuple, Any, Union, Optional
 
-from pywce.modules import ISessionManager, client
-from pywce.src.constants import EngineConstants, SessionConstants, TemplateConstants
+from pywce.modules import ISessionManager, client, tracing
+from pywce.modules.session.traced_session_manager import TracedSessionManager
+from pywce.src.constants import EngineConstants, TemplateConstants
 from pywce.src.exceptions import EngineInternalException, EngineResponseException
-from pywce.src.models import WorkerJob, HookArg
+from pywce.src.models import WorkerJob, HookArg, EngineState
 from pywce.src.services import HookService
 from pywce.src.templates import EngineTemplate
 from pywce.src.utils.engine_util import EngineUtil
@@ -29,15 +30,23 @@ class MessageProcessor:
     # (input: str, data: dict)
     USER_INPUT: Tuple[Any, Any]
 
-    def __init__(self, data: WorkerJob):
+    def __init__(self, data: WorkerJob, state: Optional[EngineState] = None):
+        """
+        :param state: engine state of the worker processing the message, changes are saved by the worker
+        """
         self.data = data
         self.user = data.user
         self.config = data.engine_config
         self.whatsapp = data.engine_config.whatsapp
         self.payload = data.payload
 
+        self.storage = data.storage or self.config.storage_manager
+
         self.session_id = self.user.wa_id
-        self.session: ISessionManager = self.config.session_manager.session(session_id=self.session_id)
+        self.session: ISessionManager = data.session or TracedSessionManager.wrap(
+            self.config.session_manager.session(session_id=self.session_id))
+
+        self.state = state if state is not None else EngineState.load(self.session, self.session_id)
 
     def _compute_hook_arg(self):
         self.HOOK_ARG = HookArg(
@@ -49,13 +58,16 @@ class MessageProcessor:
         )
 
     def _get_stage_template(self, template_stage_name: str) -> EngineTemplate:
-        tpl = self.config.storage_manager.get(template_stage_name)
+        tpl = self.storage.get(template_stage_name)
         if tpl is None:
             raise EngineInternalException(message=f"Template {template_stage_name} not found")
         return tpl
 
+    def _save_stage(self) -> None:
+        self.state.current_stage = self.CURRENT_STAGE
+
     def _get_current_template(self) -> None:
-        current_stage_in_session = self.session.get(session_id=self.session_id, key=SessionConstants.CURRENT_STAGE)
+        current_stage_in_session = self.state.current_stage
 
         _logger.debug("Current stage in session: %s", current_stage_in_session)
 
@@ -65,8 +77,7 @@ class MessageProcessor:
             self.CURRENT_TEMPLATE = self._get_stage_template(self.CURRENT_STAGE)
             self.IS_FIRST_TIME = True
 
-            self.session.save(session_id=self.session_id, key=SessionConstants.CURRENT_STAGE, data=self.CURRENT_STAGE)
-            self.session.save(session_id=self.session_id, key=SessionConstants.PREV_STAGE, data=self.CURRENT_STAGE)
+            self.state.current_stage = self.state.prev_stage = self.CURRENT_STAGE
             return
 
         self.CURRENT_STAGE = current_stage_in_session
@@ -75,7 +86,7 @@ class MessageProcessor:
     def _checK_for_trigger_routes(self, possible_trigger_input: str) -> bool:
         # a helper function to check if there are any valid triggers matching user input
         # if available, go to that route
-        for trigger in self.config.storage_manager.triggers():
+        for trigger in self.storage.triggers():
             _next_stage = trigger.next_stage
 
             if EngineUtil.has_triggered(trigger, possible_trigger_input):
@@ -87,8 +98,7 @@ class MessageProcessor:
                 self.CURRENT_TEMPLATE = self._get_stage_template(_next_stage)
                 self.CURRENT_STAGE = _next_stage
                 self.IS_FROM_TRIGGER = True
-                self.session.save(session_id=self.session_id, key=SessionConstants.CURRENT_STAGE,
-                                  data=self.CURRENT_STAGE)
+                self._save_stage()
                 _logger.debug("Template change from trigger: %s. Stage: %s", trigger, _next_stage)
                 return True
 
@@ -111,21 +121,19 @@ class MessageProcessor:
                 self.CURRENT_TEMPLATE = self._get_stage_template(self.CURRENT_STAGE)
 
             elif possible_trigger_input.lower() == EngineConstants.DEFAULT_BACK_BTN_NAME.lower() or possible_trigger_input.lower() == EngineConstants.DEFAULT_RETRY_BTN_NAME.lower():
-                self.CURRENT_STAGE = self.session.get(session_id=self.session_id,
-                                                      key=SessionConstants.PREV_STAGE) or self.config.start_template_stage
+                self.CURRENT_STAGE = self.state.prev_stage or self.config.start_template_stage
                 self.CURRENT_TEMPLATE = self._get_stage_template(self.CURRENT_STAGE)
 
             else:
                 # this is tricky, user may be logged in / logged out, back to checkpoint or default to start template
                 # there may be a defined trigger route
                 if not self._checK_for_trigger_routes(possible_trigger_input):
-                    _stage = self.session.get(session_id=self.session_id,
-                                              key=SessionConstants.LATEST_CHECKPOINT) or self.config.start_template_stage
+                    _stage = self.state.checkpoint or self.config.start_template_stage
                     self.CURRENT_STAGE = _stage
                     self.CURRENT_TEMPLATE = self._get_stage_template(self.CURRENT_STAGE)
 
             self.IS_FROM_TRIGGER = True
-            self.session.save(session_id=self.session_id, key=SessionConstants.CURRENT_STAGE, data=self.CURRENT_STAGE)
+            self._save_stage()
             _logger.debug("Template change from builtin trigger: %s. Stage: %s", possible_trigger_input,
                           self.CURRENT_STAGE)
             return
@@ -187,13 +195,11 @@ class MessageProcessor:
     def _check_for_session_bypass(self) -> None:
         if self.CURRENT_TEMPLATE.session is False:
             self.IS_FROM_TRIGGER = False
-            self.session.save(session_id=self.session_id, key=SessionConstants.CURRENT_STAGE,
-                              data=self.CURRENT_STAGE)
+            self._save_stage()
 
     def _check_save_checkpoint(self) -> None:
         if self.CURRENT_TEMPLATE.checkpoint is True:
-            self.session.save(session_id=self.session_id, key=SessionConstants.LATEST_CHECKPOINT,
-                              data=self.CURRENT_STAGE)
+            self.state.checkpoint = self.CURRENT_STAGE
 
     def _check_template_params(self, template: EngineTemplate = None) -> None:
         tpl = template or self.CURRENT_TEMPLATE
@@ -318,6 +324,12 @@ class MessageProcessor:
 
         HookService.process_global_hooks("post", self.HOOK_ARG)
 
+    def _resolve_current_stage(self) -> None:
+        self._get_current_template()
+        self._get_message_body()
+        self._check_for_session_bypass()
+        self._check_save_checkpoint()
+
     def setup(self) -> None:
         """
             Should be called before any other methods are called.
@@ -326,15 +338,123 @@ class MessageProcessor:
 
             :return: None
         """
-        self._get_current_template()
-        self._get_message_body()
-        self._check_for_session_bypass()
-        self._check_save_checkpoint()
-        self._show_typing_indicator()
-        self._show_reaction()
+        with tracing.span("processor.setup") as span:
+            self._resolve_current_stage()
+            span.set("stage", self.CURRENT_STAGE)
 
-        self._compute_hook_arg()
+            self._show_typing_indicator()
+            self._show_reaction()
 
-        _logger.debug("Hook arg computed: %s", self.HOOK_ARG)
+            self._compute_hook_arg()
 
-        HookUtil.run_listener(listener=self.config.on_hook_arg, arg=self.HOOK_ARG)
+            _logger.debug("Hook arg computed: %s", self.HOOK_ARG)
+
+            HookUtil.run_listener(listener=self.config.on_hook_arg, arg=self.HOOK_ARG)
+
+
+class AsyncMessageProcessor(MessageProcessor):
+    """
+        Async message processor
+
+        Same as [MessageProcessor] but awaits all templates hooks and
+        uses the async WhatsApp client for acks, typing indicators & reactions
+    """
+
+    def __init__(self, data: WorkerJob, state: Optional[EngineState] = None):
+        super().__init__(data, state)
+        self.whatsapp = self.whatsapp.aio
+
+    async def _ack_user_message(self) -> None:
+        mark_as_read = self.config.read_receipts is True or self.CURRENT_TEMPLATE.acknowledge is True
+
+        if mark_as_read is True:
+            try:
+                await self.whatsapp.mark_as_read(self.user.msg_id)
+            except:
+                _logger.warning("Failed to ack user message")
+
+    async def _show_typing_indicator(self) -> None:
+        if self.CURRENT_TEMPLATE.typing:
+            try:
+                await self.whatsapp.show_typing_indicator(self.user.msg_id)
+            except:
+                _logger.warning("Could not show typing indicator")
+
+    async def _show_reaction(self) -> None:
+        if self.CURRENT_TEMPLATE.react is not None:
+            try:
+                await self.whatsapp.send_reaction(
+                    emoji=self.CURRENT_TEMPLATE.react,
+                    message_id=self.user.msg_id,
+                    recipient_id=self.user.wa_id
+                )
+            except:
+                _logger.warning("Failed to send: %s reaction to message", self.CURRENT_TEMPLATE.react)
+
+    async def process_dynamic_route_hook(self) -> Union[str, None]:
+        if self.CURRENT_TEMPLATE.router is not None:
+            try:
+                self._check_template_params()
+
+                result = await HookUtil.process_hook_async(
+                    hook=self.CURRENT_TEMPLATE.router,
+                    arg=self.HOOK_ARG,
+                    external=self.config.ext_hook_processor
+                )
+
+                return result.additional_data.get(EngineConstants.DYNAMIC_ROUTE_KEY)
+
+            except:
+                _logger.error("Failed to do dynamic route hook")
+
+        return None
+
+    async def process_pre_hooks(self, next_stage_template: Dict = None) -> None:
+        self._check_template_params(next_stage_template)
+
+        await HookService.process_global_hooks_async("pre", self.HOOK_ARG)
+
+        if self.CURRENT_TEMPLATE.on_generate is not None:
+            await HookUtil.process_hook_async(hook=self.CURRENT_TEMPLATE.on_generate,
+                                              arg=self.HOOK_ARG,
+                                              external=self.config.ext_hook_processor
+                                              )
+
+    async def process_post_hooks(self) -> None:
+        await self._ack_user_message()
+        self._check_template_params()
+
+        if self.CURRENT_TEMPLATE.on_receive is not None:
+            await HookUtil.process_hook_async(hook=self.CURRENT_TEMPLATE.on_receive,
+                                              arg=self.HOOK_ARG,
+                                              external=self.config.ext_hook_processor
+                                              )
+
+        if self.CURRENT_TEMPLATE.middleware is not None:
+            await HookUtil.process_hook_async(hook=self.CURRENT_TEMPLATE.middleware,
+                                              arg=self.HOOK_ARG,
+                                              external=self.config.ext_hook_processor
+                                              )
+
+        if self.CURRENT_TEMPLATE.prop is not None:
+            self.session.save_prop(
+                session_id=self.session_id,
+                prop_key=self.CURRENT_TEMPLATE.prop,
+                data=self.USER_INPUT[0]
+            )
+
+        await HookService.process_global_hooks_async("post", self.HOOK_ARG)
+
+    async def setup(self) -> None:
+        with tracing.span("processor.setup") as span:
+            self._resolve_current_stage()
+            span.set("stage", self.CURRENT_STAGE)
+
+            await self._show_typing_indicator()
+            await self._show_reaction()
+
+            self._compute_hook_arg()
+
+            _logger.debug("Hook arg computed: %s", self.HOOK_ARG)
+
+            HookUtil.run_listener(listener=self.config.on_hook_arg, arg=self.HOOK_ARG)
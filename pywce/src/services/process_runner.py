@@ -0,0 +1,341 @@
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional, Iterable, Union
+
+from pywce.modules import client
+from pywce.src.services.dispatcher import webhook_shard_key
+
+_logger = logging.getLogger(__name__)
+
+
+class ConsistentHashRing:
+    """
+        Consistent hash ring with virtual nodes.
+
+        Adding or removing a node only moves the keys owned by that node,
+        every other key keeps routing to the same node.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = 100):
+        """
+        :param nodes: initial ring nodes
+        :param replicas: virtual nodes per node, higher values spread keys more evenly
+        """
+        self.replicas = replicas
+        self._keys: List[int] = []
+        self._ring: Dict[int, str] = {}
+        self._nodes: List[str] = []
+
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+
+    def add(self, node: str) -> None:
+        if node in self._nodes:
+            return
+
+        self._nodes.append(node)
+
+        for i in range(self.replicas):
+            h = self._hash(f"{node}#{i}")
+            self._ring[h] = node
+            bisect.insort(self._keys, h)
+
+    def remove(self, node: str) -> None:
+        if node not in self._nodes:
+            return
+
+        self._nodes.remove(node)
+
+        for i in range(self.replicas):
+            h = self._hash(f"{node}#{i}")
+            self._ring.pop(h, None)
+            idx = bisect.bisect_left(self._keys, h)
+            if idx < len(self._keys) and self._keys[idx] == h:
+                self._keys.pop(idx)
+
+    def get(self, key: str) -> str:
+        assert self._keys, "Hash ring has no nodes"
+
+        idx = bisect.bisect(self._keys, self._hash(key)) % len(self._keys)
+        return self._ring[self._keys[idx]]
+
+
+def _engine_process(node: str, engine_factory: Callable, jobs: multiprocessing.JoinableQueue) -> None:
+    engine = engine_factory()
+    _logger.debug("Engine process %s started", node)
+
+    while True:
+        job = jobs.get()
+
+        try:
+            if job is None:
+                return
+
+            engine.process_webhook(job)
+
+        except Exception as e:
+            _logger.error("Engine process %s failed to process webhook: %s", node, e, exc_info=True)
+
+        finally:
+            jobs.task_done()
+
+
+class EngineProcessRunner:
+    """
+        Multi-process engine runner.
+
+        Runs K engine processes, each built by `engine_factory` in the child process,
+        and routes every webhook to a process by consistent hash of the sender wa_id.
+
+        A user is always served by the same process, so process-local session state
+        (e.g. DefaultSessionManager) stays correct while CPU bound work (validation,
+        rendering, json) runs on all cores.
+
+        IMPORTANT: session state is not migrated between processes. `add_process` & `remove_process`
+        move users to another process, users moved with a process-local session manager lose their
+        session and start afresh. To resize a running runner, build engines over a shared session
+        backend, e.g. `RedisSessionManager` or `SqliteSessionManager` on a shared file.
+        `ensure_alive` restarts a process in place, its users keep routing to it but lose
+        process-local sessions all the same.
+
+        Example:
+            def make_engine() -> Engine:
+                return Engine(config=EngineConfig(...))
+
+            runner = EngineProcessRunner(make_engine, processes=4)
+            runner.start()
+
+            # in webhook route
+            runner.submit(payload)
+    """
+
+    # seconds between attempts of a blocking submit waiting for queue space
+    SUBMIT_POLL_S: float = 0.005
+    # seconds between liveness checks of a process while its queue drains
+    DRAIN_POLL_S: float = 0.1
+
+    def __init__(self,
+                 engine_factory: Callable,
+                 processes: int = multiprocessing.cpu_count(),
+                 max_queue_size: int = 1000,
+                 replicas: int = 100,
+                 start_method: Optional[str] = None
+                 ):
+        """
+        :param engine_factory: picklable callable returning an Engine, called once in each process
+        :param processes: number of engine processes
+        :param max_queue_size: max pending webhooks per process
+        :param replicas: virtual nodes per process on the hash ring
+        :param start_method: multiprocessing start method, platform default if not set
+        """
+        assert processes > 0, "Runner needs at least 1 process"
+
+        self.engine_factory = engine_factory
+        self.max_queue_size = max_queue_size
+
+        self._ctx = multiprocessing.get_context(start_method)
+        self._ring = ConsistentHashRing(replicas=replicas)
+        self._queues: Dict[str, multiprocessing.JoinableQueue] = {}
+        self._processes: Dict[str, multiprocessing.Process] = {}
+        self._initial = processes
+        self._next_id = 0
+
+        # guards the ring while it is being rebalanced
+        self._lock = threading.RLock()
+
+    @property
+    def nodes(self) -> List[str]:
+        return self._ring.nodes
+
+    def _spawn(self, node: str) -> None:
+        jobs = self._ctx.JoinableQueue(maxsize=self.max_queue_size)
+        process = self._ctx.Process(
+            target=_engine_process,
+            args=(node, self.engine_factory, jobs),
+            name=f"pywce-engine-{node}",
+            daemon=True
+        )
+        process.start()
+
+        self._queues[node] = jobs
+        self._processes[node] = process
+
+    def _join(self, node: str) -> None:
+        """
+        wait for the queued webhooks of a process, giving up if the process dies
+        """
+        jobs, process = self._queues[node], self._processes[node]
+        done = threading.Event()
+
+        def join():
+            jobs.join()
+            done.set()
+
+        # JoinableQueue.join has no timeout, wait on a helper thread & check the process meanwhile
+        threading.Thread(target=join, name=f"pywce-drain-{node}", daemon=True).start()
+
+        while not done.wait(self.DRAIN_POLL_S):
+            if not process.is_alive():
+                _logger.warning("Engine process %s exited while draining, its pending webhooks are dropped", node)
+                return
+
+    def _drain(self) -> None:
+        for node in list(self._queues):
+            if self._processes[node].is_alive():
+                self._join(node)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._processes:
+                return
+
+            for _ in range(self._initial):
+                self.add_process(drain=False)
+
+    def add_process(self, drain: bool = True) -> str:
+        """
+        add an engine process to the ring.
+
+        Only keys now owned by the new process move to it. By default, pending webhooks are
+        processed before the ring changes so no user has messages in flight on two processes.
+        Moved users lose process-local session state, see the class docs.
+
+        :return: the new process node id
+        """
+        with self._lock:
+            if drain:
+                self._drain()
+
+            node = f"engine-{self._next_id}"
+            self._next_id += 1
+
+            self._spawn(node)
+            self._ring.add(node)
+
+            _logger.info("Engine process %s added, pid: %s", node, self._processes[node].pid)
+            return node
+
+    def remove_process(self, node: str, drain: bool = True) -> None:
+        """
+        stop an engine process & remove it from the ring, its keys move to the remaining processes
+
+        Moved users lose process-local session state, see the class docs.
+        """
+        with self._lock:
+            if drain:
+                self._drain()
+
+            self._ring.remove(node)
+            jobs = self._queues.pop(node)
+            process = self._processes.pop(node)
+
+            if process.is_alive():
+                jobs.put(None)
+                process.join()
+
+    def ensure_alive(self) -> List[str]:
+        """
+        restart dead engine processes in place.
+
+        A restarted process keeps its node id & ring position, so its users route back to it.
+        Webhooks pending on a dead process are dropped.
+
+        :return: restarted node ids
+        """
+        restarted = []
+
+        with self._lock:
+            for node, process in list(self._processes.items()):
+                if process.is_alive():
+                    continue
+
+                _logger.warning("Engine process %s exited with code %s, restarting", node, process.exitcode)
+                self._queues[node].close()
+                self._spawn(node)
+                restarted.append(node)
+
+        return restarted
+
+    def route(self, webhook_data: Union[Dict[str, Any], bytes, client.WebhookEnvelope]) -> str:
+        """
+        :return: node id of the process that owns the webhook sender
+        """
+        return self._ring.get(webhook_shard_key(webhook_data))
+
+    def submit(self, webhook_data: Dict[str, Any], block: bool = False, timeout: Optional[float] = None) -> bool:
+        """
+        send a webhook to its engine process
+
+        A batched webhook is split into one job per message, each routed by its own sender.
+
+        :param webhook_data: raw webhook body, parsed dict or envelope, it is parsed once before queueing
+        :param block: wait for space if the process queue is full
+        :param timeout: max seconds to wait when blocking, shared by all messages of a batch
+        :return: True if accepted, False if a process queue is full or a process is not running
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        accepted = True
+
+        for envelope in client.WebhookEnvelope.of(webhook_data).split():
+            accepted = self._submit(envelope, block, deadline) and accepted
+
+        return accepted
+
+    def _submit(self, envelope: client.WebhookEnvelope, block: bool, deadline: Optional[float]) -> bool:
+        while True:
+            # route & enqueue atomically with rebalancing, but never wait for space holding the lock
+            with self._lock:
+                node = self.route(envelope)
+
+                if not self._processes[node].is_alive():
+                    _logger.warning("Engine process %s is not running, webhook rejected", node)
+                    return False
+
+                try:
+                    self._queues[node].put(envelope, block=False)
+                    return True
+                except queue.Full:
+                    pass
+
+            if not block or (deadline is not None and time.monotonic() >= deadline):
+                _logger.warning("Engine process %s queue is full, webhook rejected", node)
+                return False
+
+            time.sleep(self.SUBMIT_POLL_S)
+
+    def queue_depths(self) -> Dict[str, int]:
+        depths = {}
+
+        for node, jobs in self._queues.items():
+            try:
+                depths[node] = jobs.qsize()
+            except NotImplementedError:
+                # not supported on some platforms e.g. macOS
+                depths[node] = -1
+
+        return depths
+
+    def join(self) -> None:
+        """
+        block until all submitted webhooks are processed
+        """
+        with self._lock:
+            self._drain()
+
+    def stop(self, drain: bool = True) -> None:
+        with self._lock:
+            for node in list(self._processes):
+                self.remove_process(node, drain=drain)
@@ -1,12 +1,14 @@
+import asyncio
+import inspect
 import re
 from random import randint
 from typing import Dict, Any, List, Union, Optional
 
 import pywce.src.templates as templates
-from pywce.modules import client
+from pywce.modules import client, tracing
 from pywce.src.constants import EngineConstants
 from pywce.src.exceptions import EngineInternalException
-from pywce.src.models import WhatsAppServiceModel
+from pywce.src.models import WhatsAppServiceModel, HookArg
 from pywce.src.utils.engine_util import EngineUtil
 from pywce.src.utils.hook_util import HookUtil
 
@@ -79,6 +81,20 @@ class TemplateMessageProcessor:
 
         return templates.Template.as_model(dict_template)
 
+    def _external_renderer_kwargs(self) -> Dict[str, Any]:
+        return dict(
+            template_dict=templates.Template.as_dict(self.template),
+            hook_path=self.template.template,
+            hook_arg=self.hook,
+            ext_hook_processor=self.config.ext_hook_processor
+        )
+
+    def _apply_template_hook_response(self, response: HookArg) -> None:
+        self.template = templates.Template.as_model(EngineUtil.render_template(
+            template=templates.Template.as_dict(self.template),
+            context=response.template_body.render_template_payload
+        ))
+
     def _process_template_hook(self, skip: bool = False) -> None:
         """
         If templates has the `templates` hook specified, process it
@@ -91,12 +107,7 @@ class TemplateMessageProcessor:
         if skip: return
 
         if self.config.external_renderer is not None:
-            rendered_dict = self.config.external_renderer(
-                template_dict=templates.Template.as_dict(self.template),
-                hook_path=self.template.template,
-                hook_arg=self.hook,
-                ext_hook_processor=self.config.ext_hook_processor
-            )
+            rendered_dict = self.config.external_renderer(**self._external_renderer_kwargs())
             self.template = templates.Template.as_model(rendered_dict)
 
         else:
@@ -106,10 +117,7 @@ class TemplateMessageProcessor:
                                                  external=self.config.ext_hook_processor
                                                  )
 
-                self.template = templates.Template.as_model(EngineUtil.render_template(
-                    template=templates.Template.as_dict(self.template),
-                    context=response.template_body.render_template_payload
-                ))
+                self._apply_template_hook_response(response)
 
         self._setup()
 
@@ -308,9 +316,7 @@ class TemplateMessageProcessor:
         """
         Flow templates may require initial flow data to be passed, it is handled here
         """
-        data = {"type": "flow", **self._get_common_interactive_fields()}
-
-        flow_initial_payload: Optional[Dict] = None
+        response: Optional[HookArg] = None
 
         if self.template.template is not None:
             response = HookUtil.process_hook(hook=self.template.template,
@@ -318,6 +324,14 @@ class TemplateMessageProcessor:
                                              external=self.config.ext_hook_processor
                                              )
 
+        return self._flow_payload(response)
+
+    def _flow_payload(self, response: Optional[HookArg] = None) -> Dict[str, Any]:
+        data = {"type": "flow", **self._get_common_interactive_fields()}
+
+        flow_initial_payload: Optional[Dict] = None
+
+        if response is not None:
             flow_initial_payload = response.template_body.flow_payload
 
             self.template = EngineUtil.render_template(
@@ -435,6 +449,9 @@ class TemplateMessageProcessor:
                                          external=self.config.ext_hook_processor
                                          )
 
+        return self._whatsapp_template_payload(response)
+
+    def _whatsapp_template_payload(self, response: HookArg) -> Dict[str, Any]:
         components: List = response.template_body.render_template_payload.get(EngineConstants.WHATSAPP_TEMPLATE_KEY, [])
 
         return {
@@ -502,10 +519,104 @@ class TemplateMessageProcessor:
             :param template: process as engine templates message else, bypass engine logic
             :return:
         """
-        override_template = template
+        with tracing.span("template.render", kind=self.template.kind):
+            override_template = template
+
+            if isinstance(self.template, templates.DynamicTemplate):
+                override_template = False
+                self._dynamic()
+
+            return self._generate_payload(template=override_template)
+
+
+class AsyncTemplateMessageProcessor(TemplateMessageProcessor):
+    """
+    Async Template Message Processor
+
+    Same as [TemplateMessageProcessor] but awaits all templates hooks
+    """
+
+    async def _process_template_hook(self, skip: bool = False) -> None:
+        self.template = self._process_special_vars()
+        self._setup()
+
+        if skip: return
+
+        if self.config.external_renderer is not None:
+            kwargs = self._external_renderer_kwargs()
+
+            if inspect.iscoroutinefunction(self.config.external_renderer):
+                rendered_dict = await self.config.external_renderer(**kwargs)
+            else:
+                rendered_dict = await asyncio.to_thread(self.config.external_renderer, **kwargs)
+
+            self.template = templates.Template.as_model(rendered_dict)
+
+        else:
+            if self.template.template is not None:
+                response = await HookUtil.process_hook_async(hook=self.template.template,
+                                                             arg=self.hook,
+                                                             external=self.config.ext_hook_processor
+                                                             )
+
+                self._apply_template_hook_response(response)
+
+        self._setup()
+
+    async def _flow(self) -> Dict[str, Any]:
+        response: Optional[HookArg] = None
+
+        if self.template.template is not None:
+            response = await HookUtil.process_hook_async(hook=self.template.template,
+                                                         arg=self.hook,
+                                                         external=self.config.ext_hook_processor
+                                                         )
+
+        return self._flow_payload(response)
+
+    async def _dynamic(self):
+        assert self.template.template is not None, "templates hook is missing"
+
+        response = await HookUtil.process_hook_async(hook=self.template.template,
+                                                     arg=self.hook,
+                                                     external=self.config.ext_hook_processor
+                                                     )
+
+        self.template = response.template_body.dynamic_template
+
+    async def _whatsapp_template(self):
+        assert self.template.template is not None, "templates hook is missing"
+
+        response = await HookUtil.process_hook_async(hook=self.template.template,
+                                                     arg=self.hook,
+                                                     external=self.config.ext_hook_processor
+                                                     )
+
+        return self._whatsapp_template_payload(response)
+
+    async def _generate_payload(self, template: bool = True) -> Dict[str, Any]:
+        if template is True:
+            await self._process_template_hook(
+                skip=isinstance(self.template, templates.FlowTemplate) or \
+                     isinstance(self.template, templates.DynamicTemplate) or \
+                     isinstance(self.template, templates.TemplateTemplate)
+            )
+
+        if isinstance(self.template, templates.TemplateTemplate):
+            return await self._whatsapp_template()
+
+        elif isinstance(self.template, templates.FlowTemplate):
+            return await self._flow()
+
+        # remaining types have no hooks left to run
+        return super()._generate_payload(template=False)
+
+    async def payload(self, template: bool = True) -> Dict[str, Any]:
+        with tracing.span("template.render", kind=self.template.kind):
+            override_template = template
 
-        if isinstance(self.template, templates.DynamicTemplate):
-            override_template = False
-            self._dynamic()
+            if isinstance(self.template, templates.DynamicTemplate):
+                override_template = False
+                await self._dynamic()
 
-        return self._generate_payload(template=override_template)
+            return await self._generate_payload(template=override_template)
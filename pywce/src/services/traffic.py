@@ -0,0 +1,214 @@
+import copy
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Union
+
+from pywce.modules import client
+
+_logger = logging.getLogger(__name__)
+
+# volatile fields that differ between a capture & its replay
+_VOLATILE_KEYS = {"context", "message_id"}
+
+
+class TrafficRecorder:
+    """
+        Records inbound webhooks & outbound message requests to a JSONL capture.
+
+        Every line is either
+            {"dir": "in", "t": <epoch>, "body": <webhook>}
+            {"dir": "out", "t": <epoch>, "type": <message type>, "to": <recipient>, "payload": <request body>}
+
+        Example:
+            recorder = TrafficRecorder("capture.jsonl")
+
+            whatsapp = client.WhatsApp(config, on_send_listener=recorder.record_send)
+            engine = Engine(EngineConfig(whatsapp=whatsapp, webhook_tap=recorder.record_webhook, ...))
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, separators=(",", ":"))
+
+        with self._lock:
+            if not self._file.closed:
+                self._file.write(line + "\n")
+                self._file.flush()
+
+    def record_webhook(self, webhook_data: Union[client.WebhookEnvelope, Dict[str, Any], bytes]) -> None:
+        """
+        record an inbound webhook, as a `webhook_tap` it gets the engine's envelope and is not parsed again
+        """
+        body = client.WebhookEnvelope.of(webhook_data).data
+        self._write({"dir": "in", "t": time.time(), "body": body})
+
+    def record_send(self, sent: Optional[client.SentMessage] = None) -> None:
+        if sent is None:
+            return
+
+        self._write({"dir": "out", "t": time.time(), "type": sent.message_type, "to": sent.recipient_id,
+                     "payload": sent.payload})
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self) -> "TrafficRecorder":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+@dataclass
+class ReplayResult:
+    """
+        :var messages: inbound webhooks replayed
+        :var seconds: wall time of the replay
+        :var msgs_per_s: replay throughput
+        :var sent: outbound requests during replay
+        :var matched: outbound requests equal to the capture
+        :var diff: mismatching outbound requests, per recipient & position
+    """
+    messages: int
+    seconds: float
+    msgs_per_s: float
+    sent: int
+    matched: int
+    diff: List[Dict[str, Any]] = field(default_factory=list)
+
+
+class TrafficReplayer:
+    """
+        Replays a capture of [TrafficRecorder] against an engine.
+
+        Webhooks are replayed with `Engine.process_webhook_batch`, so batched deliveries are processed in full.
+
+        Webhook timestamps are rewritten to the replay time so the engine old-webhook check passes.
+        Inter-arrival gaps are kept at `speed` (1 for real time, 10 for 10x), None replays at max speed.
+
+        Gaps shorter than the engine `debounce_timeout_ms` make the engine ignore messages,
+        lower it when replaying faster than real time.
+
+        Outbound requests made while replaying are compared with the captured ones per recipient,
+        in order, ignoring reply context & message ids.
+    """
+
+    def __init__(self, engine, capture_path: str, speed: Optional[float] = 1.0):
+        assert speed is None or speed > 0, "speed must be positive or None for max speed"
+
+        self.engine = engine
+        self.speed = speed
+        self.inbound: List[Dict[str, Any]] = []
+        self.outbound: List[Dict[str, Any]] = []
+        self.replayed: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+        with open(capture_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+
+                record = json.loads(line)
+                (self.inbound if record.get("dir") == "in" else self.outbound).append(record)
+
+    @staticmethod
+    def _retime(body: Dict[str, Any], now: float) -> Dict[str, Any]:
+        body = copy.deepcopy(body)
+        timestamp = str(int(now))
+
+        for entry in body.get("entry") or []:
+            for change in entry.get("changes") or []:
+                value = change.get("value") or {}
+
+                for item in (value.get("messages") or []) + (value.get("statuses") or []):
+                    item["timestamp"] = timestamp
+
+        return body
+
+    def _on_send(self, sent: Optional[client.SentMessage] = None) -> None:
+        if sent is None:
+            return
+
+        with self._lock:
+            self.replayed.append({"type": sent.message_type, "to": sent.recipient_id, "payload": sent.payload})
+
+    @staticmethod
+    def _normalize(value: Any) -> Any:
+        if isinstance(value, dict):
+            return {k: TrafficReplayer._normalize(v) for k, v in value.items() if k not in _VOLATILE_KEYS}
+
+        if isinstance(value, list):
+            return [TrafficReplayer._normalize(v) for v in value]
+
+        return value
+
+    def diff(self) -> List[Dict[str, Any]]:
+        """
+        :return: mismatches as {to, index, expected, actual}, a missing side is None
+        """
+        def per_recipient(records):
+            grouped: Dict[str, List[Any]] = {}
+            for r in records:
+                grouped.setdefault(r.get("to"), []).append(self._normalize(r.get("payload")))
+            return grouped
+
+        expected, actual = per_recipient(self.outbound), per_recipient(self.replayed)
+        mismatches = []
+
+        for to in sorted(set(expected) | set(actual), key=str):
+            exp, act = expected.get(to, []), actual.get(to, [])
+
+            for i in range(max(len(exp), len(act))):
+                e = exp[i] if i < len(exp) else None
+                a = act[i] if i < len(act) else None
+
+                if e != a:
+                    mismatches.append({"to": to, "index": i, "expected": e, "actual": a})
+
+        return mismatches
+
+    def run(self) -> ReplayResult:
+        whatsapp = self.engine.whatsapp
+        listener = whatsapp.listener
+        whatsapp.listener = self._on_send
+        self.replayed = []
+
+        try:
+            first = self.inbound[0]["t"] if self.inbound else 0
+            start = time.perf_counter()
+
+            for record in self.inbound:
+                if self.speed is not None:
+                    delay = (record["t"] - first) / self.speed - (time.perf_counter() - start)
+                    if delay > 0:
+                        time.sleep(delay)
+
+                try:
+                    self.engine.process_webhook_batch(self._retime(record["body"], time.time()))
+                except Exception as e:
+                    _logger.error("Replayed webhook failed: %s", e)
+
+            seconds = time.perf_counter() - start
+
+        finally:
+            whatsapp.listener = listener
+
+        mismatches = self.diff()
+        total = max(len(self.replayed), len(self.outbound))
+
+        return ReplayResult(
+            messages=len(self.inbound),
+            seconds=seconds,
+            msgs_per_s=len(self.inbound) / seconds if seconds else 0.0,
+            sent=len(self.replayed),
+            matched=total - len(mismatches),
+            diff=mismatches
+        )
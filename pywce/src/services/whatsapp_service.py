@@ -1,12 +1,13 @@
 import logging
-from datetime import datetime
-from typing import Dict, Any
+from time import time
+from typing import Dict, Any, Callable
 
 import pywce.src.templates as templates
-from pywce.src.constants import SessionConstants
+from pywce.modules import client
 from pywce.src.exceptions import EngineInternalException
-from pywce.src.models import WhatsAppServiceModel
-from pywce.src.services.template_message_processor import TemplateMessageProcessor
+from pywce.src.models import WhatsAppServiceModel, EngineState
+from pywce.src.services.template_message_processor import TemplateMessageProcessor, \
+    AsyncTemplateMessageProcessor
 
 
 logger = logging.getLogger(__name__)
@@ -18,23 +19,21 @@ class WhatsAppService:
         sends whatsapp message
     """
     _processor: TemplateMessageProcessor
+    _processor_class = TemplateMessageProcessor
 
     def __init__(self, model: WhatsAppServiceModel) -> None:
         self.model = model
         self.template = model.template
 
-        self._processor = TemplateMessageProcessor(
+        self._processor = self._processor_class(
             template=model.template,
             whatsapp_model=model
         )
 
-    def send_message(self, handle_session: bool = True, template: bool = True) -> Dict[str, Any]:
+    def _client_method(self, whatsapp: client.WhatsApp) -> Callable:
         """
-        :param handle_session:
-        :param template: process as engine templates message else, bypass engine logic
-        :return:
+        pick the client send method matching the processed templates type
         """
-        payload: Dict[str, Any] = self._processor.payload(template)
         _tpl = self._processor.template
 
         is_interactive: bool = isinstance(_tpl, templates.ButtonTemplate) or \
@@ -46,29 +45,29 @@ class WhatsAppService:
                                isinstance(_tpl, templates.FlowTemplate)
 
         if is_interactive:
-            response = self.model.config.whatsapp.send_interactive(**payload)
+            return whatsapp.send_interactive
 
         elif isinstance(_tpl, templates.TextTemplate):
-            response = self.model.config.whatsapp.send_message(**payload)
+            return whatsapp.send_message
 
         elif isinstance(_tpl, templates.TemplateTemplate):
-            response = self.model.config.whatsapp.send_template(**payload)
+            return whatsapp.send_template
 
         elif isinstance(_tpl, templates.MediaTemplate):
-            response = self.model.config.whatsapp.send_media(**payload)
+            return whatsapp.send_media
 
         elif isinstance(_tpl, templates.LocationTemplate):
-            response = self.model.config.whatsapp.send_location(**payload)
+            return whatsapp.send_location
 
         elif isinstance(_tpl, templates.RequestLocationTemplate):
-            response = self.model.config.whatsapp.request_location(**payload)
+            return whatsapp.request_location
 
-        else:
-            raise EngineInternalException(
-                message="Unsupported message type for payload generation",
-                data=f"Stage: {self.model.next_stage} | Type: {_tpl.__class__.__name__}"
-            )
+        raise EngineInternalException(
+            message="Unsupported message type for payload generation",
+            data=f"Stage: {self.model.next_stage} | Type: {_tpl.__class__.__name__}"
+        )
 
+    def _handle_session(self, response: Dict[str, Any], handle_session: bool, template: bool) -> None:
         if template or \
                 self.model.config.whatsapp.util.was_request_successful(recipient_id=self.model.hook_arg.user.wa_id,
                                                                        response_data=response):
@@ -76,15 +75,52 @@ class WhatsAppService:
             if handle_session:
                 session = self.model.hook_arg.session_manager
                 session_id = self.model.hook_arg.user.wa_id
-                current_stage = session.get(session_id=session_id, key=SessionConstants.CURRENT_STAGE)
+                state = self.model.state or EngineState.load(session, session_id)
 
-                session.save(session_id=session_id, key=SessionConstants.PREV_STAGE, data=current_stage)
-                session.save(session_id=session_id, key=SessionConstants.CURRENT_STAGE, data=self.model.next_stage)
+                state.prev_stage = state.current_stage
+                state.current_stage = self.model.next_stage
 
                 logger.debug(f"Current route set to: %s", self.model.next_stage)
 
                 if self.model.config.handle_session_inactivity:
-                    session.save(session_id=session_id, key=SessionConstants.LAST_ACTIVITY_AT,
-                                 data=datetime.now().isoformat())
+                    state.last_activity_s = time()
+
+                # the worker saves the state it passed in once the message is processed
+                if self.model.state is None:
+                    state.save(session, session_id)
+
+    def send_message(self, handle_session: bool = True, template: bool = True) -> Dict[str, Any]:
+        """
+        :param handle_session:
+        :param template: process as engine templates message else, bypass engine logic
+        :return:
+        """
+        payload: Dict[str, Any] = self._processor.payload(template)
+        response = self._client_method(self.model.config.whatsapp)(**payload)
+
+        self._handle_session(response, handle_session, template)
+
+        return response
+
+
+class AsyncWhatsAppService(WhatsAppService):
+    """
+        Async variant of [WhatsAppService]
+
+        awaits templates hooks and sends the message over the async WhatsApp client
+    """
+    _processor: AsyncTemplateMessageProcessor
+    _processor_class = AsyncTemplateMessageProcessor
+
+    async def send_message(self, handle_session: bool = True, template: bool = True) -> Dict[str, Any]:
+        """
+        :param handle_session:
+        :param template: process as engine templates message else, bypass engine logic
+        :return:
+        """
+        payload: Dict[str, Any] = await self._processor.payload(template)
+        response = await self._client_method(self.model.config.whatsapp.aio)(**payload)
+
+        self._handle_session(response, handle_session, template)
 
         return response
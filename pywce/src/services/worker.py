@@ -1,13 +1,15 @@
 import logging
 from datetime import datetime
 from time import time
-from typing import List, Tuple
+from typing import List, Tuple, Optional
 
 from pywce.modules import ISessionManager, client
+from pywce.modules.session.traced_session_manager import TracedSessionManager
 from pywce.src.constants import *
 from pywce.src.exceptions import *
-from pywce.src.models import HookArg, WorkerJob, WhatsAppServiceModel
-from pywce.src.services import MessageProcessor, WhatsAppService
+from pywce.src.models import HookArg, WorkerJob, WhatsAppServiceModel, EngineState
+from pywce.src.services.message_processor import MessageProcessor, AsyncMessageProcessor
+from pywce.src.services.whatsapp_service import WhatsAppService, AsyncWhatsAppService
 from pywce.src.templates import ButtonTemplate, EngineTemplate, ButtonMessage, EngineRoute, FlowTemplate, \
     RequestLocationTemplate, MediaTemplate, CtaTemplate, TemplateTemplate, ProductTemplate, \
     MultiProductTemplate
@@ -15,6 +17,10 @@ from pywce.src.utils.engine_util import EngineUtil
 
 logger = logging.getLogger(__name__)
 
+# engine exceptions the worker responds to, anything else propagates to the caller
+_HANDLED_EXCEPTIONS = (TemplateRenderException, EngineResponseException, EngineSessionException,
+                       EngineInternalException)
+
 
 class Worker:
     """
@@ -28,24 +34,43 @@ class Worker:
         self.job = job
         self.payload = job.payload
         self.user = job.user
+        self.storage = job.storage or job.engine_config.storage_manager
         self.session_id = self.user.wa_id
-        self.session: ISessionManager = self.job.engine_config.session_manager.session(self.session_id)
+        self.session: ISessionManager = job.session or TracedSessionManager.wrap(
+            self.job.engine_config.session_manager.session(self.session_id))
+
+        # loaded once an accepted message is checked, shared with the message processor & whatsapp service
+        # and saved once after processing
+        self.state: Optional[EngineState] = None
 
-    def _get_message_queue(self) -> List:
-        return self.session.get(session_id=self.session_id, key=SessionConstants.MESSAGE_HISTORY) or []
+    def _save_state(self) -> None:
+        if self.state is not None:
+            self.state.save(self.session, self.session_id)
 
-    def _append_message_to_queue(self):
-        queue = self._get_message_queue()
-        queue.append(self.user.msg_id)
+    def _is_duplicate(self, state: EngineState) -> bool:
+        """
+        check the message history kept in the engine state, without recording the message
+
+        A configured `message_dedupe` checks & records in one atomic step, see `_record_message`
+        """
+        if self.job.engine_config.message_dedupe is not None:
+            return False
 
-        if len(queue) > EngineConstants.MESSAGE_QUEUE_COUNT:
-            queue = queue[-EngineConstants.MESSAGE_QUEUE_COUNT:]
+        return state.history is not None and self.user.msg_id in state.history
+
+    def _record_message(self, state: EngineState) -> bool:
+        """
+        record the message id once the message is accepted, a debounced message is not recorded
+        so its redelivery is processed
+
+        :return: False if a configured `message_dedupe` had already seen it
+        """
+        dedupe = self.job.engine_config.message_dedupe
 
-        self.session.save(session_id=self.session_id, key=SessionConstants.MESSAGE_HISTORY, data=queue)
+        if dedupe is None:
+            return state.remember(self.user.msg_id)
 
-    def _exists_in_queue(self) -> bool:
-        queue_history = self._get_message_queue()
-        return self.user.msg_id in list(set(queue_history))
+        return dedupe.seen(self.session, self.session_id, self.user.msg_id) is False
 
     def _is_old_webhook(self) -> bool:
         webhook_time = datetime.fromtimestamp(float(self.user.timestamp))
@@ -69,10 +94,10 @@ class Worker:
         if not self.job.engine_config.handle_session_inactivity: return False
 
         is_auth_set = self.session.get(session_id=self.session_id, key=SessionConstants.VALID_AUTH_SESSION)
-        last_active = self.session.get(session_id=self.session_id, key=SessionConstants.LAST_ACTIVITY_AT)
 
         if is_auth_set is not None:
-            return EngineUtil.has_interaction_expired(last_active, self.job.engine_config.inactivity_timeout_min)
+            return EngineUtil.has_interaction_expired(self.state.last_activity_s,
+                                                      self.job.engine_config.inactivity_timeout_min)
         return False
 
     def _checkpoint_handler(self, routes: List[EngineRoute], user_input: str = None,
@@ -92,7 +117,7 @@ class Worker:
         """
 
         _input = user_input or ''
-        checkpoint = self.session.get(session_id=self.session_id, key=SessionConstants.LATEST_CHECKPOINT)
+        checkpoint = self.state.checkpoint
         dynamic_retry = self.session.get(session_id=self.session_id, key=SessionConstants.DYNAMIC_RETRY)
 
         route_has_retry_input = False
@@ -109,7 +134,10 @@ class Worker:
 
         return should_reroute_to_checkpoint
 
-    def _next_route_handler(self, msg_processor: MessageProcessor) -> str:
+    def _early_route(self, msg_processor: MessageProcessor) -> Optional[str]:
+        """
+        Routes resolved before the dynamic `router` hook is consulted
+        """
         _user_input = msg_processor.USER_INPUT[0]
 
         if msg_processor.IS_FIRST_TIME: return self.job.engine_config.start_template_stage
@@ -118,18 +146,21 @@ class Worker:
             raise EngineSessionException(
                 message="You have been inactive for a while. Let's start afresh")
 
-        # get possible next common configured on templates
-        current_template_routes = msg_processor.CURRENT_TEMPLATE.routes
-
         # check for next route in last checkpoint
-        if self._checkpoint_handler(current_template_routes, _user_input,
+        if self._checkpoint_handler(msg_processor.CURRENT_TEMPLATE.routes, _user_input,
                                     msg_processor.IS_FROM_TRIGGER):
-            return self.session.get(session_id=self.session_id, key=SessionConstants.LATEST_CHECKPOINT)
+            return self.state.checkpoint
 
-        # check for next route in configured dynamic route if any
-        _has_dynamic_route = msg_processor.process_dynamic_route_hook()
-        if _has_dynamic_route is not None:
-            return _has_dynamic_route
+        return None
+
+    def _static_route(self, msg_processor: MessageProcessor) -> str:
+        """
+        Routes resolved from triggers & configured templates routes
+        """
+        _user_input = msg_processor.USER_INPUT[0]
+
+        # get possible next common configured on templates
+        current_template_routes = msg_processor.CURRENT_TEMPLATE.routes
 
         # if from trigger, prioritize triggered stage
         if msg_processor.IS_FROM_TRIGGER:
@@ -155,6 +186,18 @@ class Worker:
         # at this point, user provided an invalid response then
         raise EngineResponseException(message="Invalid response, please try again", data=msg_processor.CURRENT_STAGE)
 
+    def _next_route_handler(self, msg_processor: MessageProcessor) -> str:
+        _early_route = self._early_route(msg_processor)
+        if _early_route is not None:
+            return _early_route
+
+        # check for next route in configured dynamic route if any
+        _has_dynamic_route = msg_processor.process_dynamic_route_hook()
+        if _has_dynamic_route is not None:
+            return _has_dynamic_route
+
+        return self._static_route(msg_processor)
+
     def _hook_next_template_handler(self, msg_processor: MessageProcessor) -> Tuple[str, EngineTemplate]:
         """
         Handle next templates to render to user
@@ -171,13 +214,20 @@ class Worker:
 
         logger.debug("Determined next template stage: %s", next_template_stage)
 
-        next_template = self.job.engine_config.storage_manager.get(next_template_stage)
+        next_template = self.storage.get(next_template_stage)
 
         self._check_authentication(next_template)
         msg_processor.process_pre_hooks(next_template)
 
         return next_template_stage, next_template
 
+    def _quick_btn_service_model(self, btn_template: ButtonTemplate) -> WhatsAppServiceModel:
+        return WhatsAppServiceModel(
+            config=self.job.engine_config,
+            template=btn_template,
+            hook_arg=HookArg(user=self.user, session_id=self.user.wa_id, user_input=None)
+        )
+
     def send_quick_btn_message(self, btn_template: ButtonTemplate):
         """
         Helper method to send a quick button to the user
@@ -186,13 +236,7 @@ class Worker:
         """
         _client = self.job.engine_config.whatsapp
 
-        service_model = WhatsAppServiceModel(
-            config=self.job.engine_config,
-            template=btn_template,
-            hook_arg=HookArg(user=self.user, session_id=self.user.wa_id, user_input=None)
-        )
-
-        whatsapp_service = WhatsAppService(model=service_model)
+        whatsapp_service = WhatsAppService(model=self._quick_btn_service_model(btn_template))
         response = whatsapp_service.send_message(handle_session=False, template=False)
 
         response_msg_id = _client.util.get_response_message_id(response)
@@ -202,7 +246,7 @@ class Worker:
         return response_msg_id
 
     def _runner(self):
-        processor = MessageProcessor(data=self.job)
+        processor = MessageProcessor(data=self.job, state=self.state)
         processor.setup()
 
         next_stage, next_template = self._hook_next_template_handler(processor)
@@ -213,7 +257,8 @@ class Worker:
             config=self.job.engine_config,
             template=next_template,
             next_stage=next_stage,
-            hook_arg=processor.HOOK_ARG
+            hook_arg=processor.HOOK_ARG,
+            state=self.state
         )
 
         whatsapp_service = WhatsAppService(model=service_model)
@@ -221,52 +266,64 @@ class Worker:
 
         processor.IS_FROM_TRIGGER = False
 
-    def work(self):
+    def _should_process(self) -> bool:
         """
-        Handles every webhook request
+        Run all pre-processing checks on the webhook request.
 
-        :return: None
-        """
+        Loads the engine state, records the message id for duplicate detection & tracks debounce
+        on it if request is accepted, the state is saved by `work`
 
+        :return: True if request should be processed
+        """
         if self._is_old_webhook():
             logger.warning("Skipping old webhook request. %s Discarding...", self.payload.body)
-            return
+            return False
 
         if self.job.payload.typ == client.MessageTypeEnum.UNKNOWN or \
                 self.job.payload.typ == client.MessageTypeEnum.UNSUPPORTED:
             logger.warning("Received unknown | unsupported message: %s", self.user.wa_id)
-            return
+            return False
+
+        state = EngineState.load(self.session, self.session_id)
+        handle_queue = self.job.engine_config.handle_session_queue
 
-        if self.job.engine_config.handle_session_queue:
-            if self._exists_in_queue():
-                logger.warning("Duplicate message found: %s", self.payload.body)
-                return
+        if handle_queue and self._is_duplicate(state):
+            logger.warning("Duplicate message found: %s", self.payload.body)
+            return False
 
-        last_debounce_timestamp = self.session.get(session_id=self.session_id, key=SessionConstants.CURRENT_DEBOUNCE)
+        last_debounce_timestamp = state.debounce_ms
         current_time = int(time() * 1000)
         no_debounce = last_debounce_timestamp is None or \
                       current_time - last_debounce_timestamp >= self.job.engine_config.debounce_timeout_ms
 
-        if no_debounce is True:
-            self.session.save(session_id=self.session_id, key=SessionConstants.CURRENT_DEBOUNCE, data=current_time)
-
-        else:
+        if no_debounce is False:
             logger.warning("Message ignored due to debounce..")
-            return
+            return False
 
-        if self.job.engine_config.handle_session_queue:
-            self._append_message_to_queue()
+        if handle_queue and self._record_message(state) is False:
+            logger.warning("Duplicate message found: %s", self.payload.body)
+            return False
 
-        try:
-            self._runner()
+        state.debounce_ms = current_time
+        self.state = state
+
+        return True
 
-            self.session.evict(session_id=self.session_id, key=SessionConstants.DYNAMIC_RETRY)
-            self.session.save(session_id=self.session_id, key=SessionConstants.CURRENT_MSG_ID, data=self.user.msg_id)
+    def _on_processed(self) -> None:
+        self.state.msg_id = self.user.msg_id
+        self.session.evict(session_id=self.session_id, key=SessionConstants.DYNAMIC_RETRY)
+
+    def _on_error(self, e: EngineException) -> Optional[ButtonTemplate]:
+        """
+        Handle a processing error
 
-        except TemplateRenderException as e:
+        :param e: the raised engine exception
+        :return: quick button template to respond with, if any
+        """
+        if isinstance(e, TemplateRenderException):
             logger.error("Failed to render templates: %s", e.message)
 
-            btn = ButtonTemplate(
+            return ButtonTemplate(
                 message=ButtonMessage(
                     title="Message",
                     body="Failed to process message",
@@ -275,14 +332,10 @@ class Worker:
                 routes=[]
             )
 
-            self.send_quick_btn_message(btn_template=btn)
-
-            return
-
-        except HookException as e:
+        if isinstance(e, HookException):
             logger.error("HookException exc, message: %s, data: %s", e.message, e.data)
 
-            btn = ButtonTemplate(
+            return ButtonTemplate(
                 message=ButtonMessage(
                     title="Message",
                     body=e.message,
@@ -291,14 +344,10 @@ class Worker:
                 routes=[]
             )
 
-            self.send_quick_btn_message(btn_template=btn)
-
-            return
-
-        except EngineResponseException as e:
+        if isinstance(e, EngineResponseException):
             logger.error("EngineResponse exc, message: %s, data: %s", e.message, e.data)
 
-            btn = ButtonTemplate(
+            return ButtonTemplate(
                 message=ButtonMessage(
                     title="Invalid input",
                     body=f"{e.message}\n\nYou may click the buttons below to change options",
@@ -308,15 +357,11 @@ class Worker:
                 routes=[]
             )
 
-            self.send_quick_btn_message(btn_template=btn)
-
-            return
-
-        except UserSessionValidationException as e:
+        if isinstance(e, UserSessionValidationException):
             logger.error("Ambiguous session mismatch encountered with %s", self.user.wa_id)
             logger.error("%s", e.message)
 
-            btn = ButtonTemplate(
+            return ButtonTemplate(
                 message=ButtonMessage(
                     title="Message",
                     body="Failed to understand something on my end.\n\nCould not process message.",
@@ -325,17 +370,14 @@ class Worker:
                 routes=[]
             )
 
-            self.send_quick_btn_message(btn_template=btn)
-
-            return
-
-        except EngineSessionException as e:
+        if isinstance(e, EngineSessionException):
             logger.error("Session expired | inactive for: %s. Clearing data", self.user.wa_id)
 
             # TODO: may want to delegate this call to the user
             self.session.clear(session_id=self.user.wa_id)
+            self.state = None
 
-            btn = ButtonTemplate(
+            return ButtonTemplate(
                 message=ButtonMessage(
                     title="Security Check 🔐",
                     body=e.message,
@@ -345,10 +387,122 @@ class Worker:
                 routes=[]
             )
 
-            self.send_quick_btn_message(btn_template=btn)
+        logger.error("Message: %s, data: %s", e.message, e.data, exc_info=True)
+        return None
+
+    def work(self):
+        """
+        Handles every webhook request
+
+        :return: True if the message was processed, False if skipped as duplicate, stale or debounced
+        """
+        if not self._should_process():
+            return False
+
+        try:
+            self._runner()
+            self._on_processed()
+
+        except _HANDLED_EXCEPTIONS as e:
+            btn = self._on_error(e)
+
+            if btn is not None:
+                self.send_quick_btn_message(btn_template=btn)
+
+        finally:
+            # one write of the engine state per message
+            self._save_state()
+
+        return True
+
+
+class AsyncWorker(Worker):
+    """
+        asyncio engine worker
+
+        same flow as [Worker] but awaits all hooks & outbound WhatsApp requests
+        so many conversations can be processed concurrently on one event loop
+    """
+
+    async def _next_route_handler(self, msg_processor: AsyncMessageProcessor) -> str:
+        _early_route = self._early_route(msg_processor)
+        if _early_route is not None:
+            return _early_route
+
+        _has_dynamic_route = await msg_processor.process_dynamic_route_hook()
+        if _has_dynamic_route is not None:
+            return _has_dynamic_route
+
+        return self._static_route(msg_processor)
+
+    async def _hook_next_template_handler(self, msg_processor: AsyncMessageProcessor) -> Tuple[str, EngineTemplate]:
+        if self.session.get(session_id=self.session_id, key=SessionConstants.DYNAMIC_RETRY) is None:
+            await msg_processor.process_post_hooks()
+
+        next_template_stage = await self._next_route_handler(msg_processor)
+
+        logger.debug("Determined next template stage: %s", next_template_stage)
+
+        next_template = self.storage.get(next_template_stage)
+
+        self._check_authentication(next_template)
+        await msg_processor.process_pre_hooks(next_template)
+
+        return next_template_stage, next_template
+
+    async def send_quick_btn_message(self, btn_template: ButtonTemplate):
+        _client = self.job.engine_config.whatsapp
+
+        whatsapp_service = AsyncWhatsAppService(model=self._quick_btn_service_model(btn_template))
+        response = await whatsapp_service.send_message(handle_session=False, template=False)
+
+        response_msg_id = _client.util.get_response_message_id(response)
+
+        logger.debug("Quick button message responded with id: %s", response_msg_id)
+
+        return response_msg_id
+
+    async def _runner(self):
+        processor = AsyncMessageProcessor(data=self.job, state=self.state)
+        await processor.setup()
+
+        next_stage, next_template = await self._hook_next_template_handler(processor)
+
+        logger.debug("Next template stage: %s", next_stage)
+
+        service_model = WhatsAppServiceModel(
+            config=self.job.engine_config,
+            template=next_template,
+            next_stage=next_stage,
+            hook_arg=processor.HOOK_ARG,
+            state=self.state
+        )
+
+        whatsapp_service = AsyncWhatsAppService(model=service_model)
+        await whatsapp_service.send_message()
+
+        processor.IS_FROM_TRIGGER = False
+
+    async def work(self):
+        """
+        Handles every webhook request
+
+        :return: True if the message was processed, False if skipped as duplicate, stale or debounced
+        """
+        if not self._should_process():
+            return False
+
+        try:
+            await self._runner()
+            self._on_processed()
+
+        except _HANDLED_EXCEPTIONS as e:
+            btn = self._on_error(e)
+
+            if btn is not None:
+                await self.send_quick_btn_message(btn_template=btn)
 
-            return
+        finally:
+            self._save_state()
 
-        except EngineInternalException as e:
-            logger.error("Message: %s, data: %s", e.message, e.data, exc_info=True)
-            return
+        return True
@@ -28,10 +28,14 @@ EngineTemplate = Annotated[
     Field(discriminator="kind"),
 ]
 
+# building the union validator is expensive, build it once
+_TEMPLATE_ADAPTER = TypeAdapter(EngineTemplate)
+
+
 class Template:
     @staticmethod
     def as_model(template: dict) -> EngineTemplate:
-        return TypeAdapter(EngineTemplate).validate_python(template)
+        return _TEMPLATE_ADAPTER.validate_python(template)
 
     @staticmethod
     def as_dict(template: EngineTemplate) -> dict:
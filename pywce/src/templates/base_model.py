@@ -1,27 +1,35 @@
 from typing import Dict, Optional, Any, List, Union
 
-from pydantic import BaseModel, Field, field_validator, model_serializer
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_serializer
 
 from pywce.src.constants import TemplateConstants, EngineConstants
 
 
 # Define the EngineRoute model
 class EngineRoute(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     user_input: Union[int, str]
     next_stage: str
     is_regex: Optional[bool] = None
 
 
 class SectionRowItem(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     identifier: Union[int, str]
     title: str
     description: Optional[str] = None
 
 class ListSection(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     title: str
     rows: List[SectionRowItem]
 
 class ProductsListSection(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     title: str
     products: List[str]
 
@@ -30,13 +38,16 @@ class ProductsListSection(BaseModel):
 # Base Message Model (for each templates type inner message)
 # ----------
 class BaseMessage(BaseModel):
-    pass
+    model_config = ConfigDict(frozen=True)
 
 
 # ----------
 # Template Models (with type-specific subclasses)
 # ----------
 class BaseTemplate(BaseModel):
+    # validated once & shared by every message, see `TemplateRegistry`
+    model_config = ConfigDict(frozen=True)
+
     kind: str = Field(..., alias=TemplateConstants.TEMPLATE_TYPE)
     routes: List[EngineRoute]
 
@@ -1,7 +1,8 @@
 import logging
 import re
 from datetime import datetime
-from typing import Any, Dict
+from time import time
+from typing import Any, Dict, Union
 
 from jinja2 import Template
 
@@ -45,19 +46,27 @@ class EngineUtil:
             raise TemplateRenderException(message="Template failed to render")
 
     @staticmethod
-    def has_session_expired(session_dt_str: str = None) -> bool:
+    def to_epoch(value: Union[str, int, float]) -> float:
+        """
+        epoch seconds from an epoch number or an ISO 8601 string
+        """
+        if isinstance(value, str):
+            return datetime.fromisoformat(value).timestamp()
+        return float(value)
+
+    @staticmethod
+    def has_session_expired(session_dt_str: Union[str, int, float] = None) -> bool:
         if session_dt_str is None: return True
 
-        passed_datetime = datetime.fromisoformat(session_dt_str)
-        return datetime.now() > passed_datetime
+        return time() > EngineUtil.to_epoch(session_dt_str)
 
     @staticmethod
-    def has_interaction_expired(last_interaction_time: str, max_interaction_in_mins: int):
+    def has_interaction_expired(last_interaction_time: Union[str, int, float], max_interaction_in_mins: int):
         """
         Checks if the interaction has expired based on the last interaction time and max allowed duration.
 
         Args:
-            last_interaction_time (str): The last interaction time as an ISO 8601 string.
+            last_interaction_time (str | float): The last interaction time as epoch seconds or an ISO 8601 string.
             max_interaction_in_mins (int): The maximum interaction duration in minutes.
 
         Returns:
@@ -66,9 +75,7 @@ class EngineUtil:
         if last_interaction_time is None:
             return False
 
-        last_interaction = datetime.fromisoformat(last_interaction_time)
-        current_time = datetime.now()
-        elapsed_minutes = abs((current_time - last_interaction).total_seconds() / 60)
+        elapsed_minutes = abs(time() - EngineUtil.to_epoch(last_interaction_time)) / 60
         return elapsed_minutes > max_interaction_in_mins
 
     @staticmethod
@@ -1,3 +1,5 @@
+import asyncio
+import inspect
 import logging
 from typing import Optional, Callable
 
@@ -17,6 +19,17 @@ class HookUtil:
 
         return HookService.process_hook(hook_dotted_path=hook, hook_arg=arg)
 
+    @staticmethod
+    async def process_hook_async(hook: str, arg: HookArg, external: Optional[Callable] = None) -> HookArg:
+        arg.hook = hook
+
+        if hook.startswith(EngineConstants.EXT_HOOK_PROCESSOR_PLACEHOLDER) and external is not None:
+            if inspect.iscoroutinefunction(external):
+                return await external(arg)
+            return await asyncio.to_thread(external, arg)
+
+        return await HookService.process_hook_async(hook_dotted_path=hook, hook_arg=arg)
+
     @staticmethod
     def run_listener(listener: Optional[Callable] = None, arg: Optional[HookArg] = None) -> None:
         try:
@@ -0,0 +1,178 @@
+import threading
+import time
+import unittest
+from collections import defaultdict
+from pathlib import Path
+from types import SimpleNamespace
+
+from pywce import AdmissionController, Engine, EngineConfig, ShedPolicy, client, storage
+
+
+def _webhook(wa_id: str, seq: int, age_s: int = 0) -> dict:
+    return {
+        "entry": [{"changes": [{"value": {
+            "messaging_product": "whatsapp",
+            "contacts": [{"profile": {"name": "Test"}, "wa_id": wa_id}],
+            "messages": [{"from": wa_id, "id": f"wamid.{wa_id}.{seq}", "timestamp": str(int(time.time()) - age_s),
+                          "type": "text", "text": {"body": str(seq)}}]
+        }}]}]
+    }
+
+
+class _FakeWhatsApp:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, recipient_id: str, message: str):
+        self.sent.append((recipient_id, message))
+
+
+class _RecordingWhatsApp(client.WhatsApp):
+    def __init__(self):
+        super().__init__(client.WhatsAppConfig(token="token", phone_number_id="123", hub_verification_token="hub"))
+        self.sent = []
+
+    def _send_request(self, message_type, recipient_id, data):
+        self.sent.append((message_type, recipient_id, data))
+        return {"messages": [{"id": "wamid.out"}]}
+
+
+class _FakeEngine:
+    def __init__(self):
+        self.config = SimpleNamespace(webhook_timestamp_threshold_s=10)
+        self.whatsapp = _FakeWhatsApp()
+        self.seen = defaultdict(list)
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def process_webhook(self, webhook_data):
+        self.gate.wait()
+        message = client.WebhookEnvelope.of(webhook_data).raw_message
+        self.seen[message["from"]].append(int(message["text"]["body"]))
+
+
+class TestAdmissionController(unittest.TestCase):
+    def test_per_user_order_is_kept(self):
+        engine = _FakeEngine()
+        controller = AdmissionController(engine, workers=4, max_per_user=50)
+        controller.start()
+
+        for seq in range(20):
+            for user in range(5):
+                self.assertTrue(controller.submit(_webhook(f"2637700000{user}", seq)))
+
+        controller.stop()
+
+        for order in engine.seen.values():
+            self.assertEqual(list(range(20)), order)
+        self.assertEqual(100, controller.stats().processed)
+
+    def test_per_user_cap_sheds_and_replies_busy(self):
+        engine = _FakeEngine()
+        controller = AdmissionController(engine, max_per_user=2, policy=ShedPolicy.REJECT,
+                                         busy_message="busy")
+
+        results = [controller.submit(_webhook("263770000001", seq)) for seq in range(4)]
+        self.assertEqual([True, True, False, False], results)
+
+        # another user still has room
+        self.assertTrue(controller.submit(_webhook("263770000002", 0)))
+
+        controller.start()
+        controller.stop()
+
+        stats = controller.stats()
+        self.assertEqual(3, stats.admitted)
+        self.assertEqual(2, stats.shed)
+        self.assertEqual([0, 1], engine.seen["263770000001"])
+        # one busy reply per interval
+        self.assertEqual([("263770000001", "busy")], engine.whatsapp.sent)
+
+    def test_busy_reply_sends_template(self):
+        fixtures = Path(__file__).parent / "fixtures"
+        whatsapp = _RecordingWhatsApp()
+        engine = Engine(EngineConfig(
+            whatsapp=whatsapp,
+            start_template_stage="START-MENU",
+            report_template_stage="REPORT",
+            storage_manager=storage.YamlJsonStorageManager(str(fixtures / "templates"), str(fixtures / "triggers"))
+        ))
+
+        with self.assertRaises(AssertionError):
+            AdmissionController(engine, busy_template="NOT-A-TEMPLATE")
+
+        controller = AdmissionController(engine, max_queue_size=0, policy=ShedPolicy.REJECT,
+                                         busy_message="busy", busy_template="START-MENU")
+        controller.start()
+
+        self.assertFalse(controller.submit(_webhook("263770000001", 0)))
+        controller.stop()
+
+        self.assertEqual(1, len(whatsapp.sent))
+        message_type, recipient_id, data = whatsapp.sent[0]
+        self.assertEqual("263770000001", recipient_id)
+        self.assertEqual("interactive", data["type"])
+        self.assertEqual("Test body", data["interactive"]["body"]["text"])
+
+    def test_batched_webhook_is_admitted_per_sender(self):
+        engine = _FakeEngine()
+        controller = AdmissionController(engine, max_per_user=1, policy=ShedPolicy.REJECT, busy_message="busy")
+
+        batch = _webhook("263770000001", 0)
+        batch["entry"] += _webhook("263770000002", 0)["entry"] + _webhook("263770000001", 1)["entry"]
+
+        self.assertFalse(controller.submit(batch))
+
+        controller.start()
+        controller.stop()
+
+        self.assertEqual({"263770000001": [0], "263770000002": [0]}, dict(engine.seen))
+        self.assertEqual(1, controller.stats().shed)
+        self.assertEqual([("263770000001", "busy")], engine.whatsapp.sent)
+
+    def test_drop_oldest(self):
+        engine = _FakeEngine()
+        controller = AdmissionController(engine, max_per_user=2, policy=ShedPolicy.DROP_OLDEST)
+
+        for seq in range(4):
+            self.assertTrue(controller.submit(_webhook("263770000001", seq)))
+
+        controller.start()
+        controller.stop()
+
+        self.assertEqual([2, 3], engine.seen["263770000001"])
+        self.assertEqual(2, controller.stats().shed)
+
+    def test_drop_stale_makes_room(self):
+        engine = _FakeEngine()
+        controller = AdmissionController(engine, max_queue_size=2, policy=ShedPolicy.DROP_STALE)
+
+        self.assertTrue(controller.submit(_webhook("263770000001", 0, age_s=60)))
+        self.assertTrue(controller.submit(_webhook("263770000002", 0, age_s=60)))
+        self.assertTrue(controller.submit(_webhook("263770000003", 0)))
+
+        controller.start()
+        controller.stop()
+
+        stats = controller.stats()
+        self.assertEqual(2, stats.expired)
+        self.assertEqual(0, stats.shed)
+        self.assertEqual({"263770000003": [0]}, dict(engine.seen))
+
+    def test_stale_messages_expire_in_queue(self):
+        engine = _FakeEngine()
+        controller = AdmissionController(engine, policy=ShedPolicy.REJECT)
+
+        controller.submit(_webhook("263770000001", 0, age_s=60))
+        controller.submit(_webhook("263770000001", 1))
+
+        controller.start()
+        controller.stop()
+
+        stats = controller.stats()
+        self.assertEqual(1, stats.expired)
+        self.assertEqual(1, stats.processed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import unittest
+from collections import Counter
+from pathlib import Path
+
+from httpx import AsyncClient, MockTransport, Response
+
+from pywce import Engine, EngineConfig, DefaultSessionManager, EngineState, AsyncSessionAdapter, \
+    SyncSessionAdapter, client, storage
+from tests.test_engine_async import _webhook
+from tests.test_session_manager import TestSessionManager
+
+
+class CountingAsyncSessionManager(AsyncSessionAdapter):
+    def __init__(self):
+        super().__init__(DefaultSessionManager())
+        self.calls = Counter()
+
+    async def _run(self, fn, *args):
+        self.calls[fn.__name__] += 1
+        return await super()._run(fn, *args)
+
+
+class TestSyncSessionAdapter(TestSessionManager):
+    """
+        full session manager contract through both adapters, sync -> async -> sync
+    """
+
+    def setUp(self):
+        self.init_session = DefaultSessionManager()
+        self.adapter = SyncSessionAdapter(AsyncSessionAdapter(self.init_session))
+        self.test_session_id = "test_session"
+        self.session_manager = self.adapter.session(self.test_session_id)
+
+    def tearDown(self):
+        self.adapter.close()
+
+
+class TestAsyncSessionAdapter(unittest.TestCase):
+    def test_calls_run_off_the_loop(self):
+        manager = DefaultSessionManager()
+
+        async def run():
+            session = await AsyncSessionAdapter(manager).session("1")
+            await asyncio.gather(session.save("1", "a", 1), session.save_prop("1", "name", "pywce"))
+            return await session.fetch_all("1")
+
+        self.assertEqual({"a": 1, manager.prop_key: {"name": "pywce"}}, asyncio.run(run()))
+
+    def test_own_loop_is_rejected(self):
+        adapter = SyncSessionAdapter(AsyncSessionAdapter(DefaultSessionManager()))
+
+        async def call_from_loop():
+            return adapter.get("1", "key")
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run_coroutine_threadsafe(call_from_loop(), adapter.loop).result(5)
+
+        adapter.close()
+
+    def test_engine_awaits_async_manager(self):
+        fixtures = Path(__file__).parent / "fixtures"
+        async_manager = CountingAsyncSessionManager()
+        sync_manager = SyncSessionAdapter(async_manager)
+
+        engine = Engine(EngineConfig(
+            whatsapp=client.AsyncWhatsApp(
+                client.WhatsAppConfig(token="token", phone_number_id="123", hub_verification_token="hub"),
+                http_client=AsyncClient(transport=MockTransport(lambda r: Response(200, json={"messages": [{"id": "1"}]})))
+            ),
+            start_template_stage="START-MENU",
+            report_template_stage="REPORT",
+            storage_manager=storage.YamlJsonStorageManager(str(fixtures / "templates"), str(fixtures / "triggers")),
+            session_manager=sync_manager,
+            session_unit_of_work=True
+        ))
+
+        asyncio.run(engine.process_webhook_async(json.dumps(_webhook("263770000001", "wamid.in1", "hi"))))
+
+        self.assertEqual("START-MENU", EngineState.load(async_manager.manager, "263770000001").current_stage)
+        self.assertEqual({"session": 1, "fetch_all": 1, "save_all": 1}, dict(async_manager.calls))
+        sync_manager.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+
+from benchmarks.graph_api import GraphApiStub
+from benchmarks.payloads import WebhookGenerator
+from benchmarks.sessions import run_contention, run_throughput, run_restore
+from benchmarks.templates import run_lookup, run_load, run_startup, run_parse
+from pywce import client
+
+
+class TestBenchmarkHarness(unittest.TestCase):
+    def test_generated_payload_kinds(self):
+        generator = WebhookGenerator()
+        envelopes = [client.WebhookEnvelope.of(generator.to_bytes(p)) for p in generator.mixed("263770000001")]
+
+        self.assertEqual([
+            client.MessageTypeEnum.TEXT,
+            client.MessageTypeEnum.INTERACTIVE_BUTTON,
+            client.MessageTypeEnum.INTERACTIVE_LIST,
+            client.MessageTypeEnum.INTERACTIVE_FLOW,
+            client.MessageTypeEnum.IMAGE,
+            client.MessageTypeEnum.LOCATION,
+        ], [e.message.typ for e in envelopes[:-1]])
+
+        self.assertTrue(envelopes[-1].is_status)
+        self.assertEqual(3, len(envelopes[-1].statuses))
+        self.assertEqual(6, len({e.user.msg_id for e in envelopes[:-1]}))
+
+    def test_graph_api_stub(self):
+        with GraphApiStub(keep=True) as stub:
+            whatsapp = client.WhatsApp(stub.whatsapp_config())
+            response = whatsapp.send_message(recipient_id="263770000001", message="hi")
+
+        self.assertEqual("wamid.out.1", whatsapp.util.get_response_message_id(response))
+        self.assertEqual("263770000001", stub.received[0]["to"])
+
+    def test_session_contention(self):
+        results = run_contention(threads=2, users_per_thread=3, messages=50)
+
+        self.assertEqual(["single-lock", "striped", "single-lock+bounded", "striped+bounded"],
+                         [r.manager for r in results])
+        self.assertEqual({2 * 50 * 8}, {r.ops for r in results})
+
+    def test_session_throughput(self):
+        results = run_throughput(threads=2, users_per_thread=3, messages=20)
+
+        self.assertEqual(["default", "journaled", "redis", "redis+near-cache"], [r.manager for r in results])
+
+    def test_session_restore(self):
+        results = run_restore(sessions=100)
+
+        self.assertEqual(["snapshot", "restore"], [r.manager for r in results])
+        self.assertEqual({100}, {r.ops for r in results})
+
+    def test_template_lookup(self):
+        results = run_lookup(messages=40)
+
+        self.assertEqual(["adapter-per-get", "validate-per-get", "model-cache"], [r.mode for r in results])
+        self.assertEqual([2, 40, 40], [r.ops for r in results])
+
+    def test_template_load(self):
+        results = run_load(rounds=2)
+
+        self.assertEqual(["yaml-json", "bundle+checksum", "bundle"], [r.mode for r in results])
+
+    def test_template_startup(self):
+        results = run_startup(templates=20, lookups=5, memory=True)
+
+        self.assertEqual(["yaml-json", "lazy", "lazy first-get"], [r.mode for r in results])
+        self.assertEqual([20, 20, 5], [r.ops for r in results])
+        self.assertTrue(all(r.kib > 0 for r in results))
+
+    def test_template_parse(self):
+        results = run_parse(templates=20)
+
+        self.assertEqual("workers=1", results[0].mode)
+        self.assertTrue(all(r.ops == 20 for r in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import time
+import unittest
+from pathlib import Path
+
+from httpx import AsyncClient, MockTransport, Response
+
+from benchmarks.redis_stub import RedisStub
+from pywce import Engine, EngineConfig, DefaultSessionManager, GlobalMessageDedupe, \
+    RedisMessageDedupe, client, storage
+from pywce.modules.session.dedupe import MessageHistory
+from tests.test_engine_async import _webhook
+
+
+class TestMessageDedupe(unittest.TestCase):
+    def test_message_history_is_bounded(self):
+        history = MessageHistory(3, ["a", "b"])
+
+        self.assertFalse(history.add("a"))
+        self.assertTrue(history.add("c"))
+        self.assertTrue(history.add("d"))
+
+        self.assertEqual(3, len(history))
+        self.assertNotIn("a", history)
+        self.assertIn("d", history)
+
+    def test_global_dedupe_window(self):
+        dedupe = GlobalMessageDedupe(window_s=0.1, buckets=2)
+
+        self.assertFalse(dedupe.seen(None, "1", "wamid.1"))
+        self.assertTrue(dedupe.seen(None, "2", "wamid.1"))
+
+        time.sleep(0.2)
+        self.assertFalse(dedupe.seen(None, "1", "wamid.1"))
+
+    def test_redis_dedupe(self):
+        with RedisStub() as server:
+            dedupe = RedisMessageDedupe(server.client(), ttl_s=60)
+
+            self.assertFalse(dedupe.seen(None, "1", "wamid.1"))
+            self.assertTrue(dedupe.seen(None, "1", "wamid.1"))
+            self.assertFalse(dedupe.seen(None, "1", "wamid.2"))
+
+            dedupe.client.close()
+
+    @staticmethod
+    def _engine(sent: list, message_dedupe=None, debounce_timeout_ms: int = 0) -> Engine:
+        fixtures = Path(__file__).parent / "fixtures"
+
+        def handler(request):
+            sent.append(request)
+            return Response(200, json={"messages": [{"id": "wamid.out"}]})
+
+        return Engine(EngineConfig(
+            whatsapp=client.AsyncWhatsApp(
+                client.WhatsAppConfig(token="token", phone_number_id="123", hub_verification_token="hub"),
+                http_client=AsyncClient(transport=MockTransport(handler))
+            ),
+            start_template_stage="START-MENU",
+            report_template_stage="REPORT",
+            storage_manager=storage.YamlJsonStorageManager(str(fixtures / "templates"), str(fixtures / "triggers")),
+            session_manager=DefaultSessionManager(),
+            message_dedupe=message_dedupe,
+            debounce_timeout_ms=debounce_timeout_ms
+        ))
+
+    def test_engine_skips_duplicates(self):
+        sent = []
+        engine = self._engine(sent, message_dedupe=GlobalMessageDedupe())
+
+        payload = json.dumps(_webhook("263770000001", "wamid.in1", "hi"))
+
+        asyncio.run(engine.process_webhook_async(payload))
+        asyncio.run(engine.process_webhook_async(payload))
+
+        self.assertEqual(1, len(sent))
+
+    def test_debounced_message_redelivery_is_processed(self):
+        for dedupe in [None, GlobalMessageDedupe()]:
+            with self.subTest(dedupe=dedupe):
+                sent = []
+                engine = self._engine(sent, message_dedupe=dedupe, debounce_timeout_ms=100)
+
+                first = json.dumps(_webhook("263770000001", "wamid.in1", "hi"))
+                debounced = json.dumps(_webhook("263770000001", "wamid.in2", "hi"))
+
+                asyncio.run(engine.process_webhook_async(first))
+                asyncio.run(engine.process_webhook_async(debounced))
+                self.assertEqual(1, len(sent))
+
+                # WhatsApp redelivers the debounced message once the debounce window has passed
+                time.sleep(0.15)
+                asyncio.run(engine.process_webhook_async(debounced))
+                self.assertEqual(2, len(sent))
+
+                asyncio.run(engine.process_webhook_async(debounced))
+                time.sleep(0.15)
+                asyncio.run(engine.process_webhook_async(debounced))
+                self.assertEqual(2, len(sent))
+
+
+if __name__ == "__main__":
+    unittest.main()
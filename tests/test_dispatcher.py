@@ -0,0 +1,145 @@
+import asyncio
+import threading
+import time
+import unittest
+from collections import defaultdict
+from types import SimpleNamespace
+
+from pywce import EngineDispatcher, AsyncEngineDispatcher, client
+
+
+def _webhook(wa_id: str, seq: int) -> dict:
+    return {
+        "entry": [{"changes": [{"value": {
+            "messaging_product": "whatsapp",
+            "contacts": [{"profile": {"name": "Test"}, "wa_id": wa_id}],
+            "messages": [{"from": wa_id, "id": f"wamid.{wa_id}.{seq}", "timestamp": str(int(time.time())),
+                          "type": "text", "text": {"body": str(seq)}}]
+        }}]}]
+    }
+
+
+class _FakeEngine:
+    def __init__(self, delay: float = 0.0):
+        self.whatsapp = client.WhatsApp(
+            client.WhatsAppConfig(token="token", phone_number_id="123", hub_verification_token="hub"))
+        self.delay = delay
+        self.seen = defaultdict(list)
+        self.threads = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def _record(self, webhook_data):
+        message = client.WebhookEnvelope.of(webhook_data).raw_message
+        with self.lock:
+            self.seen[message["from"]].append(int(message["text"]["body"]))
+            self.threads[message["from"]].add(threading.current_thread().name)
+
+    def process_webhook(self, webhook_data):
+        time.sleep(self.delay)
+        self._record(webhook_data)
+
+    async def process_webhook_async(self, webhook_data):
+        await asyncio.sleep(self.delay)
+        self._record(webhook_data)
+
+
+class TestEngineDispatcher(unittest.TestCase):
+    def test_per_user_order_is_kept(self):
+        engine = _FakeEngine(delay=0.001)
+        dispatcher = EngineDispatcher(engine, workers=4)
+        dispatcher.start()
+
+        for seq in range(20):
+            for user in range(8):
+                self.assertTrue(dispatcher.submit(_webhook(f"2637700000{user}", seq)))
+
+        dispatcher.stop()
+
+        self.assertEqual(8, len(engine.seen))
+        for user, order in engine.seen.items():
+            self.assertEqual(list(range(20)), order)
+            self.assertEqual(1, len(engine.threads[user]))
+
+        stats = dispatcher.stats()
+        self.assertEqual(160, stats.submitted)
+        self.assertEqual(160, stats.processed)
+        self.assertEqual(0, stats.pending)
+
+    def test_full_shard_rejects(self):
+        engine = _FakeEngine()
+        dispatcher = EngineDispatcher(engine, workers=1, max_queue_size=2)
+
+        self.assertTrue(dispatcher.submit(_webhook("263770000001", 0)))
+        self.assertTrue(dispatcher.submit(_webhook("263770000001", 1)))
+        self.assertFalse(dispatcher.submit(_webhook("263770000001", 2)))
+
+        stats = dispatcher.stats()
+        self.assertEqual([2], stats.queue_depths)
+        self.assertEqual(1, stats.rejected)
+
+        dispatcher.start()
+        dispatcher.stop()
+        self.assertEqual([0, 1], engine.seen["263770000001"])
+
+    def test_stop_without_drain_discards_pending(self):
+        engine = _FakeEngine(delay=0.05)
+        dispatcher = EngineDispatcher(engine, workers=1)
+
+        for seq in range(5):
+            dispatcher.submit(_webhook("263770000001", seq))
+
+        dispatcher.join()
+        dispatcher.stop()
+        self.assertEqual(5, dispatcher.stats().pending)
+
+        dispatcher.start()
+        dispatcher.stop(drain=False)
+
+        self.assertLess(len(engine.seen["263770000001"]), 5)
+        self.assertEqual(0, dispatcher.stats().pending)
+
+    def test_batched_webhook_is_routed_per_sender(self):
+        engine = _FakeEngine()
+        dispatcher = EngineDispatcher(engine, workers=4)
+
+        batch = _webhook("263770000001", 0)
+        value = batch["entry"][0]["changes"][0]["value"]
+        for user in range(2, 9):
+            other = _webhook(f"26377000000{user}", 0)["entry"][0]["changes"][0]["value"]
+            value["contacts"] += other["contacts"]
+            value["messages"] += other["messages"]
+
+        self.assertTrue(dispatcher.submit(batch))
+        self.assertEqual(8, dispatcher.stats().submitted)
+        self.assertEqual(8, dispatcher.stats().pending)
+
+        dispatcher.start()
+        dispatcher.stop()
+
+        self.assertEqual(8, len(engine.seen))
+        for user, threads in engine.threads.items():
+            self.assertEqual(f"pywce-dispatcher-{dispatcher.shard_for(user)}", threads.pop())
+
+    def test_async_dispatcher(self):
+        engine = _FakeEngine(delay=0.001)
+
+        async def run():
+            dispatcher = AsyncEngineDispatcher(engine, workers=4)
+            dispatcher.start()
+
+            for seq in range(10):
+                for user in range(8):
+                    await dispatcher.submit(_webhook(f"2637700000{user}", seq))
+
+            await dispatcher.stop()
+            return dispatcher.stats()
+
+        stats = asyncio.run(run())
+
+        self.assertEqual(80, stats.processed)
+        for order in engine.seen.values():
+            self.assertEqual(list(range(10)), order)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import time
+import unittest
+from pathlib import Path
+
+from httpx import AsyncClient, MockTransport, Response
+
+from pywce import Engine, EngineConfig, DefaultSessionManager, EngineState, HookArg, HookService, client, \
+    storage, hook
+from pywce.src.exceptions import HookException
+
+
+def _webhook(wa_id: str, msg_id: str, text: str) -> dict:
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [{
+            "id": "0",
+            "changes": [{
+                "field": "messages",
+                "value": {
+                    "messaging_product": "whatsapp",
+                    "metadata": {"display_phone_number": "263770000000", "phone_number_id": "123"},
+                    "contacts": [{"profile": {"name": "Test"}, "wa_id": wa_id}],
+                    "messages": [{
+                        "from": wa_id,
+                        "id": msg_id,
+                        "timestamp": str(int(time.time())),
+                        "type": "text",
+                        "text": {"body": text}
+                    }]
+                }
+            }]
+        }]
+    }
+
+
+@hook
+async def async_hook(arg: HookArg) -> HookArg:
+    await asyncio.sleep(0)
+    arg.additional_data = {"async": True}
+    return arg
+
+
+class TestEngineAsync(unittest.TestCase):
+    def setUp(self):
+        fixtures = Path(__file__).parent / "fixtures"
+        self.sent = []
+
+        def handler(request):
+            body = json.loads(request.content)
+            self.sent.append(body)
+            return Response(200, json={
+                "messaging_product": "whatsapp",
+                "contacts": [{"input": body.get("to"), "wa_id": body.get("to")}],
+                "messages": [{"id": f"wamid.{len(self.sent)}"}]
+            })
+
+        self.whatsapp = client.AsyncWhatsApp(
+            client.WhatsAppConfig(token="token", phone_number_id="123", hub_verification_token="hub"),
+            http_client=AsyncClient(transport=MockTransport(handler))
+        )
+        self.session_manager = DefaultSessionManager()
+        self.engine = Engine(EngineConfig(
+            whatsapp=self.whatsapp,
+            start_template_stage="START-MENU",
+            report_template_stage="REPORT",
+            storage_manager=storage.YamlJsonStorageManager(str(fixtures / "templates"), str(fixtures / "triggers")),
+            session_manager=self.session_manager
+        ))
+
+    def test_aio_view_shares_config(self):
+        whatsapp = client.WhatsApp(self.whatsapp.config)
+        self.assertIsInstance(whatsapp.aio, client.AsyncWhatsApp)
+        self.assertIs(whatsapp.aio, whatsapp.aio)
+        self.assertIs(self.whatsapp.aio, self.whatsapp)
+
+    def test_process_webhook_async(self):
+        asyncio.run(self.engine.process_webhook_async(_webhook("263770000001", "wamid.in1", "hi")))
+
+        self.assertEqual(1, len(self.sent))
+        self.assertEqual("interactive", self.sent[0]["type"])
+        self.assertEqual("START-MENU",
+                         EngineState.load(self.session_manager, "263770000001").current_stage)
+
+    def test_process_raw_webhook_bytes(self):
+        raw = json.dumps(_webhook("263770000001", "wamid.in1", "hi")).encode("utf-8")
+        asyncio.run(self.engine.process_webhook_async(raw))
+
+        self.assertEqual(1, len(self.sent))
+
+    def test_concurrent_conversations(self):
+        async def run():
+            await asyncio.gather(*[
+                self.engine.process_webhook_async(_webhook(f"26377000{i:04d}", f"wamid.in{i}", "hi"))
+                for i in range(50)
+            ])
+
+        asyncio.run(run())
+
+        self.assertEqual(50, len(self.sent))
+        self.assertEqual(50, len({m["to"] for m in self.sent}))
+
+    def test_process_webhook_batch_async(self):
+        webhook = _webhook("263770000001", "wamid.in1", "hi")
+        value = webhook["entry"][0]["changes"][0]["value"]
+        other = _webhook("263770000002", "wamid.in2", "hi")["entry"][0]["changes"][0]["value"]
+        value["contacts"] += other["contacts"]
+        value["messages"] += other["messages"]
+
+        processed = asyncio.run(self.engine.process_webhook_batch_async(webhook))
+
+        self.assertEqual(2, processed)
+        self.assertEqual({"263770000001", "263770000002"}, {m["to"] for m in self.sent})
+
+    def test_batch_counts_only_processed_messages(self):
+        webhook = _webhook("263770000001", "wamid.in1", "hi")
+        webhook["entry"] += _webhook("263770000002", "wamid.in2", "hi")["entry"]
+        webhook["entry"] += _webhook("263770000001", "wamid.in1", "hi")["entry"]
+
+        processed = asyncio.run(self.engine.process_webhook_batch_async(webhook))
+
+        # the redelivered wamid.in1 is skipped as a duplicate
+        self.assertEqual(2, processed)
+        self.assertEqual(2, len(self.sent))
+        self.assertEqual(0, asyncio.run(self.engine.process_webhook_batch_async(webhook)))
+
+    def test_batch_with_statuses_and_a_message(self):
+        events = []
+        self.engine.config.status_pipeline = client.StatusPipeline(client.CallbackStatusSink(events.extend),
+                                                                   batch_size=1)
+
+        webhook = _webhook("263770000001", "wamid.in1", "hi")
+        status = {"messaging_product": "whatsapp", "statuses": [{"id": "wamid.out", "status": "read"}]}
+        webhook["entry"][0]["changes"].insert(0, {"field": "messages", "value": status})
+
+        self.assertEqual(1, asyncio.run(self.engine.process_webhook_batch_async(webhook)))
+        self.assertEqual(1, len(self.sent))
+
+    def test_async_hook(self):
+        arg = HookArg(user=client.WaUser(wa_id="1"), session_id="1")
+        path = f"{async_hook.__module__}.{async_hook.__name__}"
+
+        result = asyncio.run(HookService.process_hook_async(path, arg))
+        self.assertEqual({"async": True}, result.additional_data)
+
+        # async hooks remain usable from the sync engine path
+        result = HookService.process_hook(path, HookArg(user=client.WaUser(wa_id="1"), session_id="1"))
+        self.assertEqual({"async": True}, result.additional_data)
+
+    def test_async_hook_on_sync_path_inside_event_loop(self):
+        path = f"{async_hook.__module__}.{async_hook.__name__}"
+
+        async def run():
+            HookService.process_hook(path, HookArg(user=client.WaUser(wa_id="1"), session_id="1"))
+
+        with self.assertRaises(HookException) as ctx:
+            asyncio.run(run())
+
+        self.assertIn("running event loop", ctx.exception.message)
+
+    def test_http_client_per_event_loop(self):
+        whatsapp = client.WhatsApp(
+            client.WhatsAppConfig(token="token", phone_number_id="123", hub_verification_token="hub")).aio
+
+        async def current():
+            return whatsapp._client()
+
+        first, second = asyncio.run(current()), asyncio.run(current())
+        self.assertIsNot(first, second)
+
+        async def scoped():
+            async with whatsapp:
+                http_client = whatsapp._client()
+                self.assertIs(http_client, whatsapp._client())
+            return http_client
+
+        self.assertTrue(asyncio.run(scoped()).is_closed)
+        self.assertNotIn(first, whatsapp._loop_clients.values())
+
+
+if __name__ == "__main__":
+    unittest.main()
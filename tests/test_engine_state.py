@@ -0,0 +1,129 @@
+import asyncio
+import json
+import pickle
+import time
+import unittest
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from httpx import AsyncClient, MockTransport, Response
+
+from pywce import DefaultSessionManager, Engine, EngineConfig, EngineState, SessionConstants, client, storage
+from pywce.src.utils.engine_util import EngineUtil
+from tests.test_engine_async import _webhook
+
+
+class KeyCountingSessionManager(DefaultSessionManager):
+    def __init__(self):
+        super().__init__()
+        self.calls = Counter()
+
+    def get(self, session_id, key, t=None):
+        self.calls[("get", key)] += 1
+        return super().get(session_id, key, t)
+
+    def save(self, session_id, key, data):
+        self.calls[("save", key)] += 1
+        return super().save(session_id, key, data)
+
+    def fetch_all(self, session_id, is_global=False):
+        self.calls["fetch_all"] += 1
+        return super().fetch_all(session_id, is_global)
+
+
+class TestEngineState(unittest.TestCase):
+    def setUp(self):
+        self.session_manager = DefaultSessionManager()
+        self.session_id = "263770000001"
+        self.session_manager.session(self.session_id)
+
+    def test_state_is_one_session_entry(self):
+        state = EngineState.load(self.session_manager, self.session_id)
+        state.current_stage = "START-MENU"
+        state.remember("wamid.1")
+        state.save(self.session_manager, self.session_id)
+
+        self.assertEqual({self.session_manager.prop_key, SessionConstants.ENGINE_STATE},
+                         set(self.session_manager.fetch_all(self.session_id)))
+
+        loaded = EngineState.load(self.session_manager, self.session_id)
+        self.assertEqual("START-MENU", loaded.current_stage)
+        self.assertFalse(loaded.remember("wamid.1"))
+
+    def test_load_returns_copy(self):
+        EngineState(current_stage="A").save(self.session_manager, self.session_id)
+
+        EngineState.load(self.session_manager, self.session_id).current_stage = "B"
+
+        self.assertEqual("A", EngineState.load(self.session_manager, self.session_id).current_stage)
+
+    def test_reads_legacy_keys(self):
+        last_activity = datetime(2024, 1, 1, 12, 0, 0)
+
+        self.session_manager.save_all(self.session_id, {
+            SessionConstants.CURRENT_STAGE: "B",
+            SessionConstants.PREV_STAGE: "A",
+            SessionConstants.LATEST_CHECKPOINT: "A",
+            SessionConstants.MESSAGE_HISTORY: ["wamid.1", "wamid.2"],
+            SessionConstants.LAST_ACTIVITY_AT: last_activity.isoformat()
+        })
+
+        state = EngineState.load(self.session_manager, self.session_id)
+
+        self.assertEqual(("B", "A", "A"), (state.current_stage, state.prev_stage, state.checkpoint))
+        self.assertEqual(last_activity.timestamp(), state.last_activity_s)
+        self.assertFalse(state.remember("wamid.2"))
+
+    def test_new_user_is_not_read_in_full(self):
+        manager = KeyCountingSessionManager()
+        manager.session("new")
+
+        self.assertIsNone(EngineState.load(manager, "new").current_stage)
+        self.assertEqual(0, manager.calls["fetch_all"])
+
+    def test_engine_loads_and_saves_state_once_per_message(self):
+        fixtures = Path(__file__).parent / "fixtures"
+        manager = KeyCountingSessionManager()
+
+        engine = Engine(EngineConfig(
+            whatsapp=client.AsyncWhatsApp(
+                client.WhatsAppConfig(token="token", phone_number_id="123", hub_verification_token="hub"),
+                http_client=AsyncClient(transport=MockTransport(
+                    lambda request: Response(200, json={"messages": [{"id": "wamid.out"}]})))
+            ),
+            start_template_stage="START-MENU",
+            report_template_stage="REPORT",
+            storage_manager=storage.YamlJsonStorageManager(str(fixtures / "templates"), str(fixtures / "triggers")),
+            session_manager=manager,
+            session_unit_of_work=False,
+            debounce_timeout_ms=0
+        ))
+
+        for i in range(2):
+            asyncio.run(engine.process_webhook_async(json.dumps(_webhook(self.session_id, f"wamid.in{i}", "hi"))))
+
+        self.assertEqual(2, manager.calls[("get", SessionConstants.ENGINE_STATE)])
+        self.assertEqual(2, manager.calls[("save", SessionConstants.ENGINE_STATE)])
+        self.assertEqual(0, manager.calls["fetch_all"])
+        self.assertEqual("START-MENU", EngineState.load(manager, self.session_id).current_stage)
+
+    def test_state_pickles(self):
+        state = EngineState(current_stage="A", last_activity_s=time.time())
+        state.remember("wamid.1")
+
+        restored = pickle.loads(pickle.dumps(state))
+
+        self.assertEqual("A", restored.current_stage)
+        self.assertIn("wamid.1", restored.history)
+
+    def test_expiry_accepts_epoch_and_iso(self):
+        self.assertTrue(EngineUtil.has_session_expired(time.time() - 1))
+        self.assertFalse(EngineUtil.has_session_expired(datetime.fromtimestamp(time.time() + 60).isoformat()))
+
+        self.assertTrue(EngineUtil.has_interaction_expired(time.time() - 120, 1))
+        self.assertFalse(EngineUtil.has_interaction_expired(datetime.now().isoformat(), 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+
+from pywce import JournaledSessionManager
+from tests.test_session_manager import TestSessionManager
+
+
+class TestJournaledSessionManager(TestSessionManager):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "sessions.snapshot")
+
+        self.init_session = JournaledSessionManager(self.path, fsync_interval_s=0.01)
+        self.test_session_id = "test_session"
+        self.session_manager = self.init_session.session(self.test_session_id)
+
+    def tearDown(self):
+        if not self.init_session._stop.is_set():
+            self.init_session.close()
+        self.tmp.cleanup()
+
+    def _crash(self) -> JournaledSessionManager:
+        """
+        stop without compacting, as if the process died after the last fsync
+        """
+        self.init_session._stop.set()
+        self.init_session._thread.join()
+        self.init_session.flush()
+        self.init_session._journal.close()
+
+        self.init_session = JournaledSessionManager(self.path)
+        return self.init_session
+
+    def test_replay_after_crash(self):
+        self.session_manager.save(self.test_session_id, "key", ["a", "b"])
+        self.session_manager.save_prop(self.test_session_id, "name", "pywce")
+        self.session_manager.save_global("global_key", {"value": 1})
+        self.session_manager.save_all(self.test_session_id, {"key1": 1, "key2": 2})
+        self.session_manager.evict(self.test_session_id, "key1")
+
+        manager = self._crash()
+
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(["a", "b"], manager.get(self.test_session_id, "key"))
+        self.assertEqual("pywce", manager.get_from_props(self.test_session_id, "name"))
+        self.assertEqual({"value": 1}, manager.get_global("global_key"))
+        self.assertIsNone(manager.get(self.test_session_id, "key1"))
+        self.assertEqual(2, manager.get(self.test_session_id, "key2"))
+
+    def test_compact_then_replay(self):
+        self.session_manager.save(self.test_session_id, "key", 1)
+        self.init_session.compact()
+        self.session_manager.save(self.test_session_id, "key", 2)
+
+        self.assertTrue(os.path.exists(self.path))
+
+        manager = self._crash()
+        self.assertEqual(2, manager.get(self.test_session_id, "key"))
+
+    def test_torn_record_is_dropped(self):
+        self.session_manager.save(self.test_session_id, "key", 1)
+        self.init_session.flush()
+
+        with open(self.init_session.journal_path, "ab") as f:
+            f.write(b"\x80\x05\x95torn")
+
+        manager = self._crash()
+        self.assertEqual(1, manager.get(self.test_session_id, "key"))
+
+        manager.save(self.test_session_id, "key", 2)
+        manager = self._crash()
+        self.assertEqual(2, manager.get(self.test_session_id, "key"))
+
+    def test_unfinished_compaction_is_recovered(self):
+        self.session_manager.save(self.test_session_id, "key", 1)
+        self.init_session.flush()
+
+        # crash between rotating the journal & writing the snapshot
+        os.replace(self.init_session.journal_path, f"{self.init_session.journal_path}.old")
+
+        manager = self._crash()
+
+        self.assertEqual(1, manager.get(self.test_session_id, "key"))
+        self.assertFalse(os.path.exists(f"{manager.journal_path}.old"))
+        self.assertTrue(os.path.exists(self.path))
+
+    def test_close_compacts(self):
+        self.session_manager.save(self.test_session_id, "key", 1)
+        self.init_session.close()
+
+        self.assertEqual(0, os.path.getsize(self.init_session.journal_path))
+
+        self.init_session = JournaledSessionManager(self.path)
+        self.assertEqual(1, self.init_session.get(self.test_session_id, "key"))
+
+
+if __name__ == "__main__":
+    unittest.main()
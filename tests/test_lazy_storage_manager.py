@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from pywce import storage
+from pywce.modules.storage.lazy import _index_json, _index_yaml
+from pywce.src.exceptions import EngineException
+
+
+class TestLazyStorageManager(unittest.TestCase):
+    def setUp(self):
+        fixtures = Path(__file__).parent / "fixtures"
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.template_dir = os.path.join(self.tmp.name, "templates")
+        self.trigger_dir = os.path.join(self.tmp.name, "triggers")
+
+        shutil.copytree(fixtures / "templates", self.template_dir)
+        shutil.copytree(fixtures / "triggers", self.trigger_dir)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, name: str, content: str) -> Path:
+        path = Path(self.template_dir) / name
+        path.write_text(content, encoding="utf-8")
+        return path
+
+    def test_matches_eager_manager(self):
+        eager = storage.YamlJsonStorageManager(self.template_dir, self.trigger_dir)
+        lazy = storage.LazyYamlJsonStorageManager(self.template_dir, self.trigger_dir)
+
+        self.assertEqual(set(eager._TEMPLATES), set(lazy._index))
+        self.assertEqual(eager.triggers(), lazy.triggers())
+
+        for name in eager._TEMPLATES:
+            self.assertTrue(lazy.exists(name))
+            self.assertEqual(eager.get(name), lazy.get(name))
+
+        self.assertFalse(lazy.exists("non_existent_template"))
+        self.assertIsNone(lazy.get("non_existent_template"))
+
+    def test_nothing_parsed_until_get(self):
+        lazy = storage.LazyYamlJsonStorageManager(self.template_dir, self.trigger_dir)
+
+        self.assertTrue(lazy.exists("REPORT"))
+        self.assertEqual(len(lazy._cache), 0)
+
+        self.assertIs(lazy.get("REPORT"), lazy.get("REPORT"))
+        self.assertEqual(list(lazy._cache), ["REPORT"])
+
+    def test_lru_evicts_least_recently_used(self):
+        lazy = storage.LazyYamlJsonStorageManager(self.template_dir, self.trigger_dir, cache_size=2)
+        names = sorted(lazy._index)[:3]
+
+        lazy.get(names[0])
+        lazy.get(names[1])
+        lazy.get(names[0])
+        lazy.get(names[2])
+
+        self.assertEqual(list(lazy._cache), [names[0], names[2]])
+        self.assertIsNotNone(lazy.get(names[1]))
+
+    def test_invalid_template_returns_none(self):
+        self._write("bad.json", '{"BAD": {"kind": "text"}}')
+        lazy = storage.LazyYamlJsonStorageManager(self.template_dir, self.trigger_dir)
+
+        self.assertTrue(lazy.exists("BAD"))
+
+        with self.assertLogs("pywce.modules.storage.lazy", level="ERROR"):
+            self.assertIsNone(lazy.get("BAD"))
+
+    def test_yaml_index_byte_ranges(self):
+        path = self._write("keys.yaml", "# comment\n"
+                                        "\"QUOTED \\u00e9\":\n  kind: text\n\n"
+                                        "'SINGLE ''Q''':\n  kind: text\n"
+                                        "PLAIN: {kind: text}\n")
+        index = _index_yaml(path)
+        data = path.read_bytes()
+
+        self.assertEqual(list(index), ["QUOTED é", "SINGLE 'Q'", "PLAIN"])
+        self.assertTrue(data[index["PLAIN"].offset:].startswith(b"PLAIN:"))
+        self.assertEqual(index["PLAIN"].offset + index["PLAIN"].size, len(data))
+
+    def test_yaml_document_markers_fall_back_to_whole_file(self):
+        path = self._write("doc.yaml", "---\nDOC:\n  kind: text\n  message: hi\n  routes: {}\n")
+
+        self.assertEqual(_index_yaml(path)["DOC"].size, -1)
+
+        lazy = storage.LazyYamlJsonStorageManager(self.template_dir, self.trigger_dir)
+        self.assertEqual(lazy.get("DOC").message, "hi")
+
+    def test_json_index_byte_ranges(self):
+        path = self._write("keys.json", '{ "A\\u00e9": {"message": "é"} ,\n"B" : [1, 2] }')
+        index = _index_json(path)
+        data = path.read_bytes()
+
+        self.assertEqual(data[index["Aé"].offset:index["Aé"].offset + index["Aé"].size],
+                         '{"message": "é"}'.encode("utf-8"))
+        self.assertEqual(data[index["B"].offset:index["B"].offset + index["B"].size], b"[1, 2]")
+
+    def test_duplicate_template_across_files(self):
+        self._write("zz_copy.json", '{"REPORT": {"kind": "text", "message": "hi", "routes": {}}}')
+
+        with self.assertRaises(EngineException):
+            storage.LazyYamlJsonStorageManager(self.template_dir, self.trigger_dir)
+
+    def test_reload_rebuilds_index(self):
+        lazy = storage.LazyYamlJsonStorageManager(self.template_dir, self.trigger_dir)
+        lazy.get("REPORT")
+
+        self._write("new.json", '{"NEW": {"kind": "text", "message": "hi", "routes": {}}}')
+        lazy.load_templates()
+
+        self.assertTrue(lazy.exists("NEW"))
+        self.assertEqual(len(lazy._cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+import multiprocessing
+import os
+import threading
+import time
+import unittest
+
+from pywce import EngineProcessRunner, client
+from pywce.src.services.process_runner import ConsistentHashRing
+
+_ctx = multiprocessing.get_context("fork")
+_results = None
+_gate = None
+
+
+def _webhook(wa_id: str) -> dict:
+    return {
+        "entry": [{"changes": [{"value": {
+            "messaging_product": "whatsapp",
+            "contacts": [{"profile": {"name": "Test"}, "wa_id": wa_id}],
+            "messages": [{"from": wa_id, "id": f"wamid.{wa_id}", "timestamp": str(int(time.time())),
+                          "type": "text", "text": {"body": "hi"}}]
+        }}]}]
+    }
+
+
+class _RecordingEngine:
+    def process_webhook(self, webhook_data):
+        wa_id = client.WebhookEnvelope.of(webhook_data).wa_id
+        _results.put((wa_id, os.getpid()))
+
+
+class _BlockedEngine:
+    def process_webhook(self, webhook_data):
+        _gate.wait(10)
+
+
+class TestConsistentHashRing(unittest.TestCase):
+    def test_adding_node_only_moves_its_keys(self):
+        ring = ConsistentHashRing(["a", "b", "c"])
+        keys = [f"26377{i:07d}" for i in range(2000)]
+        before = {k: ring.get(k) for k in keys}
+
+        ring.add("d")
+        after = {k: ring.get(k) for k in keys}
+
+        moved = [k for k in keys if before[k] != after[k]]
+        self.assertTrue(all(after[k] == "d" for k in moved))
+        self.assertLess(len(moved), len(keys) / 2)
+
+        ring.remove("d")
+        self.assertEqual(before, {k: ring.get(k) for k in keys})
+
+
+class TestEngineProcessRunner(unittest.TestCase):
+    def setUp(self):
+        global _results
+        _results = _ctx.Queue()
+
+    def _collect(self, count: int) -> dict:
+        owners = {}
+        for _ in range(count):
+            wa_id, pid = _results.get(timeout=10)
+            owners.setdefault(wa_id, set()).add(pid)
+        return owners
+
+    def test_user_is_pinned_to_one_process(self):
+        runner = EngineProcessRunner(_RecordingEngine, processes=2, start_method="fork")
+        runner.start()
+
+        users = [f"26377000{i:04d}" for i in range(20)]
+        for _ in range(3):
+            for user in users:
+                self.assertTrue(runner.submit(_webhook(user)))
+
+        owners = self._collect(60)
+        runner.stop()
+
+        self.assertEqual(set(users), set(owners))
+        self.assertTrue(all(len(pids) == 1 for pids in owners.values()))
+
+    def test_batched_webhook_is_routed_per_sender(self):
+        runner = EngineProcessRunner(_RecordingEngine, processes=2, start_method="fork")
+        runner.start()
+
+        users = [f"26377000{i:04d}" for i in range(10)]
+        batch = _webhook(users[0])
+        for user in users[1:]:
+            batch["entry"] += _webhook(user)["entry"]
+
+        self.assertTrue(runner.submit(batch))
+        owners = self._collect(len(users))
+        expected = {user: runner._processes[runner.route(_webhook(user))].pid for user in users}
+        runner.stop()
+
+        self.assertEqual({user: {pid} for user, pid in expected.items()}, owners)
+
+    def test_add_and_restart_process(self):
+        runner = EngineProcessRunner(_RecordingEngine, processes=1, start_method="fork")
+        runner.start()
+
+        node = runner.add_process()
+        self.assertEqual(2, len(runner.nodes))
+
+        runner._processes[node].kill()
+        runner._processes[node].join()
+        self.assertEqual([node], runner.ensure_alive())
+
+        users = [f"26377000{i:04d}" for i in range(20)]
+        for user in users:
+            runner.submit(_webhook(user))
+
+        owners = self._collect(20)
+        runner.stop()
+
+        self.assertEqual(set(users), set(owners))
+
+    def _blocked_runner(self) -> EngineProcessRunner:
+        global _gate
+        _gate = _ctx.Event()
+
+        runner = EngineProcessRunner(_BlockedEngine, processes=1, max_queue_size=1, start_method="fork")
+        runner.start()
+
+        # one webhook held by the engine, one filling the queue
+        runner.submit(_webhook("263770000001"))
+        deadline = time.monotonic() + 5
+        while not runner.submit(_webhook("263770000002")) and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        return runner
+
+    def test_blocked_submit_does_not_hold_the_lock(self):
+        runner = self._blocked_runner()
+
+        submitter = threading.Thread(target=runner.submit, args=(_webhook("263770000003"), True), daemon=True)
+        submitter.start()
+        time.sleep(0.1)
+
+        self.assertTrue(submitter.is_alive())
+        self.assertFalse(runner.submit(_webhook("263770000004")))
+        runner.add_process(drain=False)
+
+        _gate.set()
+        submitter.join(5)
+        self.assertFalse(submitter.is_alive())
+        runner.stop()
+
+    def test_drain_gives_up_on_dead_process(self):
+        runner = self._blocked_runner()
+        node = runner.nodes[0]
+
+        threading.Timer(0.2, runner._processes[node].kill).start()
+
+        start = time.monotonic()
+        runner.join()
+        self.assertLess(time.monotonic() - start, 5)
+
+        runner._processes[node].join()
+        self.assertFalse(runner.submit(_webhook("263770000001"), block=True))
+
+        # the restarted process has nothing queued, a killed waiter leaves the gate unusable
+        runner.ensure_alive()
+        runner.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
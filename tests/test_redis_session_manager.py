@@ -0,0 +1,102 @@
+import pickle
+import unittest
+from datetime import datetime
+from decimal import Decimal
+
+from benchmarks.redis_stub import RedisStub
+from pywce import RedisSessionManager, RestrictedPickleSerializer, SessionConstants, EngineState
+from pywce.modules.session.dedupe import MessageHistory
+from tests.test_session_manager import TestSessionManager
+
+
+class _Payload:
+    pass
+
+
+class TestRedisSessionManager(TestSessionManager):
+    near_cache_s = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = RedisStub().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.client = self.server.client()
+        self.client.execute("FLUSHDB")
+
+        self.init_session = RedisSessionManager(client=self.client, session_ttl_s=60, near_cache_s=self.near_cache_s)
+        self.test_session_id = "test_session"
+        self.session_manager = self.init_session.session(self.test_session_id)
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_single_stripe(self):
+        pass
+
+    def test_hash_per_session(self):
+        self.session_manager.save_all(self.test_session_id, {"key1": 1, "key2": [1, 2]})
+
+        fields = self.client.execute("HKEYS", "pywce:{test_session}")
+        self.assertEqual({b"key1", b"key2", self.init_session.prop_key.encode("utf-8")}, set(fields))
+
+    def test_multi_key_operations_are_pipelined(self):
+        round_trips = self.client.round_trips
+
+        self.session_manager.save_all(self.test_session_id, {SessionConstants.PREV_STAGE: "A",
+                                                             SessionConstants.CURRENT_STAGE: "B",
+                                                             SessionConstants.CURRENT_MSG_ID: "wamid.1"})
+        self.session_manager.evict_all(self.test_session_id, [SessionConstants.PREV_STAGE,
+                                                              SessionConstants.CURRENT_MSG_ID])
+
+        self.assertEqual(round_trips + 2, self.client.round_trips)
+        self.assertEqual("B", self.session_manager.get(self.test_session_id, SessionConstants.CURRENT_STAGE))
+
+    def test_restricted_serializer_rejects_unknown_globals(self):
+        self.session_manager.save(self.test_session_id, "state", EngineState("A", history=MessageHistory(5, ["x"])))
+        self.session_manager.save(self.test_session_id, "when", {datetime(2024, 1, 1), Decimal("1.5")})
+        self.init_session._invalidate(self.test_session_id)
+
+        self.assertEqual("A", self.session_manager.get(self.test_session_id, "state").current_stage)
+        self.assertEqual({datetime(2024, 1, 1), Decimal("1.5")}, self.session_manager.get(self.test_session_id, "when"))
+
+        self.client.execute("HSET", "pywce:{test_session}", "evil", pickle.dumps(_Payload()))
+        self.init_session._invalidate(self.test_session_id)
+
+        with self.assertRaises(pickle.UnpicklingError):
+            self.session_manager.get(self.test_session_id, "evil")
+
+        allowed = RedisSessionManager(client=self.client, serializer=RestrictedPickleSerializer(allowed=[_Payload]))
+        self.assertIsInstance(allowed.get(self.test_session_id, "evil"), _Payload)
+
+    def test_native_ttl(self):
+        self.session_manager.save(self.test_session_id, "key", "value")
+        self.assertGreater(self.client.execute("TTL", "pywce:{test_session}"), 0)
+
+        self.server.expire_now("pywce:{test_session}")
+        self.init_session._invalidate(self.test_session_id)
+
+        self.assertIsNone(self.session_manager.get(self.test_session_id, "key"))
+
+
+class TestRedisSessionManagerNearCache(TestRedisSessionManager):
+    near_cache_s = 5
+
+    def test_reads_served_from_near_cache(self):
+        self.session_manager.save(self.test_session_id, "key", "value")
+        self.session_manager.get(self.test_session_id, "key")
+        round_trips = self.client.round_trips
+
+        for _ in range(10):
+            self.assertEqual("value", self.session_manager.get(self.test_session_id, "key"))
+            self.session_manager.get(self.test_session_id, SessionConstants.CURRENT_STAGE)
+
+        self.assertEqual(round_trips, self.client.round_trips)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,10 @@
+import os
+import tempfile
+import threading
+import time
 import unittest
 
-from pywce import ISessionManager, DefaultSessionManager
+from pywce import ISessionManager, DefaultSessionManager, EngineState
 
 
 class TestSessionManager(unittest.TestCase):
@@ -106,5 +110,170 @@ class TestSessionManager(unittest.TestCase):
         self.assertTrue(self.session_manager.key_in_session(self.test_session_id, "test_key", False))
         self.assertFalse(self.session_manager.key_in_session(self.test_session_id, "global_key", False))
 
+    def test_concurrent_save_prop_is_atomic(self):
+        def work(t):
+            for i in range(200):
+                self.session_manager.save_prop(self.test_session_id, f"prop_{t}_{i}", i)
+
+        threads = [threading.Thread(target=work, args=(t,)) for t in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(8 * 200, len(self.session_manager.get_user_props(self.test_session_id)))
+
+    def test_single_stripe(self):
+        manager = DefaultSessionManager(stripes=1).session("a").session("b")
+        manager.save("a", "key", 1)
+        manager.save_all("b", {"key": 2})
+
+        self.assertEqual(1, manager.get("a", "key"))
+        self.assertEqual(2, manager.get("b", "key"))
+
+class TestBoundedSessionManager(unittest.TestCase):
+    def test_lru_eviction(self):
+        evicted = []
+        manager = DefaultSessionManager(max_sessions=2, on_evict=lambda sid, data: evicted.append((sid, data)))
+
+        manager.session("a").save("a", "key", "value")
+        manager.session("b")
+        manager.session("a")
+        manager.session("c")
+
+        self.assertEqual(["a", "c"], list(manager.sessions))
+        self.assertEqual("b", evicted[0][0])
+
+        manager.session("d")
+        self.assertEqual(["c", "d"], list(manager.sessions))
+        self.assertEqual("value", evicted[1][1]["key"])
+
+    def test_on_evict_runs_outside_the_stripe_lock(self):
+        seen = []
+        manager = DefaultSessionManager(stripes=1, max_sessions=1,
+                                        on_evict=lambda sid, data: seen.append(manager.get("b", "key")))
+        manager.session("a")
+        manager.save("b", "key", "value")
+
+        self.assertEqual(["value"], seen)
+        self.assertEqual(["b"], list(manager.sessions))
+
+    def test_evicted_session_access(self):
+        manager = DefaultSessionManager(max_sessions=1)
+        manager.session("a")
+        manager.session("b")
+
+        # a message still handling "a" after it was evicted
+        self.assertIsNone(manager.get("a", "k"))
+        self.assertIsNone(manager.get_from_props("a", "name"))
+        self.assertFalse(manager.key_in_session("a", "k", check_global=False))
+        self.assertFalse(manager.evict_prop("a", "name"))
+
+        manager.save_prop("a", "name", "value")
+        manager.save("a", "k", 1)
+
+        self.assertEqual("value", manager.get_from_props("a", "name"))
+        self.assertEqual(1, manager.get("a", "k"))
+        self.assertEqual(["a"], list(manager.sessions))
+
+    def test_access_refreshes_recency(self):
+        manager = DefaultSessionManager(max_sessions=2)
+        manager.session("a")
+        manager.session("b")
+
+        manager.get("a", "k")
+        manager.session("c")
+
+        self.assertEqual(["a", "c"], list(manager.sessions))
+
+    def test_clear_keeps_session_tracked(self):
+        manager = DefaultSessionManager(idle_ttl_s=60)
+        manager.session("a").save("a", "k", 1)
+        manager.clear("a")
+
+        self.assertIn("a", manager._recency[manager._index("a")])
+        self.assertEqual(0, manager.sweep())
+
+    def test_idle_ttl_sweep(self):
+        manager = DefaultSessionManager(idle_ttl_s=0.05)
+        manager.session("a")
+        time.sleep(0.1)
+        manager.session("b")
+
+        self.assertEqual(1, manager.sweep())
+        self.assertEqual(["b"], list(manager.sessions))
+
+    def test_background_sweeper(self):
+        evicted = threading.Event()
+        manager = DefaultSessionManager(idle_ttl_s=0.01, sweep_interval_s=0.01,
+                                        on_evict=lambda sid, data: evicted.set())
+        manager.session("a")
+
+        self.assertTrue(evicted.wait(2))
+        manager.close()
+        self.assertEqual({}, dict(manager.sessions))
+
+
+class TestSessionSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "sessions.snapshot")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_snapshot_and_restore(self):
+        manager = DefaultSessionManager()
+        manager.save_global("global", 1)
+
+        for i in range(DefaultSessionManager.SNAPSHOT_CHUNK + 5):
+            session_id = f"user-{i}"
+            manager.session(session_id).save_prop(session_id, "name", f"name-{i}")
+
+            state = EngineState(current_stage="BOOKING")
+            state.remember(f"wamid.{i}")
+            state.save(manager, session_id)
+
+        self.assertEqual(DefaultSessionManager.SNAPSHOT_CHUNK + 5, manager.snapshot(self.path))
+        self.assertFalse(os.path.exists(f"{self.path}.tmp"))
+
+        restored = DefaultSessionManager(snapshot_path=self.path)
+
+        self.assertEqual(1, restored.get_global("global"))
+        self.assertEqual(len(manager.sessions), len(restored.sessions))
+        self.assertEqual("name-7", restored.get_from_props("user-7", "name"))
+
+        state = EngineState.load(restored, "user-7")
+        self.assertEqual("BOOKING", state.current_stage)
+        self.assertFalse(state.remember("wamid.7"))
+
+    def test_close_writes_snapshot(self):
+        manager = DefaultSessionManager(snapshot_path=self.path)
+        manager.session("a").save("a", "key", "value")
+        manager.close()
+
+        self.assertEqual("value", DefaultSessionManager(snapshot_path=self.path).get("a", "key"))
+
+    def test_restore_keeps_max_sessions(self):
+        manager = DefaultSessionManager()
+        for session_id in ["a", "b", "c"]:
+            manager.session(session_id)
+        manager.snapshot(self.path)
+
+        bounded = DefaultSessionManager(max_sessions=2)
+        self.assertEqual(3, bounded.restore(self.path))
+        self.assertEqual(["b", "c"], list(bounded.sessions))
+
+    def test_periodic_snapshot(self):
+        manager = DefaultSessionManager(snapshot_path=self.path, snapshot_interval_s=0.01)
+        manager.session("a")
+
+        deadline = time.monotonic() + 2
+        while not os.path.exists(self.path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        manager.close()
+        self.assertTrue(os.path.exists(self.path))
+
 if __name__ == '__main__':
     unittest.main()
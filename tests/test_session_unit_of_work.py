@@ -0,0 +1,143 @@
+import asyncio
+import json
+import unittest
+from collections import Counter
+from pathlib import Path
+
+from httpx import AsyncClient, MockTransport, Response
+
+from pywce import Engine, EngineConfig, DefaultSessionManager, EngineState, SessionUnitOfWork, client, storage
+from tests.test_engine_async import _webhook
+
+
+class CountingSessionManager(DefaultSessionManager):
+    def __init__(self):
+        super().__init__()
+        self.calls = Counter()
+
+    def get(self, session_id, key, t=None):
+        self.calls["get"] += 1
+        return super().get(session_id, key, t)
+
+    def save(self, session_id, key, data):
+        self.calls["save"] += 1
+        return super().save(session_id, key, data)
+
+    def save_all(self, session_id, data):
+        self.calls["save_all"] += 1
+        return super().save_all(session_id, data)
+
+    def fetch_all(self, session_id, is_global=False):
+        self.calls["fetch_all"] += 1
+        return super().fetch_all(session_id, is_global)
+
+
+class TestSessionUnitOfWork(unittest.TestCase):
+    def setUp(self):
+        self.manager = DefaultSessionManager()
+        self.session_id = "263770000001"
+        self.manager.session(self.session_id)
+        self.manager.save(self.session_id, "existing", "value")
+
+    def test_reads_see_pending_writes_before_commit(self):
+        uow = SessionUnitOfWork(self.manager, self.session_id)
+        uow.save(self.session_id, "key", "pending")
+        uow.save_prop(self.session_id, "name", "pywce")
+
+        self.assertEqual("pending", uow.get(self.session_id, "key"))
+        self.assertEqual("pywce", uow.get_from_props(self.session_id, "name"))
+        self.assertIsNone(self.manager.get(self.session_id, "key"))
+        self.assertEqual({}, self.manager.get_user_props(self.session_id))
+
+    def test_commit_flushes_once(self):
+        manager = CountingSessionManager()
+        manager.session(self.session_id)
+
+        with SessionUnitOfWork(manager, self.session_id) as uow:
+            for i in range(10):
+                uow.save(self.session_id, f"key{i}", i)
+                uow.get(self.session_id, f"key{i}")
+
+        self.assertEqual(1, manager.calls["fetch_all"])
+        self.assertEqual(1, manager.calls["save_all"])
+        self.assertEqual(0, manager.calls["get"])
+        self.assertEqual(9, manager.get(self.session_id, "key9"))
+
+    def test_rollback_on_error(self):
+        with self.assertRaises(ValueError):
+            with SessionUnitOfWork(self.manager, self.session_id) as uow:
+                uow.save(self.session_id, "key", "value")
+                uow.evict(self.session_id, "existing")
+                uow.save_prop(self.session_id, "name", "pywce")
+                raise ValueError()
+
+        self.assertIsNone(self.manager.get(self.session_id, "key"))
+        self.assertEqual("value", self.manager.get(self.session_id, "existing"))
+        self.assertEqual({}, self.manager.get_user_props(self.session_id))
+
+    def test_evict_and_clear(self):
+        with SessionUnitOfWork(self.manager, self.session_id) as uow:
+            uow.save(self.session_id, "key", "value")
+            uow.evict(self.session_id, "existing")
+            self.assertFalse(uow.key_in_session(self.session_id, "existing", False))
+
+        self.assertIsNone(self.manager.get(self.session_id, "existing"))
+        self.assertEqual("value", self.manager.get(self.session_id, "key"))
+
+        with SessionUnitOfWork(self.manager, self.session_id) as uow:
+            uow.save(self.session_id, "other", 1)
+            uow.clear(self.session_id, retain_keys=["key"])
+            uow.save(self.session_id, "after", 2)
+
+        data = dict(self.manager.fetch_all(self.session_id))
+        data.pop(self.manager.prop_key)
+        self.assertEqual({"key": "value", "after": 2}, data)
+
+    def test_props_after_clear(self):
+        with SessionUnitOfWork(self.manager, self.session_id) as uow:
+            uow.clear(self.session_id)
+            self.assertIsNone(uow.get_from_props(self.session_id, "name"))
+            self.assertFalse(uow.evict_prop(self.session_id, "name"))
+            uow.save_prop(self.session_id, "name", "pywce")
+            self.assertEqual("pywce", uow.get_from_props(self.session_id, "name"))
+
+        self.assertEqual("pywce", self.manager.get_from_props(self.session_id, "name"))
+
+    def test_other_sessions_pass_through(self):
+        uow = SessionUnitOfWork(self.manager, self.session_id)
+        self.manager.session("other")
+        uow.save("other", "key", "value")
+        uow.save_global("global", 1)
+
+        self.assertEqual("value", self.manager.get("other", "key"))
+        self.assertTrue(uow.key_in_session(self.session_id, "global"))
+
+    def test_engine_flushes_once_per_message(self):
+        fixtures = Path(__file__).parent / "fixtures"
+
+        def handler(request):
+            return Response(200, json={"messages": [{"id": "wamid.out"}]})
+
+        manager = CountingSessionManager()
+        engine = Engine(EngineConfig(
+            whatsapp=client.AsyncWhatsApp(
+                client.WhatsAppConfig(token="token", phone_number_id="123", hub_verification_token="hub"),
+                http_client=AsyncClient(transport=MockTransport(handler))
+            ),
+            start_template_stage="START-MENU",
+            report_template_stage="REPORT",
+            storage_manager=storage.YamlJsonStorageManager(str(fixtures / "templates"), str(fixtures / "triggers")),
+            session_manager=manager,
+            session_unit_of_work=True
+        ))
+
+        raw = json.dumps(_webhook(self.session_id, "wamid.in1", "hi")).encode("utf-8")
+        asyncio.run(engine.process_webhook_async(raw))
+
+        self.assertEqual("START-MENU", EngineState.load(manager, self.session_id).current_stage)
+        self.assertEqual(1, manager.calls["fetch_all"])
+        self.assertEqual(1, manager.calls["save_all"])
+
+
+if __name__ == "__main__":
+    unittest.main()
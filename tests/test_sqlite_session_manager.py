@@ -0,0 +1,125 @@
+import os
+import tempfile
+import unittest
+
+from pywce import SqliteSessionManager
+from tests.test_session_manager import TestSessionManager
+
+
+class TestSqliteSessionManager(TestSessionManager):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "sessions.db")
+
+        self.init_session = SqliteSessionManager(self.path, flush_interval_s=0.01)
+        self.test_session_id = "test_session"
+        self.session_manager = self.init_session.session(self.test_session_id)
+
+    def tearDown(self):
+        self.init_session.close()
+        self.tmp.cleanup()
+
+    def _reopen(self) -> SqliteSessionManager:
+        self.init_session.close()
+        self.init_session = SqliteSessionManager(self.path)
+        return self.init_session
+
+    def test_sessions_survive_restart(self):
+        self.session_manager.save(self.test_session_id, "key", ["a", "b"])
+        self.session_manager.save_prop(self.test_session_id, "name", "pywce")
+        self.session_manager.save_global("global_key", {"value": 1})
+
+        manager = self._reopen()
+
+        self.assertEqual(["a", "b"], manager.get(self.test_session_id, "key"))
+        self.assertEqual("pywce", manager.get_from_props(self.test_session_id, "name"))
+        self.assertEqual({"value": 1}, manager.get_global("global_key"))
+
+    def test_evictions_survive_restart(self):
+        self.session_manager.save_all(self.test_session_id, {"key1": 1, "key2": 2})
+        self.session_manager.save_global("global_key", 1)
+        self.init_session.flush()
+
+        self.session_manager.evict(self.test_session_id, "key1")
+        self.session_manager.clear_global()
+
+        manager = self._reopen()
+
+        self.assertIsNone(manager.get(self.test_session_id, "key1"))
+        self.assertEqual(2, manager.get(self.test_session_id, "key2"))
+        self.assertEqual({}, manager.fetch_all(self.test_session_id, True))
+
+    def test_read_through_cache_is_bounded(self):
+        self.init_session.close()
+        self.init_session = manager = SqliteSessionManager(self.path, cache_size=2)
+
+        for i in range(5):
+            manager.session(str(i)).save(str(i), "key", i)
+
+        manager.flush()
+        manager.session("x")
+
+        self.assertLessEqual(len(manager._cache), 2)
+        self.assertEqual([0, 1, 2, 3, 4], [manager.get(str(i), "key") for i in range(5)])
+
+
+    def test_trim_evicts_least_recent_clean_sessions(self):
+        self.init_session.close()
+        self.init_session = manager = SqliteSessionManager(self.path, cache_size=2, flush_interval_s=60)
+
+        manager.session("a")
+        manager.session("b")
+        manager.flush()
+
+        manager.session("a")
+        manager.session("c")
+        self.assertEqual(["a", "c"], list(manager._cache))
+
+        # dirty sessions are kept over the limit until committed
+        manager.save("a", "key", 1)
+        manager.session("d")
+        self.assertEqual(["c", "a", "d"], list(manager._cache))
+
+    def test_failed_flush_is_retried(self):
+        self.init_session.close()
+        self.init_session = manager = SqliteSessionManager(self.path, flush_interval_s=60)
+
+        manager.session("a").save("a", "key", 1)
+        manager.save_global("global_key", 1)
+
+        writer = manager._writer
+        manager._writer = _FailingConnection(writer)
+
+        with self.assertRaises(RuntimeError):
+            manager.flush()
+
+        manager._writer = writer
+        manager = self._reopen()
+
+        self.assertEqual(1, manager.get("a", "key"))
+        self.assertEqual(1, manager.get_global("global_key"))
+
+    def test_save_prop_without_session(self):
+        self.init_session.save_prop("unknown", "name", "pywce")
+        self.assertIsNone(self.init_session.get_user_props("unknown"))
+
+
+class _FailingConnection:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn.__enter__()
+
+    def __exit__(self, *exc):
+        return self.conn.__exit__(*exc)
+
+    def execute(self, *args):
+        return self.conn.execute(*args)
+
+    def executemany(self, *args):
+        raise RuntimeError("disk I/O error")
+
+
+if __name__ == "__main__":
+    unittest.main()
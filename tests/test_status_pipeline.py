@@ -0,0 +1,73 @@
+import json
+import queue
+import unittest
+
+from pywce.modules.whatsapp import StatusPipeline, CallbackStatusSink, QueueStatusSink, StatusEvent, WebhookEnvelope
+
+
+def _status_webhook(*statuses: str) -> bytes:
+    return json.dumps({
+        "object": "whatsapp_business_account",
+        "entry": [{"changes": [{"field": "messages", "value": {
+            "messaging_product": "whatsapp",
+            "metadata": {"phone_number_id": "123"},
+            "statuses": [{"id": f"wamid.{i}", "status": s, "timestamp": "1", "recipient_id": "263770000001"}
+                         for i, s in enumerate(statuses)]
+        }}]}]
+    }).encode("utf-8")
+
+
+_MESSAGE_WEBHOOK = json.dumps({"entry": [{"changes": [{"value": {
+    "messaging_product": "whatsapp",
+    "contacts": [{"profile": {"name": "Test"}, "wa_id": "263770000001"}],
+    "messages": [{"from": "263770000001", "id": "wamid.1", "timestamp": "1", "type": "text", "text": {"body": "hi"}}]
+}}]}]}).encode("utf-8")
+
+
+class TestStatusPipeline(unittest.TestCase):
+    def test_classify_raw_bytes(self):
+        self.assertTrue(StatusPipeline.is_status_only(_status_webhook("read")))
+        self.assertFalse(StatusPipeline.is_status_only(_MESSAGE_WEBHOOK))
+        self.assertTrue(StatusPipeline.is_status_only(json.loads(_status_webhook("read"))))
+        self.assertFalse(StatusPipeline.is_status_only(json.loads(_MESSAGE_WEBHOOK)))
+
+    def test_mixed_batch_is_not_status_only(self):
+        mixed = json.loads(_status_webhook("read"))
+        mixed["entry"][0]["changes"] += json.loads(_MESSAGE_WEBHOOK)["entry"][0]["changes"]
+
+        self.assertFalse(StatusPipeline.is_status_only(mixed))
+        self.assertFalse(StatusPipeline.is_status_only(WebhookEnvelope(mixed)))
+        self.assertFalse(StatusPipeline.is_status_only(json.dumps(mixed)))
+        self.assertFalse(StatusPipeline(CallbackStatusSink(lambda events: None)).offer(WebhookEnvelope(mixed)))
+
+        statuses = json.loads(_status_webhook("read"))
+        statuses["entry"] += json.loads(_status_webhook("sent"))["entry"]
+        self.assertTrue(StatusPipeline.is_status_only(WebhookEnvelope(statuses)))
+
+    def test_batches_to_callback(self):
+        batches = []
+        pipeline = StatusPipeline(CallbackStatusSink(batches.append), batch_size=3)
+
+        self.assertTrue(pipeline.offer(_status_webhook("sent", "delivered")))
+        self.assertEqual([], batches)
+
+        self.assertTrue(pipeline.offer(_status_webhook("read")))
+        self.assertEqual(1, len(batches))
+        self.assertEqual(["sent", "delivered", "read"], [e.status for e in batches[0]])
+        self.assertIsInstance(batches[0][0], StatusEvent)
+
+        self.assertFalse(pipeline.offer(_MESSAGE_WEBHOOK))
+
+    def test_flush_to_queue(self):
+        q = queue.Queue()
+        pipeline = StatusPipeline(QueueStatusSink(q), batch_size=100)
+
+        pipeline.offer(_status_webhook("failed"))
+        self.assertTrue(q.empty())
+
+        pipeline.stop()
+        self.assertEqual("failed", q.get_nowait()[0].status)
+
+
+if __name__ == "__main__":
+    unittest.main()
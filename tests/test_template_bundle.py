@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from pywce import storage
+from pywce.__main__ import main
+from pywce.src.exceptions import EngineException
+
+
+class TestTemplateBundle(unittest.TestCase):
+    def setUp(self):
+        fixtures = Path(__file__).parent / "fixtures"
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.template_dir = os.path.join(self.tmp.name, "templates")
+        self.trigger_dir = os.path.join(self.tmp.name, "triggers")
+        self.bundle = os.path.join(self.tmp.name, "templates.pywce")
+
+        shutil.copytree(fixtures / "templates", self.template_dir)
+        shutil.copytree(fixtures / "triggers", self.trigger_dir)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_bundle_matches_sources(self):
+        storage.compile_bundle(self.template_dir, self.trigger_dir, self.bundle)
+
+        source = storage.YamlJsonStorageManager(self.template_dir, self.trigger_dir)
+        bundle = storage.BundleStorageManager(self.bundle, self.template_dir, self.trigger_dir)
+
+        for name in source._TEMPLATES:
+            self.assertTrue(bundle.exists(name))
+            self.assertEqual(source.get(name), bundle.get(name))
+
+        self.assertEqual(source.triggers(), bundle.triggers())
+        self.assertIs(bundle.get("REPORT"), bundle.get("REPORT"))
+        self.assertIsNone(bundle.get("non_existent_template"))
+
+        bundle.close()
+
+    def test_stale_bundle_is_rejected(self):
+        storage.compile_bundle(self.template_dir, self.trigger_dir, self.bundle)
+
+        with open(os.path.join(self.template_dir, "new.json"), "w") as f:
+            f.write('{"NEW": {"kind": "text", "message": "hi", "routes": {}}}')
+
+        with self.assertRaises(EngineException) as context:
+            storage.BundleStorageManager(self.bundle, self.template_dir, self.trigger_dir)
+        self.assertIn("stale", context.exception.message)
+
+        # without sources the bundle loads as compiled
+        self.assertFalse(storage.BundleStorageManager(self.bundle).exists("NEW"))
+
+    def test_truncated_bundle_is_rejected(self):
+        storage.compile_bundle(self.template_dir, self.trigger_dir, self.bundle)
+
+        with open(self.bundle, "r+b") as f:
+            f.truncate(os.path.getsize(self.bundle) - 1)
+
+        with self.assertRaises(EngineException) as context:
+            storage.BundleStorageManager(self.bundle)
+        self.assertIn("truncated", context.exception.message)
+
+    def test_bundle_for_other_models_is_rejected(self):
+        storage.compile_bundle(self.template_dir, self.trigger_dir, self.bundle)
+
+        with mock.patch("pywce.modules.storage.bundle.schema_hash", return_value="other"):
+            with self.assertRaises(EngineException) as context:
+                storage.BundleStorageManager(self.bundle)
+        self.assertIn("template models", context.exception.message)
+
+    def test_failed_write_removes_temp_file(self):
+        with mock.patch.object(Path, "replace", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                storage.compile_bundle(self.template_dir, self.trigger_dir, self.bundle)
+
+        self.assertEqual([], [f for f in os.listdir(self.tmp.name) if f.endswith(".tmp")])
+        self.assertFalse(os.path.exists(self.bundle))
+
+    def test_empty_bundle_closes_file(self):
+        open(self.bundle, "wb").close()
+
+        manager = storage.BundleStorageManager.__new__(storage.BundleStorageManager)
+        manager.bundle_path = Path(self.bundle)
+        manager._file = manager._mmap = None
+
+        with self.assertRaises(ValueError):
+            manager._open()
+        self.assertIsNone(manager._file)
+
+    def test_invalid_template_fails_compile(self):
+        with open(os.path.join(self.template_dir, "new.json"), "w") as f:
+            f.write('{"NEW": {"kind": "text"}}')
+
+        with self.assertRaises(EngineException):
+            storage.compile_bundle(self.template_dir, self.trigger_dir, self.bundle)
+
+        self.assertFalse(os.path.exists(self.bundle))
+
+    def test_compile_command(self):
+        args = ["compile", self.template_dir, self.trigger_dir, "-o", self.bundle]
+
+        self.assertEqual(1, main(args + ["--check"]))
+        self.assertEqual(0, main(args))
+        self.assertEqual(0, main(args + ["--check"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import unittest
+from pathlib import Path
+
+from httpx import AsyncClient, MockTransport, Response
+
+from pywce import Engine, EngineConfig, DefaultSessionManager, HookArg, HookService, client, storage, tracing
+from pywce.modules.session.traced_session_manager import TracedSessionManager
+from tests.test_engine_async import _webhook, async_hook
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.exporter = tracing.RingBufferSpanExporter(capacity=1000)
+        tracing.set_exporter(self.exporter)
+
+    def tearDown(self):
+        tracing.set_exporter(None)
+
+    def test_noop_by_default(self):
+        tracing.set_exporter(None)
+
+        self.assertFalse(tracing.enabled())
+        self.assertIs(tracing.span("a"), tracing.span("b"))
+
+    def test_nested_spans_share_trace(self):
+        with tracing.span("outer"):
+            with tracing.span("inner", key="value"):
+                pass
+
+        with tracing.span("next"):
+            pass
+
+        inner, outer, _next = self.exporter.spans()
+
+        self.assertEqual("inner", inner.name)
+        self.assertEqual({"key": "value"}, inner.attributes)
+        self.assertEqual(outer.trace_id, inner.trace_id)
+        self.assertNotEqual(outer.trace_id, _next.trace_id)
+        self.assertGreaterEqual(outer.duration_ns, inner.duration_ns)
+
+    def test_error_is_recorded(self):
+        with self.assertRaises(ValueError):
+            with tracing.span("failing"):
+                raise ValueError()
+
+        self.assertEqual("ValueError", self.exporter.spans("failing")[0].attributes["error"])
+
+    def test_hook_span(self):
+        path = f"{async_hook.__module__}.{async_hook.__name__}"
+        HookService.process_hook(path, HookArg(user=client.WaUser(wa_id="1"), session_id="1"))
+
+        self.assertEqual(path, self.exporter.spans("hook")[0].attributes["hook"])
+
+    def test_session_spans(self):
+        manager = TracedSessionManager.wrap(DefaultSessionManager())
+        user_session = manager.session("1")
+        user_session.save("1", "key", "value")
+        user_session.get("1", "key")
+
+        self.assertEqual(["session.open", "session.write", "session.read"], [s.name for s in self.exporter.spans()])
+
+    def test_engine_stages(self):
+        fixtures = Path(__file__).parent / "fixtures"
+
+        def handler(request):
+            return Response(200, json={"messages": [{"id": "wamid.out"}]})
+
+        engine = Engine(EngineConfig(
+            whatsapp=client.AsyncWhatsApp(
+                client.WhatsAppConfig(token="token", phone_number_id="123", hub_verification_token="hub"),
+                http_client=AsyncClient(transport=MockTransport(handler))
+            ),
+            start_template_stage="START-MENU",
+            report_template_stage="REPORT",
+            storage_manager=storage.YamlJsonStorageManager(str(fixtures / "templates"), str(fixtures / "triggers")),
+            session_manager=DefaultSessionManager()
+        ))
+
+        raw = json.dumps(_webhook("263770000001", "wamid.in1", "hi")).encode("utf-8")
+        asyncio.run(engine.process_webhook_async(raw))
+
+        summary = self.exporter.summary()
+
+        for name in ["engine.webhook", "webhook.parse", "session.read", "session.write", "processor.setup",
+                     "template.render", "whatsapp.send"]:
+            self.assertIn(name, summary)
+
+        self.assertEqual(1, len({s.trace_id for s in self.exporter.spans()}))
+        self.assertEqual("START-MENU", self.exporter.spans("processor.setup")[0].attributes["stage"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmarks.graph_api import GraphApiStub
+from benchmarks.payloads import WebhookGenerator
+from pywce import Engine, EngineConfig, DefaultSessionManager, TrafficRecorder, TrafficReplayer, client, storage
+
+
+class TestTraffic(unittest.TestCase):
+    def setUp(self):
+        self.stub = GraphApiStub().start()
+        self.capture = str(Path(tempfile.mkdtemp()) / "capture.jsonl")
+
+    def tearDown(self):
+        self.stub.stop()
+
+    def _engine(self, **kwargs) -> Engine:
+        fixtures = Path(__file__).parent / "fixtures"
+
+        return Engine(EngineConfig(
+            whatsapp=client.WhatsApp(self.stub.whatsapp_config(), on_send_listener=kwargs.pop("listener", None)),
+            start_template_stage="START-MENU",
+            report_template_stage="REPORT",
+            storage_manager=storage.YamlJsonStorageManager(str(fixtures / "templates"), str(fixtures / "triggers")),
+            session_manager=DefaultSessionManager(),
+            debounce_timeout_ms=0,
+            **kwargs
+        ))
+
+    def _record(self):
+        generator = WebhookGenerator()
+
+        with TrafficRecorder(self.capture) as recorder:
+            engine = self._engine(listener=recorder.record_send, webhook_tap=recorder.record_webhook)
+
+            for wa_id in ["263770000001", "263770000002"]:
+                engine.process_webhook(generator.to_bytes(generator.text(wa_id, "hi")))
+
+    def test_record(self):
+        self._record()
+
+        with open(self.capture) as f:
+            records = [json.loads(line) for line in f]
+
+        self.assertEqual(["in", "out", "in", "out"], [r["dir"] for r in records])
+        self.assertEqual("263770000002", records[3]["to"])
+        self.assertEqual("interactive", records[3]["payload"]["type"])
+
+    def test_replay_matches_capture(self):
+        self._record()
+
+        result = TrafficReplayer(self._engine(), self.capture, speed=None).run()
+
+        self.assertEqual(2, result.messages)
+        self.assertEqual(2, result.sent)
+        self.assertEqual(2, result.matched)
+        self.assertEqual([], result.diff)
+
+    def test_tap_gets_the_engine_envelope(self):
+        tapped = []
+        engine = self._engine(webhook_tap=tapped.append)
+        engine.process_webhook(WebhookGenerator().to_bytes(WebhookGenerator().text("263770000001", "hi")))
+
+        self.assertIsInstance(tapped[0], client.WebhookEnvelope)
+
+    def test_replay_processes_batched_webhooks(self):
+        generator = WebhookGenerator()
+        batch = generator.text("263770000001", "hi")
+        batch["entry"] += generator.text("263770000002", "hi")["entry"]
+
+        with open(self.capture, "w") as f:
+            f.write(json.dumps({"dir": "in", "t": 0, "body": batch}) + "\n")
+
+        result = TrafficReplayer(self._engine(), self.capture, speed=None).run()
+
+        self.assertEqual(2, result.sent)
+
+    def test_replay_reports_diff(self):
+        self._record()
+
+        with open(self.capture) as f:
+            records = [json.loads(line) for line in f]
+
+        records[1]["payload"]["type"] = "text"
+
+        with open(self.capture, "w") as f:
+            f.writelines(json.dumps(r) + "\n" for r in records)
+
+        result = TrafficReplayer(self._engine(), self.capture, speed=None).run()
+
+        self.assertEqual(1, len(result.diff))
+        self.assertEqual("263770000001", result.diff[0]["to"])
+        self.assertEqual("text", result.diff[0]["expected"]["type"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,7 @@ from unittest.mock import patch, MagicMock
 
 from pywce.modules.whatsapp import WhatsApp
 from pywce.modules.whatsapp.config import WhatsAppConfig
+from pywce.modules.whatsapp.model import WebhookEnvelope
 from pywce.modules.whatsapp.model.message_type_enum import MessageTypeEnum
 
 
@@ -89,6 +90,68 @@ class TestWhatsApp(unittest.TestCase):
         result = self.whatsapp.show_typing_indicator(message_id="msg123")
         self.assertEqual(self.expected_response, result)
 
+    def test_get_messages_from_batched_webhook(self):
+        def message(wa_id, msg_id, ts):
+            return {"from": wa_id, "id": msg_id, "timestamp": ts, "type": "text", "text": {"body": msg_id}}
+
+        webhook = {
+            "entry": [
+                {"changes": [{"value": {
+                    "messaging_product": "whatsapp",
+                    "contacts": [{"profile": {"name": "A"}, "wa_id": "1"}, {"profile": {"name": "B"}, "wa_id": "2"}],
+                    "messages": [message("1", "a2", "20"), message("2", "b1", "10"), message("1", "a1", "10")]
+                }}]},
+                {"changes": [{"value": {
+                    "messaging_product": "whatsapp",
+                    "contacts": [{"profile": {"name": "A"}, "wa_id": "1"}],
+                    "messages": [message("1", "a3", "30")]
+                }}]}
+            ]
+        }
+
+        messages = self.whatsapp.util.get_messages(webhook)
+        self.assertEqual(["a1", "a2", "a3", "b1"], [user.msg_id for user, _ in messages])
+        self.assertEqual("B", messages[-1][0].name)
+        self.assertEqual("a1", messages[0][1].body.get("body"))
+
+        payloads = self.whatsapp.util.split_webhook(webhook)
+        self.assertEqual(4, len(payloads))
+        for payload, (user, _) in zip(payloads, messages):
+            self.assertTrue(self.whatsapp.util.is_valid_webhook_message(payload))
+            self.assertEqual(user, self.whatsapp.util.get_wa_user(payload))
+
+    def test_webhook_envelope(self):
+        raw = (b'{"entry": [{"changes": [{"value": {"messaging_product": "whatsapp", '
+               b'"contacts": [{"profile": {"name": "Test"}, "wa_id": "263770000001"}], '
+               b'"messages": [{"from": "263770000001", "id": "wamid.1", "timestamp": "1", '
+               b'"type": "interactive", "interactive": {"type": "button_reply", '
+               b'"button_reply": {"id": "menu", "title": "Menu"}}}]}}]}]}')
+
+        envelope = WebhookEnvelope.from_bytes(raw)
+
+        self.assertTrue(envelope.is_message)
+        self.assertFalse(envelope.is_status)
+        self.assertEqual("263770000001", envelope.wa_id)
+        self.assertIs(envelope.user, envelope.user)
+        self.assertEqual(self.whatsapp.util.get_wa_user(envelope.data), envelope.user)
+        self.assertEqual(MessageTypeEnum.INTERACTIVE_BUTTON, envelope.message.typ)
+        self.assertIs(envelope, WebhookEnvelope.of(envelope))
+
+    def test_webhook_envelope_non_message(self):
+        envelope = WebhookEnvelope.of({"entry": [{"changes": [{"value": {
+            "messaging_product": "whatsapp",
+            "statuses": [{"id": "wamid.1", "status": "read"}],
+            "errors": [{"code": 131047}]
+        }}]}]})
+
+        self.assertFalse(envelope.is_message)
+        self.assertTrue(envelope.is_status)
+        self.assertIsNone(envelope.wa_id)
+        self.assertIsNone(envelope.user)
+        self.assertEqual("read", envelope.statuses[0]["status"])
+        self.assertEqual(131047, envelope.errors[0]["code"])
+        self.assertFalse(WebhookEnvelope.of({"object": "unknown"}).is_message)
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
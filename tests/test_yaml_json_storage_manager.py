@@ -1,6 +1,13 @@
 import os
+import shutil
+import tempfile
+import threading
+import time
 import unittest
 from pathlib import Path
+from unittest import mock
+
+from pydantic import ValidationError
 
 from pywce import storage
 from pywce.src.exceptions import EngineException
@@ -59,6 +66,24 @@ class TestYamlJsonStorageManager(unittest.TestCase):
         template = self.manager.get("non_existent_template")
         self.assertIsNone(template)
 
+    def test_get_returns_cached_model(self):
+        self.assertIs(self.manager.get("REPORT"), self.manager.get("REPORT"))
+
+    def test_cached_model_is_frozen(self):
+        with self.assertRaises(ValidationError):
+            self.manager.get("REPORT").session = False
+
+    def test_invalid_template_is_skipped(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(os.path.join(tmp, "templates.json"), "w") as f:
+                f.write('{"VALID": {"kind": "text", "message": "hi", "routes": {}}, "INVALID": {"kind": "text"}}')
+
+            manager = storage.YamlJsonStorageManager(tmp, str(self.valid_trigger_dir))
+
+            self.assertIsNotNone(manager.get("VALID"))
+            self.assertTrue(manager.exists("INVALID"))
+            self.assertIsNone(manager.get("INVALID"))
+
     def test_triggers_list_generation(self):
         self.manager.load_triggers()
         triggers = self.manager.triggers()
@@ -66,5 +91,142 @@ class TestYamlJsonStorageManager(unittest.TestCase):
         self.assertTrue(all(isinstance(trigger, EngineRoute) for trigger in triggers))
 
 
+class TestTemplateHotReload(unittest.TestCase):
+    def setUp(self):
+        fixtures = Path(__file__).parent / "fixtures"
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.template_dir = Path(self.tmp.name) / "templates"
+        self.trigger_dir = Path(self.tmp.name) / "triggers"
+
+        shutil.copytree(fixtures / "templates", self.template_dir)
+        shutil.copytree(fixtures / "triggers", self.trigger_dir)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, name: str, body: str):
+        (self.template_dir / name).write_text(body, encoding="utf-8")
+
+    def test_reload_swaps_registry(self):
+        manager = storage.YamlJsonStorageManager(str(self.template_dir), str(self.trigger_dir))
+        snapshot = manager.snapshot()
+
+        self._write("new.json", '{"NEW": {"kind": "text", "message": "hi", "routes": {}}}')
+
+        self.assertTrue(manager.reload())
+        self.assertTrue(manager.exists("NEW"))
+
+        # a message that started before the reload keeps its view
+        self.assertFalse(snapshot.exists("NEW"))
+        self.assertIs(snapshot.get("REPORT"), snapshot.get("REPORT"))
+
+    def test_invalid_template_on_reload_is_skipped(self):
+        errors = []
+        manager = storage.YamlJsonStorageManager(str(self.template_dir), str(self.trigger_dir),
+                                                 on_reload_error=errors.append)
+        report = manager.get("REPORT")
+
+        self._write("new.json", '{"NEW": {"kind": "text"}, "REPORT": {"kind": "text"}, '
+                                '"OTHER": {"kind": "text", "message": "hi", "routes": {}}}')
+        (self.template_dir / "report.json").unlink()
+
+        # skipped as on the initial load, an invalid template keeps its loaded model
+        self.assertTrue(manager.reload())
+        self.assertTrue(manager.exists("NEW"))
+        self.assertIsNone(manager.get("NEW"))
+        self.assertIsNotNone(manager.get("OTHER"))
+        self.assertIs(report, manager.get("REPORT"))
+        self.assertEqual({"NEW", "REPORT"}, set(errors[0].data))
+
+    def test_failed_reload_keeps_loaded_templates(self):
+        errors = []
+        manager = storage.YamlJsonStorageManager(str(self.template_dir), str(self.trigger_dir),
+                                                 on_reload_error=errors.append)
+
+        self._write("broken.yaml", "REPORT: [unclosed")
+        self.assertFalse(manager.reload())
+        self.assertIsNotNone(manager.get("REPORT"))
+        self.assertEqual(1, len(errors))
+
+    def test_watcher_reloads_changed_files(self):
+        manager = storage.YamlJsonStorageManager(str(self.template_dir), str(self.trigger_dir),
+                                                 watch=True, poll_interval_s=0.01)
+
+        self._write("new.json", '{"NEW": {"kind": "text", "message": "hi", "routes": {}}}')
+
+        deadline = time.monotonic() + 2
+        while not manager.exists("NEW") and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        manager.close()
+        self.assertTrue(manager.exists("NEW"))
+
+
+class TestParallelTemplateParsing(unittest.TestCase):
+    def setUp(self):
+        fixtures = Path(__file__).parent / "fixtures"
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.template_dir = Path(self.tmp.name) / "templates"
+        self.trigger_dir = Path(self.tmp.name) / "triggers"
+
+        shutil.copytree(fixtures / "templates", self.template_dir)
+        shutil.copytree(fixtures / "triggers", self.trigger_dir)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_process_pool_matches_in_process_parse(self):
+        serial = storage.YamlJsonStorageManager(str(self.template_dir), str(self.trigger_dir), parse_workers=1)
+
+        with mock.patch.object(storage, "PARALLEL_PARSE_MIN_BYTES", 0):
+            parallel = storage.YamlJsonStorageManager(str(self.template_dir), str(self.trigger_dir), parse_workers=2)
+
+        self.assertEqual(list(serial._TEMPLATES), list(parallel._TEMPLATES))
+        self.assertEqual(serial._TEMPLATES, parallel._TEMPLATES)
+        self.assertEqual(serial.triggers(), parallel.triggers())
+
+        for name in serial._TEMPLATES:
+            self.assertEqual(serial.get(name), parallel.get(name))
+
+    def test_reload_pool_does_not_fork(self):
+        manager = storage.YamlJsonStorageManager(str(self.template_dir), str(self.trigger_dir), parse_workers=2)
+        results = []
+
+        with mock.patch.object(storage, "PARALLEL_PARSE_MIN_BYTES", 0), \
+                mock.patch.object(storage.multiprocessing, "get_context",
+                                  wraps=storage.multiprocessing.get_context) as get_context:
+            # the watcher reloads off the main thread
+            watcher = threading.Thread(target=lambda: results.append(manager.reload()))
+            watcher.start()
+            watcher.join()
+
+        self.assertEqual([True], results)
+        self.assertNotEqual("fork", get_context.call_args.args[0])
+
+    def test_duplicate_template_across_files(self):
+        (self.template_dir / "zz_copy.json").write_text(
+            '{"REPORT": {"kind": "text", "message": "hi", "routes": {}}}', encoding="utf-8")
+
+        with self.assertRaises(EngineException) as context:
+            storage.YamlJsonStorageManager(str(self.template_dir), str(self.trigger_dir))
+
+        self.assertIn("report.json", context.exception.message)
+        self.assertIn("zz_copy.json", context.exception.message)
+        self.assertEqual("REPORT", context.exception.data)
+
+    def test_duplicate_trigger_across_files(self):
+        manager = storage.YamlJsonStorageManager(str(self.template_dir), str(self.trigger_dir))
+        shutil.copy(self.trigger_dir / "triggers.yaml", self.trigger_dir / "more.yaml")
+
+        with self.assertRaises(EngineException):
+            manager.load_triggers()
+
+        # a reload with duplicates keeps the loaded version
+        self.assertFalse(manager.reload())
+        self.assertTrue(manager.triggers())
+
+
 if __name__ == '__main__':
     unittest.main()